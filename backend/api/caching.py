@@ -0,0 +1,115 @@
+# backend/api/caching.py
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, request
+from config import ApiConfig
+
+class TTLCache:
+    """
+    Small thread-safe cache whose entries expire `ttl` seconds after insertion.
+    Holds at most `max_entries`, evicting the least recently used entry first.
+    """
+    def __init__(self, ttl, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class FileCache:
+    """
+    Bounded LRU of generated files, so they can be served with send_file: Range requests,
+    conditional requests and sendfile-style transfer come from the file itself. The
+    directory is emptied on startup since its contents are only ever derived data.
+    """
+    def __init__(self, directory, max_entries=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + suffix)
+
+    def get(self, key):
+        """(path, meta) stored for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, data, suffix='', meta=None):
+        """Write `data` for `key`, remembering `meta` alongside it, and return the file's path."""
+        path = self._path(key, suffix)
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._entries[key] = (path, meta)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                # A reader that already opened the file keeps its handle on POSIX
+                if os.path.exists(evicted):
+                    os.remove(evicted)
+        return path
+
+class JSONBody:
+    """A serialized JSON payload, with its gzip encoding computed on first demand."""
+    def __init__(self, data):
+        self.raw = json.dumps(data, separators=(',', ':')).encode()
+        self._gzipped = None
+
+    @property
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.raw, compresslevel=ApiConfig.GZIP_LEVEL)
+        return self._gzipped
+
+def json_response(body, status=200, headers=None):
+    """
+    Build a JSON response from a JSONBody, gzip-compressing it when the client accepts
+    gzip and the payload is larger than ApiConfig.GZIP_MIN_SIZE.
+    """
+    response_headers = {'Vary': 'Accept-Encoding'}
+    response_headers.update(headers or {})
+    payload = body.raw
+    if len(payload) >= ApiConfig.GZIP_MIN_SIZE and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        payload = body.gzipped
+        response_headers['Content-Encoding'] = 'gzip'
+    return Response(payload, status=status, headers=response_headers, mimetype='application/json')
\ No newline at end of file
@@ -1,11 +1,24 @@
 # backend/api/endpoints.py
 
-from flask import request
+from flask import request, Response, send_file
 from flask_restful import Resource
-from services.event_storage import EventStorage
+from werkzeug.http import http_date
+from services.event_storage import get_event_storage
+from services.audio_manager import get_audio_manager
+from services.log_archive import LogArchive
+from services.metrics import get_metrics
+from services.model_loader import get_model_loader
+from logger import LevelFilter
+from services import rollups
+from api.caching import TTLCache, FileCache, JSONBody, json_response
+from config import ApiConfig, AudioConfig, ClassifierConfig, DatabaseConfig, SpeechConfig
 from marshmallow import Schema, fields
 from dateutil.parser import isoparse
+from datetime import datetime, timedelta, timezone
+import hashlib
+import io
 import logging
+import os
 
 class EventSchema(Schema):
     id = fields.Int()
@@ -17,7 +30,68 @@ class EventSchema(Schema):
     meta_info = fields.Str(allow_none=True)
     audio_id = fields.Str()
 
+def parse_time(value):
+    """Parse an ISO 8601 timestamp into the naive UTC datetimes stored in the database."""
+    parsed = isoparse(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def closed_range_delay():
+    """
+    Seconds after which no more events can arrive for a time range. Events carry their onset
+    time but are stored once they end: a sound event up to MAX_EVENT_DURATION plus hangover
+    later, an utterance up to MAX_UTTERANCE_DURATION later, then a chunk and a write batch on top.
+    """
+    if ApiConfig.CLOSED_RANGE_DELAY is not None:
+        return ApiConfig.CLOSED_RANGE_DELAY
+    longest = max(ClassifierConfig.MAX_EVENT_DURATION + ClassifierConfig.HANGOVER, SpeechConfig.MAX_UTTERANCE_DURATION)
+    return longest + AudioConfig.CHUNK_DURATION + DatabaseConfig.BATCH_INTERVAL
+
+def is_closed_range(end_time):
+    """True when no more events can arrive for a range ending at `end_time`."""
+    return end_time <= datetime.utcnow() - timedelta(seconds=closed_range_delay())
+
+def conditional_headers(query_key):
+    """
+    Validators for the current state of the events table: the ETag combines the newest
+    event id and the storage revision with the query, and Last-Modified is when events were
+    last written or changed. Returns (headers, not_modified).
+    """
+    storage = get_event_storage()
+    latest_id, _ = storage.latest_event()
+    query_hash = hashlib.sha1(repr(query_key).encode()).hexdigest()[:12]
+    etag = f"{latest_id}.{storage.revision}-{query_hash}"
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+
+    last_modified = storage.modified_at
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        headers['Last-Modified'] = http_date(last_modified)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and last_modified is not None and last_modified <= since
+    return headers, not_modified
+
+# Serialized responses for closed time ranges, keyed by the normalized query
+_closed_range_cache = TTLCache(ApiConfig.CACHE_TTL, ApiConfig.CACHE_MAX_ENTRIES)
+
 class EventsAPI(Resource):
+    """
+    GET /api/events?start_time=...&end_time=...
+
+    Optional filters: event_type, label, category, min_confidence.
+    Results are ordered by time and paginated with `limit` (capped at ApiConfig.MAX_PAGE_SIZE);
+    when more events follow, the X-Next-Cursor response header holds the value to pass
+    as `cursor` for the next page.
+
+    Responses carry ETag/Last-Modified validators so polling clients get a 304 while nothing
+    new has been stored, queries over closed time ranges are served from a short-lived cache,
+    and large bodies are gzip-compressed.
+    """
     def get(self):
         logger = logging.getLogger('EventsAPI')
         start_time_str = request.args.get('start_time')
@@ -26,18 +100,291 @@ class EventsAPI(Resource):
             return {'error': 'start_time and end_time parameters are required'}, 400
 
         try:
-            start_time = isoparse(start_time_str)
-            end_time = isoparse(end_time_str)
+            start_time = parse_time(start_time_str)
+            end_time = parse_time(end_time_str)
         except Exception as e:
             logger.error(f"Date parsing error: {e}")
             return {'error': 'Invalid date format'}, 400
 
         try:
-            event_storage = EventStorage()
-            events = event_storage.get_events(start_time, end_time)
-            schema = EventSchema(many=True)
-            events_dict = schema.dump(events)
-            return events_dict, 200
+            limit = int(request.args.get('limit', ApiConfig.DEFAULT_PAGE_SIZE))
+            min_confidence = request.args.get('min_confidence')
+            min_confidence = float(min_confidence) if min_confidence is not None else None
+        except ValueError:
+            return {'error': 'limit and min_confidence must be numbers'}, 400
+        if limit < 1:
+            return {'error': 'limit must be positive'}, 400
+        limit = min(limit, ApiConfig.MAX_PAGE_SIZE)
+
+        filters = {
+            'cursor': request.args.get('cursor'),
+            'event_type': request.args.get('event_type'),
+            'label': request.args.get('label'),
+            'category': request.args.get('category'),
+            'min_confidence': min_confidence,
+        }
+        # A new event (even one timestamped inside an old range) or an in-place update
+        # changes the key, retiring cached pages
+        storage = get_event_storage()
+        query_key = (
+            start_time, end_time, limit, tuple(sorted(filters.items())), storage.latest_event()[0], storage.revision
+        )
+
+        try:
+            headers, not_modified = conditional_headers(query_key)
+            if not_modified:
+                return Response(status=304, headers=headers)
+
+            closed = is_closed_range(end_time)
+            cached = _closed_range_cache.get(query_key) if closed else None
+            if cached is None:
+                events, next_cursor = get_event_storage().query_events(start_time, end_time, limit, **filters)
+                schema = EventSchema(many=True)
+                cached = (JSONBody(schema.dump(events)), next_cursor)
+                if closed:
+                    _closed_range_cache.put(query_key, cached)
+
+            body, next_cursor = cached
+            if next_cursor:
+                headers['X-Next-Cursor'] = next_cursor
+            return json_response(body, 200, headers)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             logger.error(f"Failed to retrieve events: {e}")
             return {'error': 'Failed to retrieve events'}, 500
+
+
+class StatsAPI(Resource):
+    """
+    GET /api/stats?start_time=...&end_time=...&dimension=label
+
+    Aggregates answered from the rollup tables, never from the raw events table.
+    `dimension` is one of label, category or language and `resolution` is minute or hour
+    (default hour). With `top=N` the N most frequent keys in the range are returned (N is
+    capped at ApiConfig.MAX_PAGE_SIZE); otherwise a per-bucket histogram, optionally restricted to one `key`.
+    """
+    def get(self):
+        logger = logging.getLogger('StatsAPI')
+        start_time_str = request.args.get('start_time')
+        end_time_str = request.args.get('end_time')
+        if not start_time_str or not end_time_str:
+            return {'error': 'start_time and end_time parameters are required'}, 400
+
+        try:
+            start_time = parse_time(start_time_str)
+            end_time = parse_time(end_time_str)
+        except Exception as e:
+            logger.error(f"Date parsing error: {e}")
+            return {'error': 'Invalid date format'}, 400
+
+        resolution = request.args.get('resolution', 'hour')
+        dimension = request.args.get('dimension', 'label')
+        if resolution not in rollups.RESOLUTIONS:
+            return {'error': f"resolution must be one of: {', '.join(rollups.RESOLUTIONS)}"}, 400
+        if dimension not in rollups.DIMENSIONS:
+            return {'error': f"dimension must be one of: {', '.join(rollups.DIMENSIONS)}"}, 400
+
+        top = request.args.get('top')
+        try:
+            top = int(top) if top is not None else None
+        except ValueError:
+            return {'error': 'top must be a number'}, 400
+        if top is not None:
+            if top < 1:
+                return {'error': 'top must be positive'}, 400
+            top = min(top, ApiConfig.MAX_PAGE_SIZE)
+
+        session = get_event_storage().Session()
+        try:
+            if top is not None:
+                result = {
+                    'resolution': resolution,
+                    'dimension': dimension,
+                    'top': rollups.top_keys(session, resolution, dimension, start_time, end_time, top),
+                }
+            else:
+                key = request.args.get('key')
+                result = {
+                    'resolution': resolution,
+                    'dimension': dimension,
+                    'key': key,
+                    'histogram': rollups.histogram(session, resolution, dimension, start_time, end_time, key),
+                }
+            return json_response(JSONBody(result), 200)
+        except Exception as e:
+            logger.error(f"Failed to compute stats: {e}")
+            return {'error': 'Failed to compute stats'}, 500
+        finally:
+            session.close()
+
+class LogsAPI(Resource):
+    """
+    GET /api/logs?start_time=...&end_time=...
+
+    Records from the structured log archive, oldest first. Optional filters: `levels`
+    (comma-separated level names, e.g. EVENT,SPEECH) and `logger` (logger name prefix).
+    Pages hold at most `limit` records (capped at ApiConfig.MAX_PAGE_SIZE); the
+    X-Next-Cursor header continues a page like it does for /api/events.
+    """
+    archive = LogArchive(os.path.join('logs', 'archive'))
+
+    def get(self):
+        logger = logging.getLogger('LogsAPI')
+        start_time_str = request.args.get('start_time')
+        end_time_str = request.args.get('end_time')
+        if not start_time_str or not end_time_str:
+            return {'error': 'start_time and end_time parameters are required'}, 400
+
+        try:
+            start_time = parse_time(start_time_str).replace(tzinfo=timezone.utc).timestamp()
+            end_time = parse_time(end_time_str).replace(tzinfo=timezone.utc).timestamp()
+        except Exception as e:
+            logger.error(f"Date parsing error: {e}")
+            return {'error': 'Invalid date format'}, 400
+
+        try:
+            limit = int(request.args.get('limit', ApiConfig.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return {'error': 'limit must be a number'}, 400
+        if limit < 1:
+            return {'error': 'limit must be positive'}, 400
+        limit = min(limit, ApiConfig.MAX_PAGE_SIZE)
+
+        levels = request.args.get('levels')
+        levels = LevelFilter.from_env_string(levels).enabled_levels if levels else None
+
+        try:
+            records, next_cursor = self.archive.search(
+                start_time, end_time,
+                levels=levels,
+                logger=request.args.get('logger'),
+                limit=limit,
+                cursor=request.args.get('cursor')
+            )
+            headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+            return json_response(JSONBody(records), 200, headers)
+        except ValueError as e:
+            return {'error': f'Invalid cursor: {e}'}, 400
+        except Exception as e:
+            logger.error(f"Failed to read log archive: {e}")
+            return {'error': 'Failed to read logs'}, 500
+
+# Files of recently requested chunks and clips. Created here rather than on first use: the
+# constructor empties its directory, which must not happen under a concurrent request
+_audio_file_cache = FileCache(ApiConfig.CLIP_CACHE_DIR, ApiConfig.CLIP_CACHE_ENTRIES)
+
+_AUDIO_SUFFIXES = {'audio/wav': '.wav', 'audio/mpeg': '.mp3'}
+
+def _send_audio(source, mimetype, headers):
+    response = send_file(source, mimetype=mimetype, conditional=True, etag=isinstance(source, str))
+    response.headers.update(headers)
+    return response
+
+def send_cached_audio(key, build, cacheable=True):
+    """
+    Serve audio through the file cache: `build()` returns (data, mimetype, headers) or None
+    and is only called on a miss. Served with send_file, which answers Range and conditional
+    requests from the file and lets the server use its sendfile-style file wrapper.
+    Results that may still change (clips reaching into the recent past) bypass the cache.
+    Returns None when there is no such audio.
+    """
+    cached = _audio_file_cache.get(key) if cacheable else None
+    if cached is not None:
+        path, (mimetype, headers) = cached
+        try:
+            return _send_audio(path, mimetype, headers)
+        except FileNotFoundError:
+            pass  # evicted since the lookup, build it again
+
+    built = build()
+    if built is None:
+        return None
+    data, mimetype, headers = built
+    if not cacheable:
+        return _send_audio(io.BytesIO(data), mimetype, dict(headers, **{'Cache-Control': 'no-cache'}))
+    path = _audio_file_cache.put(key, data, _AUDIO_SUFFIXES.get(mimetype, ''), (mimetype, headers))
+    return _send_audio(path, mimetype, headers)
+
+class AudioAPI(Resource):
+    """GET /api/audio/<audio_id>: one stored chunk, with Range support."""
+    def get(self, audio_id):
+        def build():
+            audio = get_audio_manager().get_audio_chunk(audio_id)
+            return audio + ({},) if audio else None
+
+        response = send_cached_audio(('chunk', audio_id), build)
+        if response is None:
+            return {'error': 'Audio not found'}, 404
+        return response
+
+class AudioClipAPI(Resource):
+    """
+    GET /api/events/<event_id>/clip?before=5&after=5
+
+    The audio from `before` seconds ahead of the event to `after` seconds past it, as one WAV
+    stitched from the stored chunks (gaps where no audio was kept are silent). The
+    X-Clip-Start header gives the capture time of the clip's first sample.
+    """
+    def get(self, event_id):
+        logger = logging.getLogger('AudioClipAPI')
+        try:
+            before = float(request.args.get('before', ApiConfig.CLIP_BEFORE))
+            after = float(request.args.get('after', ApiConfig.CLIP_AFTER))
+        except ValueError:
+            return {'error': 'before and after must be numbers'}, 400
+        if before < 0 or after < 0 or before + after > ApiConfig.CLIP_MAX_DURATION:
+            return {'error': f'before and after must be positive and add up to at most {ApiConfig.CLIP_MAX_DURATION:g}s'}, 400
+
+        try:
+            event = get_event_storage().get_event(event_id)
+            if event is None:
+                return {'error': 'Event not found'}, 404
+            start = event.timestamp - timedelta(seconds=before)
+            end = event.timestamp + timedelta(seconds=(event.duration or 0) + after)
+
+            def build():
+                clip = get_audio_manager().extract_clip(start, end)
+                if clip is None:
+                    return None
+                data, clip_start = clip
+                return data, 'audio/wav', {'X-Clip-Start': clip_start.isoformat()}
+
+            # Audio for the recent past may still be on its way to disk
+            response = send_cached_audio(('clip', event_id, before, after), build, cacheable=is_closed_range(end))
+            if response is None:
+                return {'error': 'No audio stored for this event'}, 404
+            return response
+        except Exception as e:
+            logger.error(f"Failed to extract clip for event {event_id}: {e}")
+            return {'error': 'Failed to extract clip'}, 500
+
+class MetricsAPI(Resource):
+    def get(self):
+        # Prometheus text exposition format
+        return Response(
+            get_metrics().render(),
+            headers={'Cache-Control': 'no-cache'},
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+class HealthAPI(Resource):
+    def get(self):
+        """
+        Readiness: 200 once every model needed for capture is loaded and warmed up,
+        503 while they are still loading, with per-model state and timings. If a required
+        model failed, capture runs without it and the status is 'degraded' (also 503).
+        """
+        loader = get_model_loader()
+        models = loader.status()
+        failed = loader.failed()
+        if loader.ready:
+            status = 'ready'
+        elif failed:
+            status = 'degraded'
+        else:
+            status = 'starting'
+        body = {'status': status, 'models': models}
+        if failed:
+            body['unavailable'] = failed
+        return body, 200 if status == 'ready' else 503, {'Cache-Control': 'no-cache'}
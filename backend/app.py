@@ -3,27 +3,31 @@
 import threading
 import logging
 import os
+import signal
 import sys
-import queue
-import numpy as np
-import time
+from datetime import datetime
 
 from services.websocket_logger import setup_websocket_logging
-from flask import Flask, send_from_directory, send_file
+from flask import Flask, send_file
 from flask_restful import Api
 from flask_cors import CORS
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from models.event import Base
-from config import DATABASE_URI, DATABASE_PATH
+from config import DATABASE_PATH, AudioConfig, AudioStorageConfig, PipelineConfig, SpeechConfig
 from logger import setup_logger
-from api.endpoints import EventsAPI
+from api.endpoints import EventsAPI, StatsAPI, LogsAPI, AudioAPI, AudioClipAPI, MetricsAPI, HealthAPI
 from services.audio_capture import AudioCapture
+from services.file_capture import FileAudioCapture
+from services.audio_buffer import AudioRingBuffer
+from services.audio_chunk import AudioChunk
 from services.sound_classifier import SoundClassifier
-from services.speech_recognizer import SpeechRecognizer
-from services.audio_manager import AudioManager
+from services.speech_recognizer import SpeechRecognizer, AUTO_LANGUAGE
+from services.audio_manager import get_audio_manager
+from services.audio_writer import AudioWriter
 from services.speech_detector import SpeechDetector
+from services.event_storage import get_event_storage
+from services.database import get_engine
+from services.metrics import get_metrics
+from services.model_loader import get_model_loader
+from services.processing import ChunkProcessor, build_cascade
 
 # Set up logging
 setup_logger()
@@ -36,9 +40,7 @@ if not os.path.exists(db_dir):
     logger.info(f"Created database directory at {db_dir}")
 
 # Initialize the database
-engine = create_engine(DATABASE_URI)
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+engine = get_engine()
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='../frontend', static_url_path='/')
@@ -50,6 +52,12 @@ setup_websocket_logging(app, logger)
 
 # API endpoints
 api.add_resource(EventsAPI, '/api/events')
+api.add_resource(StatsAPI, '/api/stats')
+api.add_resource(LogsAPI, '/api/logs')
+api.add_resource(AudioAPI, '/api/audio/<audio_id>')
+api.add_resource(AudioClipAPI, '/api/events/<int:event_id>/clip')
+api.add_resource(MetricsAPI, '/api/metrics')
+api.add_resource(HealthAPI, '/api/health')
 
 # Serve the frontend
 @app.route('/')
@@ -77,102 +85,164 @@ def not_found(e):
         logger.error(f"Error serving frontend: {e}")
         return str(e), 500
 
-# Endpoint to serve audio files
-@app.route('/api/audio/<audio_id>')
-def get_audio(audio_id):
-    audio_manager = AudioManager(storage_path='audio_chunks')
-    filepath = audio_manager.get_audio_chunk(audio_id)
-    if filepath and os.path.exists(filepath):
-        return send_from_directory(directory=audio_manager.storage_path, filename=f"{audio_id}.mp3")
+# Pipeline instrumentation; the services time their own calls
+metrics = get_metrics()
+capture_blocks = metrics.counter('alog_capture_blocks_total', 'Audio blocks delivered by the capture callback')
+capture_status_errors = metrics.counter(
+    'alog_capture_status_errors_total', 'Capture callbacks reporting a status (overflow, underflow)'
+)
+capture_callback_seconds = metrics.histogram('alog_capture_callback_seconds', 'Time spent in the capture callback')
+submit_seconds = metrics.histogram(
+    'alog_pipeline_submit_seconds', 'Time process_audio waits to hand a chunk to the pipeline (back-pressure)'
+)
+
+def load_sound_classifier():
+    # SoundClassifier logs load errors instead of raising; surface them to the model loader
+    classifier = SoundClassifier()
+    if classifier.engine is None:
+        raise RuntimeError("YAMNet model could not be loaded")
+    return classifier
+
+def start_services(stop_event):
+    if AudioConfig.SOURCE:
+        audio_capture = FileAudioCapture(
+            [path.strip() for path in AudioConfig.SOURCE.split(',') if path.strip()],
+            sample_rate=AudioConfig.SAMPLE_RATE,
+            realtime=AudioConfig.SOURCE_REALTIME
+        )
     else:
-        return {'error': 'Audio not found'}, 404
-
-def start_services():
-    audio_capture = AudioCapture(sample_rate=16000)  # Set sample_rate to 16000 Hz
-    sound_classifier = SoundClassifier()
-    speech_detector = SpeechDetector()
+        audio_capture = AudioCapture(sample_rate=AudioConfig.SAMPLE_RATE)
+    # The web server is already up; models load in parallel in the background meanwhile
+    model_loader = get_model_loader()
+    model_loader.submit('yamnet', load_sound_classifier, warmup=lambda classifier: classifier.warm_up(AudioConfig.CHUNK_SIZE))
     speech_recognizer = SpeechRecognizer()
-    audio_manager = AudioManager(storage_path='audio_chunks')
-
-    audio_queue = queue.Queue()
-    buffer_lock = threading.Lock()
-    audio_buffer = []
-
-    # Audio parameters
-    SAMPLE_RATE = 16000
-    CHUNK_DURATION = 3  # seconds
-    CHUNK_SIZE = int(SAMPLE_RATE * CHUNK_DURATION)
+    if SpeechConfig.LANGUAGE == AUTO_LANGUAGE:
+        # Every language is decoded until one of them wins
+        speech_recognizer.preload(SpeechConfig.LANGUAGES)
+    else:
+        speech_recognizer.preload(SpeechConfig.PRELOAD_LANGUAGES)
+    speech_detector = SpeechDetector()
+    audio_manager = get_audio_manager()
+
+    # Audio is written by background workers, and only around chunks that produced events
+    audio_writer = AudioWriter(
+        audio_manager,
+        policy=AudioStorageConfig.RETENTION,
+        threshold=AudioStorageConfig.RETENTION_THRESHOLD,
+        window=AudioStorageConfig.RETENTION_WINDOW,
+        workers=PipelineConfig.STORAGE_WORKERS,
+        batch_size=AudioStorageConfig.WRITE_BATCH_SIZE,
+        queue_size=AudioStorageConfig.WRITE_QUEUE_SIZE
+    )
+
+    # Capture writes straight into a preallocated ring buffer; the processing
+    # thread reads fixed-size (optionally overlapping) windows out of it
+    audio_buffer = AudioRingBuffer(
+        capacity=AudioConfig.RING_BUFFER_SIZE,
+        window_size=AudioConfig.CHUNK_SIZE,
+        hop_size=AudioConfig.HOP_SIZE,
+        sample_rate=AudioConfig.SAMPLE_RATE,
+        # Replaying faster than real time has no wall clock to follow
+        resync_threshold=None if AudioConfig.SOURCE and not AudioConfig.SOURCE_REALTIME else AudioConfig.CLOCK_RESYNC_THRESHOLD
+    )
+    event_storage = get_event_storage()
+
+    # Cheap checks first: the activity gate decides which chunks VAD and YAMNet run on
+    cascade = build_cascade()
+    # The stage handlers; YAMNet is handed over once it has loaded
+    processor = ChunkProcessor(cascade, speech_detector, speech_recognizer, audio_writer, event_storage)
+    pipeline = processor.build_pipeline()
 
     def audio_callback(indata, frames, time_info, status):
-        if status:
-            logger.error(f"Audio stream status: {status}")
-
-        with buffer_lock:
-            # Flatten indata and add to buffer
-            audio_buffer.extend(indata.copy().flatten())
-
-            # Check if buffer has enough samples for CHUNK_SIZE
-            while len(audio_buffer) >= CHUNK_SIZE:
-                # Extract a chunk
-                chunk = np.array(audio_buffer[:CHUNK_SIZE])
-                del audio_buffer[:CHUNK_SIZE]
-
-                # Enqueue the chunk for processing
-                audio_queue.put(chunk)
+        with capture_callback_seconds.time():
+            capture_blocks.inc()
+            if status:
+                capture_status_errors.inc()
+                logger.error(f"Audio stream status: {status}")
+
+            audio_buffer.write(indata, captured_at=datetime.utcnow())
+
+    # Read from the services whenever /api/metrics is scraped
+    metrics.gauge_callback('alog_pipeline_queue_depth', 'Chunks waiting in each stage queue', pipeline.queue_depths, ('stage',))
+    metrics.gauge_callback('alog_pipeline_workers_alive', 'Live worker threads per stage', pipeline.workers_alive, ('stage',))
+    metrics.counter_callback('alog_pipeline_dropped_total', 'Chunks dropped by the drop_oldest policy', lambda: pipeline.dropped)
+    metrics.counter_callback('alog_pipeline_degraded_total', 'Chunks that skipped optional stages', lambda: pipeline.degraded)
+    metrics.gauge_callback('alog_audio_buffer_samples', 'Captured samples waiting in the ring buffer', audio_buffer.available)
+    metrics.counter_callback(
+        'alog_audio_buffer_overrun_samples_total', 'Samples lost because the ring buffer was full',
+        lambda: audio_buffer.overruns
+    )
+    metrics.counter_callback(
+        'alog_audio_chunks_total', 'Processed chunks whose audio was kept or skipped by the retention policy',
+        lambda: {('kept',): audio_writer.kept, ('skipped',): audio_writer.skipped}, ('outcome',)
+    )
+    metrics.gauge_callback('alog_event_write_queue_depth', 'Events waiting for the database writer', event_storage.pending)
+    metrics.gauge_callback('alog_threads', 'Live threads in the process', threading.active_count)
 
     def process_audio():
-        while True:
-            chunk = audio_queue.get()
-            if chunk is None:
-                break  # Exit the thread
-
-            # Ensure chunk is numpy array of float32
-            if chunk.dtype != np.float32:
-                chunk = chunk.astype(np.float32)
-
-            # Store audio chunk
-            audio_id = audio_manager.store_audio_chunk(chunk)
-
-            # Process events in a separate thread
-            threading.Thread(target=process_events, args=(chunk, audio_id)).start()
-
-            audio_queue.task_done()
-
-    def process_events(chunk, audio_id):
-        # Detect speech
-        is_speech = speech_detector.detect(chunk)
-
-        # Classify sound
-        sound_classifier.classify(chunk, audio_id)
-
-        if is_speech:
-            # Recognize speech
-            speech_recognizer.recognize(chunk, audio_id, 'en')
-        else:
-            logger.debug("No speech detected.")
-
-        # Log events to console
-        logger.info(f"Processed audio chunk: {audio_id}")
-
-    # Start the audio processing thread
+        while not stop_event.is_set():
+            window = audio_buffer.read_timed_window(timeout=1.0)
+            if window is None:
+                continue
+
+            # One shared chunk object per window; stages reuse its cached conversions.
+            # Its time comes from its sample position, so frame times don't jitter with reads
+            captured_at, samples = window
+            with submit_seconds.time():
+                pipeline.submit(AudioChunk(samples, AudioConfig.SAMPLE_RATE, captured_at))
+
+    # Capture starts once the models it needs are ready; /api/health reports progress until then
+    logger.info("Waiting for models to load...")
+    model_loader.wait()
+    processor.sound_classifier = model_loader.get('yamnet')
+    if model_loader.failed():
+        logger.error(f"Starting without models that failed to load: {', '.join(model_loader.failed())}")
+    if stop_event.is_set():
+        event_storage.close()
+        return
+
+    # Start the storage and pipeline workers and the audio processing thread
+    audio_writer.start()
+    pipeline.start()
     processing_thread = threading.Thread(target=process_audio, daemon=True)
     processing_thread.start()
 
     audio_capture.start_stream(callback=audio_callback)
 
-    # Keep the main thread alive
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        # Clean up on exit
-        audio_queue.put(None)
-        processing_thread.join()
-        audio_capture.stop_stream()
+    # Run until SIGINT/SIGTERM, then drain everything captured so far to disk
+    stop_event.wait()
+    logger.info("Stopping services...")
+    audio_buffer.close()
+    processing_thread.join()
+    audio_capture.stop_stream()
+    pipeline.stop()
+    # Sounds still going on when we stop end here
+    processor.flush()
+    audio_writer.stop()
+    logger.info(f"Compute cascade: {cascade.summary()}")
+    event_storage.close()
+    logger.info("Services stopped.")
 
 if __name__ == '__main__':
+    stop_event = threading.Event()
+
+    # Signals only reach the main thread, which is busy serving Flask: ask the services
+    # thread to shut down and leave the server loop, then wait for the shutdown to finish
+    def handle_signal(signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}, shutting down")
+        stop_event.set()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
     # Start the services
-    threading.Thread(target=start_services).start()
+    services_thread = threading.Thread(target=start_services, args=(stop_event,), name='services')
+    services_thread.start()
 
     # Run the Flask app on all interfaces
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    try:
+        app.run(host='0.0.0.0', port=5000, debug=False)
+    finally:
+        stop_event.set()
+        services_thread.join()
\ No newline at end of file
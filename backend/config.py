@@ -1,12 +1,235 @@
 # backend/config.py
 
 import os
+import logging
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 DATABASE_PATH = os.path.join(BASE_DIR, 'database', 'events.db')
 DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
 
+MODELS_DIR = os.path.join(os.path.dirname(BASE_DIR), 'models')
+
+# Database configuration
+class DatabaseConfig:
+    # Queue events and insert them in batches from a background writer
+    WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', '1') == '1'
+
+    # A batch is written after this many seconds or this many rows, whichever comes first
+    BATCH_INTERVAL = float(os.getenv('DB_BATCH_INTERVAL', '1.0'))
+    BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', '200'))
+
+    # SQLite connection pragmas
+    JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+    SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+    CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '8192'))
+    BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+
+    # Connection pool shared by the whole process
+    POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+
+# REST API configuration
+class ApiConfig:
+    # Events returned per page by /api/events when no limit is given, and the largest limit accepted
+    DEFAULT_PAGE_SIZE = int(os.getenv('API_DEFAULT_PAGE_SIZE', '500'))
+    MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '2000'))
+
+    # Responses for time ranges that ended at least CLOSED_RANGE_DELAY seconds ago
+    # cannot change any more and are cached for CACHE_TTL seconds. Events are stored when they
+    # end but timestamped at their onset, so when unset the delay is derived from the longest
+    # sound event or utterance (see api.endpoints.closed_range_delay)
+    CACHE_TTL = float(os.getenv('API_CACHE_TTL', '60'))
+    CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', '64'))
+    CLOSED_RANGE_DELAY = float(os.environ['API_CLOSED_RANGE_DELAY']) if os.getenv('API_CLOSED_RANGE_DELAY') else None
+
+    # JSON responses at least this many bytes are gzip-compressed for clients that accept it
+    GZIP_MIN_SIZE = int(os.getenv('API_GZIP_MIN_SIZE', '1024'))
+    GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', '5'))
+
+    # Seconds of audio served before and after an event by /api/events/<id>/clip by default,
+    # and the longest clip that may be requested
+    CLIP_BEFORE = float(os.getenv('API_CLIP_BEFORE', '5'))
+    CLIP_AFTER = float(os.getenv('API_CLIP_AFTER', '5'))
+    CLIP_MAX_DURATION = float(os.getenv('API_CLIP_MAX_DURATION', '120'))
+
+    # Recently served WAV files are kept on disk so repeated and Range requests are plain file reads
+    CLIP_CACHE_DIR = os.getenv('API_CLIP_CACHE_DIR', 'audio_clips')
+    CLIP_CACHE_ENTRIES = int(os.getenv('API_CLIP_CACHE_ENTRIES', '32'))
+
+# Stored audio configuration
+class AudioStorageConfig:
+    # Segment codec: 'pcm' (raw 16-bit, servable straight from disk) or 'zlib' (lossless, smaller)
+    CODEC = os.getenv('AUDIO_STORAGE_CODEC', 'pcm')
+
+    # Which chunks to keep: 'events' (only around detected events) or 'all'
+    RETENTION = os.getenv('AUDIO_RETENTION', 'events')
+
+    # Minimum event confidence that makes a chunk worth keeping (speech always qualifies)
+    RETENTION_THRESHOLD = float(os.getenv('AUDIO_RETENTION_THRESHOLD', '0.3'))
+
+    # Also keep chunks captured within this many seconds before or after a kept one
+    RETENTION_WINDOW = float(os.getenv('AUDIO_RETENTION_WINDOW', '5'))
+
+    # Chunks handed to the storage workers at once, and how many may wait for them
+    WRITE_BATCH_SIZE = int(os.getenv('AUDIO_WRITE_BATCH_SIZE', '8'))
+    WRITE_QUEUE_SIZE = int(os.getenv('AUDIO_WRITE_QUEUE_SIZE', '64'))
+
+    # Stored audio is deleted an hour at a time once it is older than MAX_AGE_HOURS, or
+    # oldest-first while the store uses more than MAX_DISK_MB (0 disables the quota)
+    MAX_AGE_HOURS = float(os.getenv('AUDIO_MAX_AGE_HOURS', '24'))
+    MAX_DISK_MB = float(os.getenv('AUDIO_MAX_DISK_MB', '1024'))
+
+    # Seconds between age checks; the quota is also checked after every write
+    CLEANUP_INTERVAL = int(os.getenv('AUDIO_CLEANUP_INTERVAL', '300'))
+
+# Audio capture configuration
+class AudioConfig:
+    SAMPLE_RATE = 16000
+
+    # Length of the window handed to the processing pipeline, in seconds
+    CHUNK_DURATION = float(os.getenv('AUDIO_CHUNK_DURATION', '3'))
+
+    # Distance between the starts of consecutive windows, in seconds.
+    # A hop shorter than CHUNK_DURATION gives overlapping (sliding) windows.
+    HOP_DURATION = float(os.getenv('AUDIO_HOP_DURATION', str(CHUNK_DURATION)))
+
+    # Replay recordings instead of capturing from the microphone: comma-separated WAV files,
+    # directories of them or an audio_chunks store. Paced in real time unless SOURCE_REALTIME=0
+    SOURCE = os.getenv('AUDIO_SOURCE', '')
+    SOURCE_REALTIME = os.getenv('AUDIO_SOURCE_REALTIME', '1') == '1'
+
+    # Chunks are timestamped from their sample position; re-anchor that clock to the wall clock
+    # when they drift apart by more than this many seconds (e.g. after the device dropped audio)
+    CLOCK_RESYNC_THRESHOLD = float(os.getenv('AUDIO_CLOCK_RESYNC_THRESHOLD', '0.5'))
+
+    # Capacity of the capture ring buffer, in seconds
+    RING_BUFFER_DURATION = float(os.getenv('AUDIO_RING_BUFFER_DURATION', '30'))
+
+    CHUNK_SIZE = int(SAMPLE_RATE * CHUNK_DURATION)
+    HOP_SIZE = int(SAMPLE_RATE * HOP_DURATION)
+    RING_BUFFER_SIZE = int(SAMPLE_RATE * RING_BUFFER_DURATION)
+
+# Sound classifier (YAMNet) configuration
+class ClassifierConfig:
+    # Inference engine: 'savedmodel' (full TensorFlow) or 'tflite'
+    ENGINE = os.getenv('CLASSIFIER_ENGINE', 'savedmodel')
+
+    SAVED_MODEL_PATH = os.getenv('YAMNET_SAVED_MODEL_PATH', os.path.join(MODELS_DIR, 'yamnet'))
+    TFLITE_MODEL_PATH = os.getenv(
+        'YAMNET_TFLITE_MODEL_PATH',
+        os.path.join(MODELS_DIR, 'yamnet', 'yamnet_optimized.tflite')
+    )
+    CLASS_MAP_PATH = os.path.join(MODELS_DIR, 'yamnet', 'assets', 'yamnet_class_map.csv')
+
+    # Interpreter threads for the TFLite engine
+    TFLITE_THREADS = int(os.getenv('CLASSIFIER_TFLITE_THREADS', '2'))
+
+    # Turn YAMNet's per-frame scores into one event per continuous occurrence of a sound
+    # (with onset and duration) instead of up to five events per chunk
+    SEGMENTATION = os.getenv('CLASSIFIER_SEGMENTATION', '1') == '1'
+
+    # Hysteresis: a sound starts when its frame score reaches ON_THRESHOLD and continues
+    # while it stays at or above OFF_THRESHOLD
+    ON_THRESHOLD = float(os.getenv('CLASSIFIER_ON_THRESHOLD', '0.3'))
+    OFF_THRESHOLD = float(os.getenv('CLASSIFIER_OFF_THRESHOLD', '0.15'))
+
+    # Seconds below OFF_THRESHOLD before a sound is considered over
+    HANGOVER = float(os.getenv('CLASSIFIER_HANGOVER', '1.0'))
+
+    # Occurrences shorter than this many seconds are discarded
+    MIN_EVENT_DURATION = float(os.getenv('CLASSIFIER_MIN_EVENT_DURATION', '0.48'))
+
+    # Long sounds are written out (and a new occurrence begun) every MAX_EVENT_DURATION seconds
+    MAX_EVENT_DURATION = float(os.getenv('CLASSIFIER_MAX_EVENT_DURATION', '300'))
+
+    @classmethod
+    def model_path(cls, engine):
+        return cls.TFLITE_MODEL_PATH if engine == 'tflite' else cls.SAVED_MODEL_PATH
+
+    @classmethod
+    def engine_options(cls, engine):
+        return {'num_threads': cls.TFLITE_THREADS} if engine == 'tflite' else {}
+
+# Speech recognition (Vosk) configuration
+class SpeechConfig:
+    # Vosk models live in VOSK_MODEL_DIR/<language>
+    VOSK_MODEL_DIR = os.getenv('VOSK_MODEL_DIR', os.path.join(MODELS_DIR, 'vosk'))
+    LANGUAGES = [lang.strip() for lang in os.getenv('SPEECH_LANGUAGES', 'en,ru').split(',') if lang.strip()]
+
+    # Loaded at startup; the other languages are loaded the first time they are asked for
+    PRELOAD_LANGUAGES = [lang.strip() for lang in os.getenv('SPEECH_PRELOAD_LANGUAGES', 'en').split(',') if lang.strip()]
+
+    # Language to recognize, or 'auto' to pick one of LANGUAGES per utterance by word confidence
+    LANGUAGE = os.getenv('SPEECH_LANGUAGE', 'en')
+
+    # In auto mode the detected language sticks; the others are only tried again when its mean
+    # word confidence drops below this, or after this many seconds without speech
+    AUTO_MIN_CONFIDENCE = float(os.getenv('SPEECH_AUTO_MIN_CONFIDENCE', '0.75'))
+    AUTO_STICKY_TIMEOUT = float(os.getenv('SPEECH_AUTO_STICKY_TIMEOUT', '300'))
+
+    # Threads decoding languages concurrently in auto mode (0: one per language)
+    AUTO_WORKERS = int(os.getenv('SPEECH_AUTO_WORKERS', '0'))
+
+    # Keep one recognizer alive across consecutive speech chunks instead of one per chunk
+    STREAMING = os.getenv('SPEECH_STREAMING', '1') == '1'
+
+    # Samples fed to the recognizer per call; partial results are checked after each block
+    STREAM_BLOCK_SIZE = int(os.getenv('SPEECH_STREAM_BLOCK_SIZE', '8000'))
+
+    # Force an utterance to be finalized after this many seconds of continuous speech
+    MAX_UTTERANCE_DURATION = float(os.getenv('SPEECH_MAX_UTTERANCE_DURATION', '30'))
+
+    # VAD frame length in ms (webrtcvad accepts 10, 20 or 30)
+    VAD_FRAME_DURATION = int(os.getenv('VAD_FRAME_DURATION', '30'))
+
+    # Keep the speech mask set for this many ms after voiced frames stop
+    VAD_HANGOVER = int(os.getenv('VAD_HANGOVER', '300'))
+
+    # Voiced runs shorter than this many ms are treated as noise
+    VAD_MIN_SPEECH_DURATION = int(os.getenv('VAD_MIN_SPEECH_DURATION', '90'))
+
+# Compute cascade: cheap checks decide which chunks the models run on
+class CascadeConfig:
+    ENABLED = os.getenv('CASCADE_ENABLED', '1') == '1'
+
+    # Activity gate (stage one): fires on frames this many dB above the adaptive noise floor,
+    # or on a spectral-flux onset (mean dB rise per band) in a frame FLUX_MARGIN_DB above it
+    ENERGY_MARGIN_DB = float(os.getenv('CASCADE_ENERGY_MARGIN_DB', '10'))
+    FLUX_THRESHOLD_DB = float(os.getenv('CASCADE_FLUX_THRESHOLD_DB', '3'))
+    FLUX_MARGIN_DB = float(os.getenv('CASCADE_FLUX_MARGIN_DB', '3'))
+    # Never fire below this level (dBFS), however quiet the room
+    MIN_LEVEL_DB = float(os.getenv('CASCADE_MIN_LEVEL_DB', '-65'))
+    # Seconds for the noise floor to follow a louder background
+    FLOOR_TIME_CONSTANT = float(os.getenv('CASCADE_FLOOR_TIME_CONSTANT', '30'))
+    # Seconds the gate stays open after it last fired
+    HANGOVER = float(os.getenv('CASCADE_HANGOVER', '2'))
+
+    # Vosk runs only when VAD hears speech and a YAMNet speech class scores at least this
+    SPEECH_THRESHOLD = float(os.getenv('CASCADE_SPEECH_THRESHOLD', '0.2'))
+    # YAMNet class indices counted as speech (Speech, Child speech, Conversation, Narration)
+    SPEECH_CLASSES = [int(i) for i in os.getenv('CASCADE_SPEECH_CLASSES', '0,1,2,3').split(',') if i.strip()]
+
+# Processing pipeline configuration
+class PipelineConfig:
+    # Worker threads per stage (storage workers write kept audio after classification)
+    STORAGE_WORKERS = int(os.getenv('PIPELINE_STORAGE_WORKERS', '1'))
+    VAD_WORKERS = int(os.getenv('PIPELINE_VAD_WORKERS', '1'))
+    CLASSIFIER_WORKERS = int(os.getenv('PIPELINE_CLASSIFIER_WORKERS', '1'))
+    RECOGNIZER_WORKERS = int(os.getenv('PIPELINE_RECOGNIZER_WORKERS', '1'))
+
+    # Maximum number of chunks waiting in front of each stage
+    QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '4'))
+
+    # What to do when a stage falls behind: block, drop_oldest or degrade (skip recognition)
+    OVERLOAD_POLICY = os.getenv('PIPELINE_OVERLOAD_POLICY', 'block')
+
+    # Models are loaded in the background on this many threads, after the web server is up
+    MODEL_LOAD_WORKERS = int(os.getenv('PIPELINE_MODEL_LOAD_WORKERS', '3'))
+
+    # Run one inference on silence per model once it is loaded
+    MODEL_WARM_UP = os.getenv('PIPELINE_MODEL_WARM_UP', '1') == '1'
+
 # Logging configuration
 # You can override these with environment variables
 class LogConfig:
@@ -21,6 +244,34 @@ class LogConfig:
     # List of enabled log levels - can be overridden by ENABLED_LOG_LEVELS env var
     # Format: comma-separated list of levels, e.g. "EVENT,SPEECH,ERROR"
     DEFAULT_ENABLED_LEVELS = os.getenv('ENABLED_LOG_LEVELS', 'EVENT,SPEECH,ERROR')
+
+    # Hand records to a background listener so logging threads never wait on file or console I/O
+    ASYNC = os.getenv('LOG_ASYNC', '1') == '1'
+
+    # logs/app.log is rotated at FILE_MAX_MB, keeping FILE_BACKUPS older files (gzipped if FILE_COMPRESS)
+    FILE_MAX_MB = float(os.getenv('LOG_FILE_MAX_MB', '10'))
+    FILE_BACKUPS = int(os.getenv('LOG_FILE_BACKUPS', '5'))
+    FILE_COMPRESS = os.getenv('LOG_FILE_COMPRESS', '1') == '1'
+
+    # Structured JSON-lines archive (logs/archive) searched by /api/logs: a new file every
+    # ARCHIVE_FILE_MB, the newest ARCHIVE_FILES kept, one index entry per ARCHIVE_INDEX_KB written
+    ARCHIVE = os.getenv('LOG_ARCHIVE', '1') == '1'
+    ARCHIVE_FILE_MB = float(os.getenv('LOG_ARCHIVE_FILE_MB', '20'))
+    ARCHIVE_FILES = int(os.getenv('LOG_ARCHIVE_FILES', '10'))
+    ARCHIVE_INDEX_KB = int(os.getenv('LOG_ARCHIVE_INDEX_KB', '64'))
+
+    # Records kept for /ws/logs clients to read from (and replay on reconnect)
+    WS_BUFFER_SIZE = int(os.getenv('LOG_WS_BUFFER_SIZE', '5000'))
+
+    # Records sent to a client are coalesced into at most one frame per interval (seconds)
+    WS_SEND_INTERVAL = float(os.getenv('LOG_WS_SEND_INTERVAL', '0.25'))
+    WS_MAX_BATCH = int(os.getenv('LOG_WS_MAX_BATCH', '500'))
+
+    # Records replayed to a new connection unless it asks for a different number
+    WS_REPLAY = int(os.getenv('LOG_WS_REPLAY', '200'))
+
+    # Seconds of silence after which an empty keep-alive frame is sent
+    WS_KEEPALIVE = float(os.getenv('LOG_WS_KEEPALIVE', '30'))
     
     @classmethod
     def get_enabled_levels(cls):
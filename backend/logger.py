@@ -1,10 +1,17 @@
 # backend/logger.py
 
+import atexit
+import gzip
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
 from datetime import datetime
 import colorama
 from colorama import Fore, Style
+from config import LogConfig
+from services.log_archive import JSONLinesHandler
 
 # Initialize colorama for cross-platform color support
 colorama.init()
@@ -210,11 +217,48 @@ class LevelFilter(logging.Filter):
                 
         return cls(enabled_levels)
 
-def setup_logger():
+def gzip_rotator(source, dest):
+    """Rotate by compressing the full log file instead of renaming it."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def gzip_namer(name):
+    return name + '.gz'
+
+# Background listener doing the formatting and I/O in async mode, see setup_logger
+_listener = None
+
+def attach_handler(handler):
+    """
+    Add a handler next to the file and console handlers: on the listener thread in async
+    mode, on the root logger otherwise.
+    """
+    if _listener is not None:
+        _listener.handlers = _listener.handlers + (handler,)
+    else:
+        logging.getLogger().addHandler(handler)
+
+def shutdown_logger():
+    """Write out queued records and stop the listener thread (async mode only)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def setup_logger(log_dir='logs', async_mode=None, stream=None):
     """
     Set up the logging system with custom formatting and handlers.
     Now supports configurable log levels through ENABLED_LOG_LEVELS environment variable.
+
+    In async mode (LOG_ASYNC, on by default) the root logger only gets a QueueHandler:
+    producers just enqueue the record, and one listener thread formats it and writes it
+    to the file, the console and any handler added with attach_handler.
     """
+    global _listener
+    if async_mode is None:
+        async_mode = LogConfig.ASYNC
+
     # Register custom log levels
     logging.addLevelName(CustomLogLevels.SPEECH, 'SPEECH')
     logging.addLevelName(CustomLogLevels.EVENT, 'EVENT')
@@ -230,10 +274,17 @@ def setup_logger():
     level_filter = LevelFilter.from_env_string(os.getenv('ENABLED_LOG_LEVELS'))
 
     # Ensure logs directory exists
-    os.makedirs('logs', exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
 
-    # Configure file handler for persistent logging - keeps all levels
-    fh = logging.FileHandler('logs/app.log')
+    # Configure file handler for persistent logging - keeps all levels, rotated by size
+    fh = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, 'app.log'),
+        maxBytes=int(LogConfig.FILE_MAX_MB * 1024 * 1024),
+        backupCount=LogConfig.FILE_BACKUPS
+    )
+    if LogConfig.FILE_COMPRESS:
+        fh.rotator = gzip_rotator
+        fh.namer = gzip_namer
     fh.setLevel(logging.DEBUG)
     file_formatter = logging.Formatter(
         '%(asctime)s | %(levelname)-7s | %(message)s',
@@ -242,23 +293,45 @@ def setup_logger():
     fh.setFormatter(file_formatter)
 
     # Configure console handler with color formatting and level filtering
-    ch = logging.StreamHandler()
+    ch = logging.StreamHandler(stream)
     ch.setLevel(logging.DEBUG)
     ch.setFormatter(ColorFormatter())
     ch.addFilter(level_filter)  # Add the level filter only to console output
 
+    handlers = [fh, ch]
+
+    # Structured archive with a time index, read back by /api/logs
+    if LogConfig.ARCHIVE:
+        jh = JSONLinesHandler(
+            os.path.join(log_dir, 'archive'),
+            max_bytes=int(LogConfig.ARCHIVE_FILE_MB * 1024 * 1024),
+            max_files=LogConfig.ARCHIVE_FILES,
+            index_interval=LogConfig.ARCHIVE_INDEX_KB * 1024
+        )
+        jh.setLevel(logging.DEBUG)
+        handlers.append(jh)
+
     # Suppress verbose logs from external libraries
     for logger_name in ['pydub.converter', 'VoskAPI', 'absl', 'werkzeug']:
         logging.getLogger(logger_name).setLevel(logging.WARNING)
 
     # Remove any existing handlers to prevent duplication
+    shutdown_logger()
     logger.handlers.clear()
     
-    # Add both handlers to the root logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    if async_mode:
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logger)
+    else:
+        # Add the handlers to the root logger
+        for handler in handlers:
+            logger.addHandler(handler)
 
     # Log the enabled levels for confirmation
-    logger.info(f"Logger initialized with levels: {os.getenv('ENABLED_LOG_LEVELS', 'EVENT,SPEECH,ERROR')} (default)")
+    logger.info(f"Logger initialized with levels: {os.getenv('ENABLED_LOG_LEVELS', 'EVENT,SPEECH,ERROR')} (default)"
+                f"{' in async mode' if async_mode else ''}")
 
     return logger
\ No newline at end of file
@@ -1,6 +1,6 @@
 # backend/models/event.py
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -17,6 +17,13 @@ class Event(Base):
     meta_info = Column(Text)
     audio_id = Column(String(100))
 
+    __table_args__ = (
+        # Time-range scans and keyset pagination walk (timestamp, id)
+        Index('ix_events_timestamp_id', 'timestamp', 'id'),
+        Index('ix_events_type_timestamp', 'event_type', 'timestamp'),
+        Index('ix_events_label_timestamp', 'label', 'timestamp'),
+    )
+
     def __repr__(self):
         return f"<Event(id={self.id}, type={self.event_type}, label={self.label}, confidence={self.confidence})>"
 
@@ -0,0 +1,49 @@
+# backend/models/rollup.py
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, UniqueConstraint, Index
+from models.event import Base
+
+class RollupMixin:
+    """
+    Pre-aggregated event counts for one time bucket and one key.
+
+    `dimension` says what `key` is: a sound 'label', a YAMNet 'category' group or a
+    speech 'language'. Mean confidence is confidence_sum / confidence_count, kept as two
+    columns so buckets can be updated incrementally and merged across buckets.
+    """
+    id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, nullable=False)  # start of the minute/hour
+    dimension = Column(String(20), nullable=False)
+    key = Column(Text, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    confidence_count = Column(Integer, nullable=False, default=0)
+    max_confidence = Column(Float)
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.confidence_count if self.confidence_count else None
+
+    def to_dict(self):
+        return {
+            'bucket': self.bucket.isoformat(),
+            'dimension': self.dimension,
+            'key': self.key,
+            'count': self.count,
+            'max_confidence': self.max_confidence,
+            'mean_confidence': self.mean_confidence,
+        }
+
+class MinuteRollup(RollupMixin, Base):
+    __tablename__ = 'event_rollups_minute'
+    __table_args__ = (
+        UniqueConstraint('dimension', 'key', 'bucket', name='uq_event_rollups_minute'),
+        Index('ix_event_rollups_minute_dimension_bucket', 'dimension', 'bucket'),
+    )
+
+class HourRollup(RollupMixin, Base):
+    __tablename__ = 'event_rollups_hour'
+    __table_args__ = (
+        UniqueConstraint('dimension', 'key', 'bucket', name='uq_event_rollups_hour'),
+        Index('ix_event_rollups_hour_dimension_bucket', 'dimension', 'bucket'),
+    )
\ No newline at end of file
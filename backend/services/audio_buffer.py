@@ -0,0 +1,146 @@
+# backend/services/audio_buffer.py
+
+import threading
+import logging
+from datetime import timedelta
+import numpy as np
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity float32 ring buffer between the PortAudio callback and the processing thread.
+
+    The callback copies each incoming block straight into preallocated storage, so no Python
+    objects are created per sample. Readers get windows of `window_size` samples; consecutive
+    windows start `hop_size` samples apart, which gives overlapping (sliding) windows when
+    `hop_size < window_size` without duplicating the shared samples.
+
+    Every window is returned as its own copy. Windows go on into the processing pipeline,
+    which can hold more audio in flight than the ring does, so a view into the ring storage
+    could be overwritten by the writer before a later stage (or the audio writer) reads it.
+
+    Windows are timestamped from their sample position rather than from when they are read,
+    so consecutive windows are exactly `hop_size` samples apart in time however late the
+    reader gets to them. The sample clock is anchored to the wall-clock times passed to
+    `write` and re-anchored when it drifts from them by more than `resync_threshold` seconds
+    (e.g. after the device dropped samples); None anchors it once, for faster-than-real-time
+    replay.
+    """
+    def __init__(self, capacity, window_size, hop_size=None, sample_rate=16000, resync_threshold=0.5):
+        hop_size = window_size if hop_size is None else hop_size
+        if not 0 < hop_size <= window_size <= capacity:
+            raise ValueError("Ring buffer sizes must satisfy 0 < hop_size <= window_size <= capacity")
+
+        self.capacity = capacity
+        self.window_size = window_size
+        self.hop_size = hop_size
+        self.sample_rate = sample_rate
+        self.resync_threshold = resync_threshold
+        self.logger = logging.getLogger('AudioRingBuffer')
+
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        # Monotonic sample counters; positions in storage are taken modulo capacity
+        self._write_pos = 0
+        self._read_pos = 0
+        self._closed = False
+        # Wall-clock time of sample position 0
+        self._origin = None
+        self._lock = threading.Lock()
+        self._window_ready = threading.Condition(self._lock)
+
+        # Number of samples discarded because the reader fell behind
+        self.overruns = 0
+
+    def write(self, indata, captured_at=None):
+        """
+        Append a block of samples. Called from the audio callback, so it never blocks on the reader:
+        if the reader has fallen behind, the oldest unread samples are dropped in whole hops.
+        `captured_at` is the wall-clock time (UTC) the block's last sample was captured.
+        """
+        samples = indata[:, 0] if indata.ndim > 1 else indata
+        if len(samples) > self.capacity:
+            self._count_overrun(len(samples) - self.capacity)
+            samples = samples[-self.capacity:]
+        count = len(samples)
+
+        with self._lock:
+            start = self._write_pos % self.capacity
+            first = min(count, self.capacity - start)
+            self._buffer[start:start + first] = samples[:first]
+            if first < count:
+                self._buffer[:count - first] = samples[first:]
+            self._write_pos += count
+
+            overflow = self._write_pos - self._read_pos - self.capacity
+            if overflow > 0:
+                skipped = -(-overflow // self.hop_size) * self.hop_size
+                self._read_pos += skipped
+                self.overruns += skipped
+
+            if captured_at is not None:
+                self._anchor(captured_at)
+
+            if self._write_pos - self._read_pos >= self.window_size:
+                self._window_ready.notify_all()
+
+        if overflow > 0:
+            self.logger.warning(f"Audio ring buffer overrun, dropped {skipped} samples")
+
+    def read_window(self, timeout=None):
+        """
+        Return the next window, waiting up to `timeout` seconds for enough samples.
+        Returns None on timeout or once the buffer is closed.
+        """
+        result = self.read_timed_window(timeout)
+        return None if result is None else result[1]
+
+    def read_timed_window(self, timeout=None):
+        """
+        Like read_window, but returns (captured_at, window), with the wall-clock time of the
+        window's first sample (None until a write has given the buffer a time), or None.
+        """
+        with self._window_ready:
+            ready = self._window_ready.wait_for(
+                lambda: self._closed or self._write_pos - self._read_pos >= self.window_size,
+                timeout
+            )
+            if not ready or self._closed:
+                return None
+
+            start = self._read_pos % self.capacity
+            end = start + self.window_size
+            if end <= self.capacity:
+                window = self._buffer[start:end].copy()
+            else:
+                window = np.concatenate((self._buffer[start:], self._buffer[:end - self.capacity]))
+            captured_at = None
+            if self._origin is not None:
+                captured_at = self._origin + timedelta(seconds=self._read_pos / self.sample_rate)
+            self._read_pos += self.hop_size
+            return captured_at, window
+
+    def available(self):
+        """Number of buffered samples not yet consumed by a hop."""
+        with self._lock:
+            return self._write_pos - self._read_pos
+
+    def close(self):
+        """Wake up any waiting reader; subsequent reads return None."""
+        with self._lock:
+            self._closed = True
+            self._window_ready.notify_all()
+
+    def _anchor(self, captured_at):
+        # Called with the lock held, after the block has been counted into _write_pos
+        origin = captured_at - timedelta(seconds=self._write_pos / self.sample_rate)
+        if self._origin is None:
+            self._origin = origin
+        elif self.resync_threshold is not None:
+            drift = (origin - self._origin).total_seconds()
+            if abs(drift) > self.resync_threshold:
+                self._origin = origin
+                self.logger.warning(f"Audio clock drifted {drift:+.2f}s from the wall clock, re-anchored")
+
+    def _count_overrun(self, count):
+        with self._lock:
+            self.overruns += count
+        self.logger.warning(f"Audio block larger than ring buffer, dropped {count} samples")
\ No newline at end of file
@@ -1,6 +1,5 @@
 # backend/services/audio_capture.py
 
-import sounddevice as sd
 import logging
 
 # Audio settings
@@ -17,6 +16,8 @@ class AudioCapture:
         self.logger = logging.getLogger('AudioCapture')
 
     def start_stream(self, callback):
+        # Imported here so replaying files works on machines without PortAudio
+        import sounddevice as sd
         self.stream = sd.InputStream(
             samplerate=self.sample_rate,
             channels=self.channels,
@@ -0,0 +1,71 @@
+# backend/services/audio_chunk.py
+
+from functools import cached_property
+import numpy as np
+
+# Full-scale value used for every float <-> int16 conversion in the pipeline
+PCM_SCALE = 32767
+
+class AudioChunk:
+    """
+    One captured window of mono float32 samples, shared by every stage that processes it.
+
+    The derived representations (int16 PCM, raw PCM bytes, peak-normalized float32 and
+    level statistics) are computed on first use and cached, so each conversion happens
+    at most once per chunk no matter how many services need it. Treat all of them as
+    read-only. Concurrent first accesses may compute a value twice, which is harmless.
+    """
+    def __init__(self, samples, sample_rate=16000, captured_at=None):
+        if samples.ndim > 1:
+            samples = np.mean(samples, axis=1)
+        if samples.dtype != np.float32:
+            samples = samples.astype(np.float32)
+        self.samples = samples
+        self.sample_rate = sample_rate
+        # Wall-clock capture time of the first sample (UTC), when known
+        self.captured_at = captured_at
+
+    @classmethod
+    def wrap(cls, audio_data, sample_rate=16000):
+        """Accept either an AudioChunk or a raw float sample array."""
+        if isinstance(audio_data, cls):
+            return audio_data
+        return cls(audio_data, sample_rate)
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    @cached_property
+    def pcm16(self):
+        """Samples as clipped 16-bit PCM."""
+        scaled = self.samples * PCM_SCALE
+        np.clip(scaled, -PCM_SCALE, PCM_SCALE, out=scaled)
+        return scaled.astype(np.int16)
+
+    @cached_property
+    def pcm_bytes(self):
+        """16-bit little-endian PCM bytes, as expected by webrtcvad, Vosk and pydub."""
+        return self.pcm16.tobytes()
+
+    @cached_property
+    def peak(self):
+        if len(self.samples) == 0:
+            return 0.0
+        return float(max(self.samples.max(), -self.samples.min()))
+
+    @cached_property
+    def rms(self):
+        if len(self.samples) == 0:
+            return 0.0
+        return float(np.sqrt(np.dot(self.samples, self.samples) / len(self.samples)))
+
+    @cached_property
+    def normalized(self):
+        """Samples scaled so the peak is at full scale, as fed to YAMNet."""
+        if self.peak > 0:
+            return self.samples / np.float32(self.peak)
+        return self.samples
\ No newline at end of file
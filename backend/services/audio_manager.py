@@ -4,55 +4,155 @@ import os
 import uuid
 import logging
 import time
-from threading import Thread
-from pydub import AudioSegment
+from datetime import datetime, timedelta
+from threading import Lock, Thread
 import numpy as np
+from services.audio_chunk import AudioChunk
+from services.audio_retention import AudioRetention
+from services.event_storage import get_event_storage
+from services.metrics import SERVICE_SECONDS
+from services.segment_store import SegmentedAudioStore, wav_header
+from config import AudioStorageConfig
+
 
 class AudioManager:
-    def __init__(self, storage_path='audio_chunks'):
+    def __init__(self, storage_path='audio_chunks', codec=None):
         self.storage_path = storage_path
         self.logger = logging.getLogger('AudioManager')
         os.makedirs(self.storage_path, exist_ok=True)
+        self.store = SegmentedAudioStore(
+            self.storage_path,
+            codec=codec or AudioStorageConfig.CODEC,
+            sample_rate=16000
+        )
+        self.retention = AudioRetention(
+            self.store,
+            max_age_hours=AudioStorageConfig.MAX_AGE_HOURS,
+            max_bytes=int(AudioStorageConfig.MAX_DISK_MB * 1024 * 1024),
+            on_expire=self.release_expired
+        )
         self.cleanup_thread = Thread(target=self.cleanup_old_files)
         self.cleanup_thread.daemon = True
         self.cleanup_thread.start()
 
-    def store_audio_chunk(self, audio_data):
+    def store_audio_chunk(self, audio_data, audio_id=None):
+        stored = self.store_audio_chunks([(audio_id or str(uuid.uuid4()), audio_data)])
+        return stored[0] if stored else None
+
+    def store_audio_chunks(self, chunks):
+        """Store a batch of (audio_id, audio_data) pairs with one write per segment; returns the stored ids."""
         try:
-            audio_id = str(uuid.uuid4())
-            filepath = os.path.join(self.storage_path, f"{audio_id}.mp3")
-            # Ensure audio_data is int16
-            if audio_data.dtype != np.int16:
-                audio_data = (audio_data * 32767).astype(np.int16)
-            audio_segment = AudioSegment(
-                audio_data.tobytes(),
-                frame_rate=16000,
-                sample_width=2,  # 2 bytes per sample
-                channels=1
-            )
-            audio_segment.export(filepath, format="mp3", bitrate="64k")
-            self.logger.debug(f"Audio chunk stored: {filepath}")
-            return audio_id
+            batch = []
+            for audio_id, audio_data in chunks:
+                # Use the chunk's cached 16-bit PCM unless we were handed int16 samples directly
+                if isinstance(audio_data, np.ndarray) and audio_data.dtype == np.int16:
+                    pcm_bytes = audio_data.tobytes()
+                    captured_at = None
+                else:
+                    chunk = AudioChunk.wrap(audio_data)
+                    pcm_bytes = chunk.pcm_bytes
+                    captured_at = chunk.captured_at
+                batch.append((audio_id, pcm_bytes, captured_at or datetime.utcnow()))
+            with SERVICE_SECONDS.time('audio_manager.store'):
+                locations = self.store.append_many(batch)
+            for (audio_id, _, _), location in zip(batch, locations):
+                self.logger.debug(f"Audio chunk stored: {audio_id} in segment {location.segment} @ {location.offset}")
+            self.retention.check_quota()
+            return [audio_id for audio_id, _, _ in batch]
         except Exception as e:
-            self.logger.error(f"Failed to store audio chunk: {e}")
-            return None
+            self.logger.error(f"Failed to store audio chunks: {e}")
+            return []
 
     def get_audio_chunk(self, audio_id):
-        filepath = os.path.join(self.storage_path, f"{audio_id}.mp3")
-        if os.path.exists(filepath):
-            return filepath
-        else:
-            self.logger.error(f"Audio chunk not found: {audio_id}")
+        """
+        Return (data, mimetype) for a stored chunk: a WAV file built from the segment store,
+        or the original MP3 for chunks written before the segment store existed.
+        """
+        pcm_bytes = self.store.read(audio_id)
+        if pcm_bytes is not None:
+            return wav_header(len(pcm_bytes), self.store.sample_rate) + pcm_bytes, 'audio/wav'
+
+        legacy_path = os.path.join(self.storage_path, f"{audio_id}.mp3")
+        if os.path.exists(legacy_path):
+            with open(legacy_path, 'rb') as f:
+                return f.read(), 'audio/mpeg'
+
+        self.logger.error(f"Audio chunk not found: {audio_id}")
+        return None
+
+    def extract_clip(self, start, end):
+        """
+        WAV audio covering [start, end), stitched from the stored chunks that overlap it.
+
+        Chunk payloads are copied into place at their capture offsets: overlapping windows
+        contribute only the samples not already covered, and spans with no stored audio
+        (silence dropped by the retention policy) are filled with zeros. Nothing is decoded
+        beyond undoing the store's lossless zlib codec. The clip is trimmed to the stored
+        audio, so returns (wav_bytes, clip_start), or None when nothing overlaps the range.
+        """
+        sample_rate = self.store.sample_rate
+        pieces = []
+        for audio_id, location in self.store.chunks_between(start, end):
+            pcm_bytes = self.store.read(audio_id)
+            if pcm_bytes is None:
+                continue
+            chunk_end = location.captured_at + timedelta(seconds=len(pcm_bytes) / 2 / sample_rate)
+            if chunk_end > start:
+                pieces.append((location.captured_at, pcm_bytes))
+        if not pieces:
             return None
 
+        clip_start = max(start, pieces[0][0])
+        clip_end = min(end, max(
+            captured_at + timedelta(seconds=len(pcm_bytes) / 2 / sample_rate) for captured_at, pcm_bytes in pieces
+        ))
+        total = int(round((clip_end - clip_start).total_seconds() * sample_rate))
+        clip = bytearray(total * 2)
+        covered = 0
+        for captured_at, pcm_bytes in pieces:
+            offset = int(round((captured_at - clip_start).total_seconds() * sample_rate))
+            first = max(offset, covered)
+            last = min(offset + len(pcm_bytes) // 2, total)
+            if last <= first:
+                continue
+            clip[first * 2:last * 2] = memoryview(pcm_bytes)[(first - offset) * 2:(last - offset) * 2]
+            covered = last
+        return wav_header(len(clip), sample_rate) + clip, clip_start
+
+    def release_expired(self, expired):
+        """Clear the audio_id of events whose audio was just deleted."""
+        captured = [location.captured_at for location in expired.values()]
+        # Events are stamped with their chunk's capture time; the margin covers clock rounding
+        get_event_storage().clear_audio_ids(
+            expired.keys(),
+            start_time=min(captured) - timedelta(minutes=1),
+            end_time=max(captured) + timedelta(minutes=1)
+        )
+
     def cleanup_old_files(self):
         while True:
+            self.retention.enforce()
+
+            # Chunks stored as individual MP3 files by earlier versions
             now = time.time()
             for filename in os.listdir(self.storage_path):
-                filepath = os.path.join(self.storage_path, filename)
-                if os.path.isfile(filepath):
-                    creation_time = os.path.getctime(filepath)
-                    if now - creation_time > 24 * 3600:
+                if filename.endswith('.mp3'):
+                    filepath = os.path.join(self.storage_path, filename)
+                    if now - os.path.getctime(filepath) > AudioStorageConfig.MAX_AGE_HOURS * 3600:
                         os.remove(filepath)
                         self.logger.info(f"Deleted old audio chunk: {filepath}")
-            time.sleep(3600)  # Check every hour
+            time.sleep(AudioStorageConfig.CLEANUP_INTERVAL)
+
+_shared_manager = None
+_shared_lock = Lock()
+
+def get_audio_manager():
+    """
+    Process-wide AudioManager shared by the pipeline and the API, so there is one segment
+    store, one index and one cleanup thread per process.
+    """
+    global _shared_manager
+    with _shared_lock:
+        if _shared_manager is None:
+            _shared_manager = AudioManager(storage_path='audio_chunks')
+        return _shared_manager
@@ -0,0 +1,63 @@
+# backend/services/audio_retention.py
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+class AudioRetention:
+    """
+    Keeps a SegmentedAudioStore within a maximum age and a disk quota.
+
+    Expiry works on whole hourly segments: every segment whose hour ended more than
+    `max_age_hours` ago is removed, then the oldest remaining segments are removed while the
+    store is over `max_bytes`. The segment currently being written is never removed. Disk usage
+    comes from the store's running total, so checking the quota after each write is free.
+
+    `on_expire` is called with {audio_id: ChunkLocation} for everything removed, so stored
+    events can be detached from audio that no longer exists.
+    """
+    def __init__(self, store, max_age_hours=24, max_bytes=0, on_expire=None):
+        self.store = store
+        self.max_age = timedelta(hours=max_age_hours) if max_age_hours else None
+        self.max_bytes = max_bytes
+        self.on_expire = on_expire
+        self.logger = logging.getLogger('AudioRetention')
+        self._lock = threading.Lock()
+
+    def over_quota(self):
+        return bool(self.max_bytes) and self.store.usage() > self.max_bytes
+
+    def enforce(self, now=None):
+        """Remove expired and over-quota segments. Returns the number of chunks removed."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            expired = {}
+            segments = self.store.segments()
+            current = self.store.segment_name(now)
+
+            if self.max_age is not None:
+                cutoff = now - self.max_age
+                while segments and self.store.segment_start(segments[0]) + timedelta(hours=1) <= cutoff:
+                    segment = segments.pop(0)
+                    expired.update(self.store.remove_segment(segment))
+                    self.logger.info(f"Deleted expired audio segment: {segment}")
+
+            while self.over_quota() and segments and segments[0] < current:
+                segment = segments.pop(0)
+                expired.update(self.store.remove_segment(segment))
+                self.logger.info(
+                    f"Deleted audio segment {segment} to stay within quota "
+                    f"({self.store.usage() / 1e6:.1f} / {self.max_bytes / 1e6:.1f} MB)"
+                )
+
+        if expired and self.on_expire is not None:
+            try:
+                self.on_expire(expired)
+            except Exception as e:
+                self.logger.error(f"Failed to release expired audio references: {e}")
+        return len(expired)
+
+    def check_quota(self):
+        """Cheap check meant to run after every write; only does work when over quota."""
+        if self.over_quota():
+            self.enforce()
@@ -0,0 +1,135 @@
+# backend/services/audio_writer.py
+
+import logging
+import queue
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+RETENTION_POLICIES = ('events', 'all')
+
+# Sentinel that tells a storage worker to exit
+_STOP = object()
+
+class AudioWriter:
+    """
+    Decides which processed chunks are worth keeping and persists them on a pool of
+    background storage workers, so writing audio never holds up the processing pipeline.
+
+    With the 'events' policy a chunk is kept when it is active (VAD found speech in it or a
+    sound event is in progress) or it produced an event at or above `threshold`, along with
+    every chunk captured within `window` seconds before or after such a chunk. Anything else
+    is dropped before it is encoded. Chunks that might still be needed as lead-in for a later
+    event wait in a short pending queue. The 'all' policy keeps every chunk.
+
+    `submit` must be called in capture order (the pipeline's completion callback is).
+    """
+    def __init__(self, audio_manager, policy='events', threshold=0.3, window=5.0,
+                 workers=1, batch_size=8, queue_size=64):
+        if policy not in RETENTION_POLICIES:
+            raise ValueError(f"Unknown audio retention policy: {policy}")
+        self.audio_manager = audio_manager
+        self.policy = policy
+        self.threshold = threshold
+        self.window = timedelta(seconds=window)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.logger = logging.getLogger('AudioWriter')
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        # (chunk, audio_id, start, end) of recent chunks that weren't kept (yet)
+        self._pending = deque()
+        self._keep_until = None
+        self.kept = 0
+        self.skipped = 0
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"audio-writer-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.logger.info(f"Audio writer started: {self.workers} workers, retention policy '{self.policy}'")
+
+    def stop(self):
+        """Write everything already queued and wait for the workers to exit."""
+        self.skipped += len(self._pending)
+        self._pending.clear()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.logger.info(f"Audio writer stopped: {self.kept} chunks kept, {self.skipped} skipped")
+
+    def is_notable(self, events, active=False):
+        if active:
+            return True
+        return any(event.confidence is None or event.confidence >= self.threshold for event in events)
+
+    def submit(self, chunk, audio_id, events, active=False):
+        """
+        Hand over a processed chunk and the events it produced. Returns True when the
+        chunk was queued for storage. Events pointing at a chunk that isn't stored right
+        away lose their audio_id, so no event points at audio that may never be written.
+        (Events that began in an earlier chunk keep pointing at that one.)
+        """
+        if self.policy == 'all':
+            self._write(chunk, audio_id)
+            return True
+
+        start = chunk.captured_at or datetime.utcnow()
+        end = start + timedelta(seconds=chunk.duration)
+
+        if self.is_notable(events, active):
+            # Lead-in: pending chunks that overlap the window before this one
+            while self._pending:
+                pending_chunk, pending_id, _, pending_end = self._pending.popleft()
+                if pending_end >= start - self.window:
+                    self._write(pending_chunk, pending_id)
+                else:
+                    self.skipped += 1
+            self._write(chunk, audio_id)
+            self._keep_until = max(self._keep_until or end, end + self.window)
+            return True
+
+        if self._keep_until is not None and start <= self._keep_until:
+            # Tail after a notable chunk
+            self._write(chunk, audio_id)
+            return True
+
+        for event in events:
+            if event.audio_id == audio_id:
+                event.audio_id = None
+        self._pending.append((chunk, audio_id, start, end))
+        while self._pending and self._pending[0][3] < start - self.window:
+            self._pending.popleft()
+            self.skipped += 1
+        return False
+
+    def _write(self, chunk, audio_id):
+        self.kept += 1
+        self._queue.put((audio_id, chunk))
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self.audio_manager.store_audio_chunks(batch)
+            except Exception as e:
+                self.logger.error(f"Failed to write {len(batch)} audio chunks: {e}")
+            if stop:
+                break
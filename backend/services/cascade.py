@@ -0,0 +1,155 @@
+# backend/services/cascade.py
+
+import threading
+import numpy as np
+from services.audio_chunk import AudioChunk
+from services.metrics import get_metrics
+
+_SKIPPED = get_metrics().counter(
+    'alog_cascade_skipped_total', 'Chunks a model stage did not run on because a cheaper stage ruled it out', ('stage',)
+)
+_GATE_OPEN = get_metrics().counter('alog_cascade_gate_open_total', 'Chunks the activity gate let through')
+_VAD_ONLY = get_metrics().counter(
+    'alog_cascade_vad_only_total', 'Speech chunks sent to recognition on VAD alone because YAMNet had no score for them'
+)
+
+class ActivityGate:
+    """
+    Stage one of the compute cascade: decides from the raw signal whether a chunk could
+    contain anything worth running the models on.
+
+    The chunk is split into short frames and, all vectorized, each frame's energy (dBFS) and
+    spectral flux (mean rise in log band energy from the previous frame) are computed. The gate
+    fires when a frame is `energy_margin` dB above the noise floor, or when the spectrum changes
+    by more than `flux_threshold` dB per band (an onset) in a frame at least `flux_margin` dB
+    above the floor. Nothing quieter than `min_level` dBFS ever fires it.
+
+    The noise floor is the 10th percentile of frame energies: it drops at once when the room
+    gets quieter and rises with a `floor_time_constant` (seconds) when it gets louder, so a
+    steady hum is learned as background. Once fired, the gate stays open for `hangover`
+    seconds so the tail of a sound reaches the models too. Chunks must come in capture order.
+    """
+    def __init__(self, sample_rate=16000, frame_size=512, bands=16, energy_margin=10.0,
+                 flux_threshold=3.0, flux_margin=3.0, min_level=-65.0, floor_time_constant=30.0,
+                 hangover=2.0):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.energy_margin = energy_margin
+        self.flux_threshold = flux_threshold
+        self.flux_margin = flux_margin
+        self.min_level = min_level
+        self.floor_time_constant = floor_time_constant
+        self.hangover = hangover
+        self.noise_floor = None
+        self._open_for = 0.0
+
+        self._window = np.hanning(frame_size).astype(np.float32)
+        # Log-spaced band edges over the rfft bins (skipping DC), for reduceat
+        bins = frame_size // 2 + 1
+        edges = np.unique(np.geomspace(1, bins, bands + 1).astype(int))
+        self._band_edges = edges[:-1]
+
+    def update(self, audio_data):
+        """Feed the next chunk; returns True when the models should run on it."""
+        chunk = AudioChunk.wrap(audio_data, self.sample_rate)
+        num_frames = len(chunk.samples) // self.frame_size
+        if num_frames == 0:
+            return True
+        frames = chunk.samples[:num_frames * self.frame_size].reshape(num_frames, self.frame_size)
+
+        energy = 10 * np.log10(np.einsum('ij,ij->i', frames, frames) / self.frame_size + 1e-12)
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2
+        band_energy = 10 * np.log10(np.add.reduceat(spectrum, self._band_edges, axis=1) + 1e-12)
+        flux = np.zeros(num_frames, dtype=np.float32)
+        flux[1:] = np.clip(np.diff(band_energy, axis=0), 0, None).mean(axis=1)
+
+        quiet = float(np.percentile(energy, 10))
+        if self.noise_floor is None:
+            self.noise_floor = quiet
+            fired = True  # nothing learned yet: let the first chunk through
+        else:
+            audible = energy > self.min_level
+            loud = energy > self.noise_floor + self.energy_margin
+            onset = (flux > self.flux_threshold) & (energy > self.noise_floor + self.flux_margin)
+            fired = bool(np.any(audible & (loud | onset)))
+
+            if quiet < self.noise_floor:
+                self.noise_floor = quiet
+            else:
+                alpha = 1 - np.exp(-chunk.duration / self.floor_time_constant)
+                self.noise_floor += float(alpha * (quiet - self.noise_floor))
+
+        if fired:
+            self._open_for = self.hangover
+            return True
+        if self._open_for > 0:
+            self._open_for -= chunk.duration
+            return True
+        return False
+
+class ComputeCascade:
+    """
+    Runs the models cheapest first and only as far as the audio warrants: the ActivityGate on
+    every chunk, VAD and YAMNet only when the gate is open, and Vosk only when VAD and YAMNet's
+    speech classes agree that someone is talking. `skipped` counts, per stage, the chunks that
+    stage did not run on: gated chunks for VAD and YAMNet, and chunks VAD heard speech in that
+    YAMNet didn't confirm for recognition (also exported as alog_cascade_skipped_total).
+    When YAMNet has no score for a chunk (not loaded, or inference failed) recognition defers
+    to VAD; `vad_only` counts those chunks.
+    """
+    STAGES = ('vad', 'classification', 'recognition')
+
+    def __init__(self, gate, speech_classes, speech_threshold=0.2, enabled=True):
+        self.gate = gate
+        self.speech_classes = list(speech_classes)
+        self.speech_threshold = speech_threshold
+        self.enabled = enabled
+        self.skipped = {stage: 0 for stage in self.STAGES}
+        self.gated = 0
+        self.vad_only = 0
+        self._lock = threading.Lock()
+
+    def admit(self, chunk, keep_open=False):
+        """
+        Stage one, in capture order: should VAD and YAMNet run on this chunk? `keep_open`
+        forces it open, e.g. while a sound event is in progress, so events aren't cut short.
+        """
+        if not self.enabled:
+            return True
+        fired = self.gate.update(chunk)
+        if fired or keep_open:
+            _GATE_OPEN.inc()
+            return True
+        with self._lock:
+            self.gated += 1
+        return False
+
+    def skip(self, stage):
+        with self._lock:
+            self.skipped[stage] += 1
+        _SKIPPED.inc(stage)
+
+    def speech_score(self, scores):
+        """Highest YAMNet speech-class score in any frame of a chunk's (frames, classes) scores."""
+        if scores is None or not self.speech_classes:
+            return 0.0
+        return float(scores[:, self.speech_classes].max())
+
+    def wants_recognition(self, is_speech, speech_score):
+        """
+        Stage three: run Vosk only when VAD and YAMNet agree on speech. A `speech_score` of
+        None means YAMNet has no opinion on the chunk, and VAD decides alone.
+        """
+        if not self.enabled or not is_speech:
+            return is_speech
+        if speech_score is None:
+            with self._lock:
+                self.vad_only += 1
+            _VAD_ONLY.inc()
+            return True
+        return speech_score >= self.speech_threshold
+
+    def summary(self):
+        with self._lock:
+            skipped = ', '.join(f"{stage} {count}" for stage, count in self.skipped.items())
+            return f"{self.gated} chunks gated as silence; skipped: {skipped}; recognized on VAD alone: {self.vad_only}"
@@ -0,0 +1,60 @@
+# backend/services/database.py
+
+import logging
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from models.event import Base
+import models.rollup  # Registers the rollup tables with Base.metadata
+from config import DATABASE_URI, DatabaseConfig
+
+_engine = None
+_session_factory = None
+_lock = threading.Lock()
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """
+    Applied to every new SQLite connection. WAL lets readers run alongside the writer,
+    synchronous=NORMAL only fsyncs at checkpoints, and the larger page cache keeps
+    index pages for recent time ranges in memory.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={DatabaseConfig.JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={DatabaseConfig.SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{DatabaseConfig.CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA busy_timeout={DatabaseConfig.BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def get_engine():
+    """Return the process-wide engine, creating it and the schema on first use."""
+    global _engine, _session_factory
+    with _lock:
+        if _engine is None:
+            logger = logging.getLogger('Database')
+            options = {}
+            if DATABASE_URI.startswith('sqlite'):
+                # A small pool of connections shared by the API threads, the writer and the services
+                options = {
+                    'poolclass': QueuePool,
+                    'pool_size': DatabaseConfig.POOL_SIZE,
+                    'max_overflow': DatabaseConfig.MAX_OVERFLOW,
+                    'connect_args': {'check_same_thread': False},
+                }
+            engine = create_engine(DATABASE_URI, **options)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _configure_sqlite)
+            Base.metadata.create_all(engine)
+            # create_all skips tables that already exist, so add indexes introduced later explicitly
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(engine, checkfirst=True)
+            _session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+            _engine = engine
+            logger.info("Database engine created.")
+        return _engine
+
+def get_session_factory():
+    """Session factory bound to the shared engine. Objects stay usable after commit."""
+    get_engine()
+    return _session_factory
\ No newline at end of file
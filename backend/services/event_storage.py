@@ -1,31 +1,217 @@
 # backend/services/event_storage.py
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models.event import Base, Event
-from config import DATABASE_URI
+from models.event import Event
+from services.database import get_session_factory
+from services.rollups import apply_rollups, category_filter
+from services.metrics import get_metrics, SERVICE_SECONDS, LAG_BUCKETS
+from config import DatabaseConfig
+from sqlalchemy import and_, or_
+from datetime import datetime, timedelta
+import atexit
+import base64
 import logging
+import queue
+import threading
+import time
+
+_EVENTS_STORED = get_metrics().counter('alog_events_stored_total', 'Events committed to the database', ('event_type',))
+_EVENT_LAG = get_metrics().histogram(
+    'alog_event_lag_seconds',
+    'Time from the end of a sound or utterance (capture time) to its event being committed',
+    ('event_type',), buckets=LAG_BUCKETS
+)
+
+# Sentinel that stops the background writer
+_STOP = object()
+
+def encode_cursor(event):
+    """Opaque keyset cursor pointing just after `event` in (timestamp, id) order."""
+    raw = f"{event.timestamp.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    try:
+        timestamp, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(event_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
 
 class EventStorage:
-    def __init__(self):
+    """
+    Stores events in the shared database.
+
+    In write-behind mode `store_event` only enqueues the event; a background writer collects
+    events for up to `batch_interval` seconds or `batch_size` rows and inserts each batch in a
+    single transaction. `flush` waits for everything queued so far to be written and `close`
+    stops the writer after writing whatever is still buffered.
+    """
+    def __init__(self, write_behind=None, batch_interval=None, batch_size=None):
         self.logger = logging.getLogger('EventStorage')
+        self.write_behind = DatabaseConfig.WRITE_BEHIND if write_behind is None else write_behind
+        self.batch_interval = batch_interval or DatabaseConfig.BATCH_INTERVAL
+        self.batch_size = batch_size or DatabaseConfig.BATCH_SIZE
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        # (id, timestamp) of the newest stored event, loaded lazily and kept current on writes
+        self._latest = None
+        # Bumped whenever stored events change in place (e.g. audio references cleared)
+        self.revision = 0
+        # Wall-clock time of the last write or in-place change. Events are written well after
+        # their onset timestamp, so this (not the newest timestamp) is when query results last
+        # changed. Nothing this process hasn't seen can be newer than its start
+        self.modified_at = datetime.utcnow()
         try:
-            self.engine = create_engine(DATABASE_URI)
-            Base.metadata.create_all(self.engine)
-            self.Session = sessionmaker(bind=self.engine)
+            self.Session = get_session_factory()
             self.logger.info("Database connected.")
         except Exception as e:
             self.logger.error(f"Database connection failed: {e}")
 
     def store_event(self, event):
+        if self.write_behind:
+            self._ensure_writer()
+            self._queue.put(event)
+            return
+        self._write_batch([event])
+
+    def store_events(self, events):
+        if self.write_behind:
+            self._ensure_writer()
+            for event in events:
+                self._queue.put(event)
+            return
+        if events:
+            self._write_batch(list(events))
+
+    def pending(self):
+        """Events queued for the background writer but not yet written."""
+        return self._queue.qsize() if self.write_behind else 0
+
+    def flush(self):
+        """Block until every event queued so far has been written."""
+        if self.write_behind:
+            self._queue.join()
+
+    def close(self):
+        """Write any buffered events and stop the background writer."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+            self.logger.info("Event writer stopped.")
+
+    def _ensure_writer(self):
+        # Started on first write, so read-only users never spawn a writer thread
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name='event-writer', daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                break
+
+    def _write_batch(self, events):
+        session = self.Session()
+        try:
+            with SERVICE_SECONDS.time('event_storage.write'):
+                session.add_all(events)
+                # Keep the per-minute/per-hour rollups in step within the same transaction
+                apply_rollups(session, events)
+                session.commit()
+            committed_at = datetime.utcnow()
+            self.modified_at = committed_at
+            for event in events:
+                _EVENTS_STORED.inc(event.event_type)
+                if event.timestamp is not None:
+                    ended_at = event.timestamp + timedelta(seconds=event.duration or 0)
+                    _EVENT_LAG.observe(max((committed_at - ended_at).total_seconds(), 0.0), event.event_type)
+            if self._latest is not None:
+                newest = max(events, key=lambda event: event.id)
+                if newest.id > self._latest[0]:
+                    self._latest = (newest.id, newest.timestamp)
+            if len(events) == 1:
+                self.logger.debug(f"Event stored: {events[0]}")
+            else:
+                self.logger.debug(f"Stored {len(events)} events in one transaction")
+        except Exception as e:
+            self.logger.error(f"Failed to store {len(events)} event(s): {e}")
+            session.rollback()
+        finally:
+            session.close()
+
+    def latest_event(self):
+        """(id, timestamp) of the newest stored event, or (0, None) when there are none."""
+        if self._latest is None:
+            session = self.Session()
+            try:
+                row = session.query(Event.id, Event.timestamp).order_by(Event.id.desc()).first()
+                self._latest = (row.id, row.timestamp) if row else (0, None)
+            finally:
+                session.close()
+        return self._latest
+
+    def clear_audio_ids(self, audio_ids, start_time=None, end_time=None):
+        """
+        Detach events from audio that no longer exists, in bulk. Passing the capture time
+        range of the removed audio lets each update use the timestamp index instead of
+        scanning the table. Returns the number of events updated.
+        """
+        audio_ids = list(audio_ids)
         session = self.Session()
         try:
-            session.add(event)
+            cleared = 0
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(audio_ids), 500):
+                query = session.query(Event).filter(Event.audio_id.in_(audio_ids[i:i + 500]))
+                if start_time is not None:
+                    query = query.filter(Event.timestamp >= start_time)
+                if end_time is not None:
+                    query = query.filter(Event.timestamp <= end_time)
+                cleared += query.update({Event.audio_id: None}, synchronize_session=False)
             session.commit()
-            self.logger.debug(f"Event stored: {event}")
+            if cleared:
+                self.revision += 1
+                self.modified_at = datetime.utcnow()
+                self.logger.info(f"Cleared audio references from {cleared} events")
+            return cleared
         except Exception as e:
-            self.logger.error(f"Failed to store event: {e}")
+            self.logger.error(f"Failed to clear audio references: {e}")
             session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    def get_event(self, event_id):
+        session = self.Session()
+        try:
+            return session.get(Event, event_id)
         finally:
             session.close()
 
@@ -39,3 +225,57 @@ class EventStorage:
             return []
         finally:
             session.close()
+
+    def query_events(self, start_time, end_time, limit, cursor=None, event_type=None, label=None,
+                     category=None, min_confidence=None):
+        """
+        One page of events in [start_time, end_time], ordered by (timestamp, id).
+
+        Pagination is keyset-based: pass the returned cursor back to continue after the last
+        event of this page, so each page is an index range scan regardless of its depth.
+        `category` matches sound events with that YAMNet category group among the ones in
+        meta_info, the same keys /api/stats reports for the category dimension.
+        Returns (events, next_cursor); next_cursor is None on the last page.
+        """
+        session = self.Session()
+        try:
+            query = session.query(Event).filter(Event.timestamp.between(start_time, end_time))
+            if cursor:
+                after_timestamp, after_id = decode_cursor(cursor)
+                query = query.filter(or_(
+                    Event.timestamp > after_timestamp,
+                    and_(Event.timestamp == after_timestamp, Event.id > after_id)
+                ))
+            if event_type:
+                query = query.filter(Event.event_type == event_type)
+            if label:
+                query = query.filter(Event.label == label)
+            if category:
+                query = query.filter(category_filter(category))
+            if min_confidence is not None:
+                query = query.filter(Event.confidence >= min_confidence)
+
+            # Fetch one extra row to learn whether another page follows
+            events = query.order_by(Event.timestamp, Event.id).limit(limit + 1).all()
+            next_cursor = None
+            if len(events) > limit:
+                events = events[:limit]
+                next_cursor = encode_cursor(events[-1])
+            return events, next_cursor
+        finally:
+            session.close()
+
+_shared_storage = None
+_shared_lock = threading.Lock()
+
+def get_event_storage():
+    """
+    Process-wide EventStorage used by the services, the pipeline and the API, so all of them
+    share one engine and one background writer. Buffered events are flushed at interpreter exit.
+    """
+    global _shared_storage
+    with _shared_lock:
+        if _shared_storage is None:
+            _shared_storage = EventStorage()
+            atexit.register(_shared_storage.close)
+        return _shared_storage
\ No newline at end of file
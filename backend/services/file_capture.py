@@ -0,0 +1,160 @@
+# backend/services/file_capture.py
+
+import logging
+import os
+import threading
+import time
+import wave
+from datetime import datetime, timedelta
+import numpy as np
+from services.audio_chunk import PCM_SCALE
+from services.segment_store import SegmentedAudioStore
+
+# Same block size as the live capture, so callbacks see the same shapes
+BLOCK_DURATION = 2
+
+def read_wav(path, sample_rate=16000):
+    """Mono float32 samples of a 16-bit PCM WAV file, resampled to `sample_rate` if needed."""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / PCM_SCALE
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate and len(samples):
+        # Linear interpolation is plenty for YAMNet and VAD on speech-band audio
+        duration = len(samples) / rate
+        target = np.arange(int(duration * sample_rate)) / sample_rate
+        samples = np.interp(target, np.arange(len(samples)) / rate, samples).astype(np.float32)
+    return samples
+
+def wav_runs(path, sample_rate=16000):
+    """
+    One (captured_at, samples, audio_ids) run for a WAV file. The capture time is taken
+    to be the file's modification time minus its duration, i.e. when recording started.
+    """
+    samples = read_wav(path, sample_rate)
+    ended_at = datetime.utcfromtimestamp(os.path.getmtime(path))
+    yield ended_at - timedelta(seconds=len(samples) / sample_rate), samples, []
+
+def stored_runs(store, segment):
+    """
+    The audio of one segment of a SegmentedAudioStore as (captured_at, samples, audio_ids)
+    runs of contiguous audio. Overlapping windows are merged, and a gap (audio the retention
+    policy didn't keep) starts a new run. `audio_ids` lists (sample offset, audio_id) for
+    the stored chunks making up the run, so reprocessed events can point at them again.
+    """
+    sample_rate = store.sample_rate
+    start = store.segment_start(segment)
+    run_start, pieces, audio_ids, covered = None, [], [], 0
+    for audio_id, location in store.chunks_between(start, start + timedelta(hours=1), lookbehind=0):
+        pcm_bytes = store.read(audio_id)
+        if pcm_bytes is None:
+            continue
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / PCM_SCALE
+        if run_start is not None:
+            offset = int(round((location.captured_at - run_start).total_seconds() * sample_rate))
+            if offset > covered + sample_rate // 100:
+                yield run_start, np.concatenate(pieces), audio_ids
+                run_start = None
+        if run_start is None:
+            run_start, pieces, audio_ids, covered, offset = location.captured_at, [], [], 0, 0
+        if offset > covered:
+            # Sub-10 ms timing jitter between chunks: pad so offsets stay exact
+            pieces.append(np.zeros(offset - covered, dtype=np.float32))
+            covered = offset
+        skip = covered - offset
+        if skip < len(samples):
+            pieces.append(samples[skip:])
+            audio_ids.append((covered, audio_id))
+            covered = offset + len(samples)
+    if run_start is not None:
+        yield run_start, np.concatenate(pieces), audio_ids
+
+def discover_sources(paths, sample_rate=16000):
+    """
+    Expand paths into a list of work units: ('wav', path) for WAV files (directories are
+    searched recursively) and ('segment', store_root, segment) for every hour in an
+    audio_chunks store.
+    """
+    units = []
+    for path in paths:
+        if os.path.isdir(path) and any(name.isdigit() and os.path.isdir(os.path.join(path, name)) for name in os.listdir(path)):
+            store = SegmentedAudioStore(path, sample_rate=sample_rate)
+            units.extend(('segment', path, segment) for segment in store.segments())
+            store.close()
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                units.extend(('wav', os.path.join(root, name)) for name in sorted(files) if name.lower().endswith('.wav'))
+        else:
+            units.append(('wav', path))
+    return units
+
+def unit_runs(unit, sample_rate=16000, store=None):
+    """Runs of one work unit from discover_sources."""
+    if unit[0] == 'wav':
+        return wav_runs(unit[1], sample_rate)
+    store = store or SegmentedAudioStore(unit[1], sample_rate=sample_rate)
+    return stored_runs(store, unit[2])
+
+class FileAudioCapture:
+    """
+    Drop-in replacement for AudioCapture that plays recordings instead of a microphone:
+    WAV files, directories of them, or an audio_chunks store. The callback gets the same
+    arguments as a sounddevice InputStream callback ((frames, channels) float32 blocks).
+
+    With `realtime` the blocks are paced at the sample rate, like a live microphone;
+    otherwise they are delivered as fast as the callback returns. The capture ring buffer
+    drops the oldest audio when it is written faster than it is read, so use real-time
+    pacing when feeding the live pipeline; offline batch work should read the runs directly.
+    """
+    def __init__(self, paths, sample_rate=16000, channels=1, realtime=True, loop=False):
+        self.paths = paths
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.realtime = realtime
+        self.loop = loop
+        self.logger = logging.getLogger('AudioCapture')
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start_stream(self, callback):
+        self._thread = threading.Thread(target=self._play, args=(callback,), name='file-capture', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Replaying audio from {', '.join(self.paths)} ({'real time' if self.realtime else 'as fast as possible'})")
+
+    def stop_stream(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.logger.info("Audio replay stopped.")
+
+    def _play(self, callback):
+        block_size = self.sample_rate * BLOCK_DURATION
+        started = time.monotonic()
+        delivered = 0
+        try:
+            while not self._stop.is_set():
+                for unit in discover_sources(self.paths, self.sample_rate):
+                    for _, samples, _ in unit_runs(unit, self.sample_rate):
+                        for offset in range(0, len(samples), block_size):
+                            if self._stop.is_set():
+                                return
+                            block = samples[offset:offset + block_size]
+                            callback(np.repeat(block[:, None], self.channels, axis=1), len(block), None, None)
+                            delivered += len(block)
+                            if self.realtime:
+                                delay = started + delivered / self.sample_rate - time.monotonic()
+                                if delay > 0:
+                                    time.sleep(delay)
+                if not self.loop:
+                    break
+        except Exception as e:
+            self.logger.error(f"Audio replay failed: {e}")
+        finally:
+            self.finished.set()
+            self.logger.info(f"Audio replay finished: {delivered / self.sample_rate:.1f}s delivered")
@@ -0,0 +1,172 @@
+# backend/services/inference_engine.py
+
+import csv
+import logging
+import threading
+import numpy as np
+
+class InferenceEngine:
+    """
+    Base class for YAMNet inference back-ends.
+
+    An engine takes a 1-D float32 waveform and returns the per-frame class scores as a
+    (frames, classes) float32 array. Input and output buffers are allocated once per input
+    length and reused across calls, so the returned array is only valid until the next call.
+    Calls are serialized with `self.lock`; callers that keep using the scores after `infer`
+    returns should hold the lock themselves.
+    """
+    name = None
+
+    def __init__(self, model_path, num_classes):
+        self.model_path = model_path
+        self.num_classes = num_classes
+        self.lock = threading.RLock()
+        self.logger = logging.getLogger('InferenceEngine')
+
+    def infer(self, waveform):
+        raise NotImplementedError
+
+class SavedModelEngine(InferenceEngine):
+    """Runs the full TensorFlow SavedModel through its 'serving_default' signature."""
+    name = 'savedmodel'
+
+    def __init__(self, model_path, num_classes):
+        super().__init__(model_path, num_classes)
+        import tensorflow as tf
+        self._tf = tf
+        self.model = tf.saved_model.load(model_path)
+        self._signature = self.model.signatures['serving_default']
+        self._input = None
+        self._scores = None
+
+    def infer(self, waveform):
+        with self.lock:
+            if self._input is None or self._input.shape[0] != len(waveform):
+                self._input = self._tf.Variable(
+                    self._tf.zeros([len(waveform)], dtype=self._tf.float32),
+                    trainable=False
+                )
+                self._scores = None
+            self._input.assign(waveform)
+
+            outputs = self._signature(input_waveform=self._input.value())
+            scores = outputs['output_0']
+            if self._scores is None or self._scores.shape != tuple(scores.shape):
+                self._scores = np.empty(scores.shape, dtype=np.float32)
+            np.copyto(self._scores, scores.numpy())
+            return self._scores
+
+class TFLiteEngine(InferenceEngine):
+    """
+    Runs the converted .tflite model (see convert_yamnet_to_tflite.py) in a TFLite interpreter.
+    Uses the standalone tflite_runtime package when installed, otherwise TensorFlow's bundled one.
+    """
+    name = 'tflite'
+
+    def __init__(self, model_path, num_classes, num_threads=None):
+        super().__init__(model_path, num_classes)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.num_threads = num_threads
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self._input_index = self.interpreter.get_input_details()[0]['index']
+        self._input_length = None
+        self._scores_index = None
+        self._scores = None
+
+    def _allocate(self, length):
+        self.interpreter.resize_tensor_input(self._input_index, [length])
+        self.interpreter.allocate_tensors()
+
+        # YAMNet has three outputs (scores, embeddings, log-mel spectrogram);
+        # pick the scores by their class dimension rather than relying on output order
+        for detail in self.interpreter.get_output_details():
+            if detail['shape'][-1] == self.num_classes:
+                self._scores_index = detail['index']
+                self._scores = np.empty(detail['shape'], dtype=np.float32)
+                break
+        else:
+            raise ValueError(f"No output with {self.num_classes} classes in {self.model_path}")
+        self._input_length = length
+
+    def infer(self, waveform):
+        with self.lock:
+            if self._input_length != len(waveform):
+                self._allocate(len(waveform))
+
+            # Write into the interpreter's input buffer in place; the views returned by
+            # tensor() must not outlive invoke(), so they are never stored
+            self.interpreter.tensor(self._input_index)()[:] = waveform
+            self.interpreter.invoke()
+            np.copyto(self._scores, self.interpreter.tensor(self._scores_index)())
+            return self._scores
+
+ENGINES = {
+    SavedModelEngine.name: SavedModelEngine,
+    TFLiteEngine.name: TFLiteEngine,
+}
+
+def load_inference_engine(name, model_path, num_classes, **options):
+    """Create the engine registered under `name`, passing engine-specific options through."""
+    try:
+        engine_class = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference engine '{name}', expected one of: {', '.join(ENGINES)}")
+    return engine_class(model_path, num_classes, **options)
+
+def load_class_map(path):
+    """
+    Read yamnet_class_map.csv: returns the display names in score order and a dict mapping
+    each display name to its category groups (comma-joined, as stored in meta_info).
+    """
+    class_names = []
+    categories = {}
+    with open(path, 'r') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        for row in reader:
+            class_names.append(row[2])  # display_name
+            categories[row[2]] = row[3]  # category groups
+    return class_names, categories
+
+def compare_top_k(reference, candidate, waveforms, class_names, k=5):
+    """
+    Run both engines on each waveform and compare their top-k labels (chunk-mean scores).
+
+    Returns a dict with the fraction of waveforms whose top-1 label and top-k label set
+    agree, plus the details of every waveform where the top-k sets differ.
+    """
+    top1_matches = 0
+    topk_matches = 0
+    mismatches = []
+
+    for index, waveform in enumerate(waveforms):
+        labels = []
+        for engine in (reference, candidate):
+            with engine.lock:
+                mean_scores = np.mean(engine.infer(waveform), axis=0)
+            top = np.argsort(mean_scores)[::-1][:k]
+            labels.append([class_names[i] for i in top])
+
+        if labels[0][0] == labels[1][0]:
+            top1_matches += 1
+        if set(labels[0]) == set(labels[1]):
+            topk_matches += 1
+        else:
+            mismatches.append({
+                'index': index,
+                reference.name: labels[0],
+                candidate.name: labels[1],
+            })
+
+    total = max(len(waveforms), 1)
+    return {
+        'k': k,
+        'samples': len(waveforms),
+        'top1_agreement': top1_matches / total,
+        'topk_agreement': topk_matches / total,
+        'mismatches': mismatches,
+    }
\ No newline at end of file
@@ -0,0 +1,178 @@
+# backend/services/log_archive.py
+
+import bisect
+import json
+import logging
+import os
+import struct
+from datetime import datetime
+
+# Index record: record time (epoch seconds), byte offset of the line
+_INDEX_ENTRY = struct.Struct('<dQ')
+
+# Log records may reach the archive slightly out of time order (several threads log at
+# once), so searches start this many seconds early and stop this many seconds late
+_ORDER_SLACK = 2.0
+
+class JSONLinesHandler(logging.Handler):
+    """
+    Archives every record as one JSON object per line, keeping the extras set by
+    SoundEventLogger (sound_category, confidence, language).
+
+    Files are named after the time they were started (`YYYYMMDD-HHMMSS-ffffff.jsonl`) and a new
+    one is begun once the current one reaches `max_bytes`; only the newest `max_files` are
+    kept. Next to each file a sparse index (`.idx`) maps record times to byte offsets, with
+    one entry every `index_interval` bytes, so readers can seek close to any time.
+    """
+    def __init__(self, directory, max_bytes, max_files, index_interval):
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.index_interval = index_interval
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+        self._index_file = None
+        self._next_index_at = 0
+
+    def _open(self, created):
+        self._close_files()
+        name = archive_name(created)
+        path = os.path.join(self.directory, name + '.jsonl')
+        self._file = open(path, 'ab')
+        self._index_file = open(os.path.join(self.directory, name + '.idx'), 'ab')
+        self._next_index_at = self._file.tell()
+        for stale in list_archive_files(self.directory)[:-self.max_files]:
+            for suffix in ('.jsonl', '.idx'):
+                stale_path = os.path.join(self.directory, stale + suffix)
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+
+    def _close_files(self):
+        for f in (self._file, self._index_file):
+            if f is not None:
+                f.close()
+        self._file = self._index_file = None
+
+    def emit(self, record):
+        try:
+            entry = {
+                't': record.created,
+                'time': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                'level': record.levelname,
+                'levelno': record.levelno,
+                'logger': record.name,
+                'message': record.getMessage(),
+            }
+            for field in ('sound_category', 'confidence', 'language'):
+                value = getattr(record, field, None)
+                if value is not None:
+                    entry[field] = value
+            if record.exc_info:
+                entry['exception'] = logging.Formatter().formatException(record.exc_info)
+            line = (json.dumps(entry) + '\n').encode()
+
+            if self._file is None or self._file.tell() >= self.max_bytes:
+                self._open(record.created)
+            offset = self._file.tell()
+            if offset >= self._next_index_at:
+                # The line is written (and flushed) before its index entry points at it
+                self._file.write(line)
+                self._file.flush()
+                self._index_file.write(_INDEX_ENTRY.pack(record.created, offset))
+                self._index_file.flush()
+                self._next_index_at = offset + self.index_interval
+            else:
+                self._file.write(line)
+                self._file.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self._close_files()
+        super().close()
+
+def archive_name(created):
+    """Name of an archive file started at epoch time `created`; names sort by time."""
+    return datetime.utcfromtimestamp(created).strftime('%Y%m%d-%H%M%S-%f')
+
+def list_archive_files(directory):
+    """Names (without suffix) of the archive files in `directory`, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-6] for f in os.listdir(directory) if f.endswith('.jsonl'))
+
+class LogArchive:
+    """
+    Reads the files written by JSONLinesHandler. A search only touches the files whose
+    time span overlaps the window and, in each, seeks straight to the last index entry
+    before the window starts, so the cost depends on the window, not the archive size.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _load_index(self, name):
+        path = os.path.join(self.directory, name + '.idx')
+        if not os.path.exists(path):
+            return [], []
+        with open(path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % _INDEX_ENTRY.size
+        times, offsets = [], []
+        for created, offset in _INDEX_ENTRY.iter_unpack(data[:usable]):
+            times.append(created)
+            offsets.append(offset)
+        return times, offsets
+
+    def search(self, start, end, levels=None, logger=None, limit=500, cursor=None):
+        """
+        Records with start <= time <= end (epoch seconds), oldest first, optionally limited
+        to a set of level numbers and a logger name prefix. Returns (records, next_cursor);
+        pass next_cursor back to continue where a full page stopped.
+        """
+        names = list_archive_files(self.directory)
+        resume_name, resume_offset = None, None
+        if cursor:
+            resume_name, _, resume_offset = cursor.rpartition(':')
+            resume_offset = int(resume_offset)
+
+        records = []
+        for position, name in enumerate(names):
+            if resume_name is not None and name < resume_name:
+                continue
+            times, offsets = self._load_index(name)
+            if not times:
+                continue
+            # A file ends where the next one starts
+            if times[0] > end + _ORDER_SLACK:
+                break
+            if position + 1 < len(names) and names[position + 1] <= archive_name(start - _ORDER_SLACK):
+                continue
+
+            if name == resume_name:
+                offset = resume_offset
+            else:
+                slot = bisect.bisect_right(times, start - _ORDER_SLACK) - 1
+                offset = offsets[max(slot, 0)]
+
+            with open(os.path.join(self.directory, name + '.jsonl'), 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # being written right now
+                    line_offset = offset
+                    offset += len(line)
+                    entry = json.loads(line)
+                    created = entry['t']
+                    if created > end + _ORDER_SLACK:
+                        return records, None
+                    if created < start or created > end:
+                        continue
+                    if levels is not None and entry['levelno'] not in levels:
+                        continue
+                    if logger and not entry['logger'].startswith(logger):
+                        continue
+                    if len(records) == limit:
+                        return records, f"{name}:{line_offset}"
+                    records.append(entry)
+        return records, None
@@ -0,0 +1,135 @@
+# backend/services/model_loader.py
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import PipelineConfig
+
+class ModelState:
+    """Load state and timings of one model, as reported by /api/health."""
+    def __init__(self, name, required):
+        self.name = name
+        self.required = required
+        self.state = 'pending'
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'required': self.required,
+            'load_seconds': None if self.load_seconds is None else round(self.load_seconds, 3),
+            'warmup_seconds': None if self.warmup_seconds is None else round(self.warmup_seconds, 3),
+            'error': self.error,
+        }
+
+class ModelLoader:
+    """
+    Loads models on a small thread pool so startup doesn't wait for them one after another.
+
+    Each model goes pending -> loading -> warming -> ready (or failed). `load` builds the
+    model; `warmup`, if given, runs one inference on silence so the first real chunk doesn't
+    pay for lazy allocation. TensorFlow and Vosk load models in native code, so threads
+    load them in parallel. `ensure` loads a model on first use, or waits for a load already
+    under way, so rarely used models (e.g. a second language) cost nothing until needed.
+    """
+    def __init__(self, workers=2, warm_up=True):
+        self.warm_up = warm_up
+        self.logger = logging.getLogger('ModelLoader')
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='model-loader')
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, load, warmup=None, required=True):
+        """Start loading `name` in the background unless it's already known; returns its ModelState."""
+        with self._lock:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+            model = self._models[name] = ModelState(name, required)
+        self._executor.submit(self._load, model, load, warmup)
+        return model
+
+    def ensure(self, name, load, warmup=None, timeout=None):
+        """Return the model, loading it in the calling thread if nobody has started it yet."""
+        with self._lock:
+            model = self._models.get(name)
+            owner = model is None
+            if owner:
+                model = self._models[name] = ModelState(name, required=False)
+        if owner:
+            self._load(model, load, warmup)
+        elif not model.done.wait(timeout):
+            raise TimeoutError(f"Model '{name}' is still loading")
+        if model.value is None:
+            raise RuntimeError(f"Model '{name}' failed to load: {model.error}")
+        return model.value
+
+    def get(self, name):
+        """The model once it is ready; None while loading or if it failed to load or warm up."""
+        model = self._models.get(name)
+        return model.value if model is not None and model.state == 'ready' else None
+
+    def failed(self):
+        """Names of the required models that failed to load."""
+        with self._lock:
+            return [m.name for m in self._models.values() if m.required and m.state == 'failed']
+
+    def wait(self, names=None, timeout=None):
+        """Wait for the given (by default all required) models; True if all finished in time."""
+        with self._lock:
+            models = [m for m in self._models.values() if (m.name in names if names else m.required)]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for model in models:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not model.done.wait(remaining):
+                return False
+        return True
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(m.state == 'ready' for m in self._models.values() if m.required)
+
+    def status(self):
+        with self._lock:
+            return {name: model.to_dict() for name, model in self._models.items()}
+
+    def _load(self, model, load, warmup):
+        try:
+            model.state = 'loading'
+            started = time.perf_counter()
+            model.value = load()
+            model.load_seconds = time.perf_counter() - started
+            if warmup is not None and self.warm_up:
+                model.state = 'warming'
+                started = time.perf_counter()
+                warmup(model.value)
+                model.warmup_seconds = time.perf_counter() - started
+            model.state = 'ready'
+            self.logger.info(
+                f"Model '{model.name}' ready: loaded in {model.load_seconds:.2f}s"
+                + (f", warmed up in {model.warmup_seconds:.2f}s" if model.warmup_seconds is not None else '')
+            )
+        except Exception as e:
+            # A model that failed to warm up is as unusable as one that failed to load
+            model.value = None
+            model.state = 'failed'
+            model.error = str(e)
+            self.logger.error(f"Failed to load model '{model.name}': {e}")
+        finally:
+            model.done.set()
+
+_model_loader = None
+_model_loader_lock = threading.Lock()
+
+def get_model_loader():
+    global _model_loader
+    with _model_loader_lock:
+        if _model_loader is None:
+            _model_loader = ModelLoader(workers=PipelineConfig.MODEL_LOAD_WORKERS, warm_up=PipelineConfig.MODEL_WARM_UP)
+        return _model_loader
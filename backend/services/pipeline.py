@@ -0,0 +1,215 @@
+# backend/services/pipeline.py
+
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+from services.metrics import get_metrics
+
+_STAGE_SECONDS = get_metrics().histogram('alog_stage_seconds', 'Time a pipeline stage spends on one chunk', ('stage',))
+_STAGE_ERRORS = get_metrics().counter('alog_stage_errors_total', 'Chunks a pipeline stage failed on', ('stage',))
+
+OVERLOAD_POLICIES = ('block', 'drop_oldest', 'degrade')
+
+# Sentinel that tells a worker to exit
+_STOP = object()
+
+class PipelineItem:
+    """A captured chunk travelling through the pipeline, plus everything the stages learn about it."""
+    def __init__(self, seq, chunk):
+        self.seq = seq
+        self.chunk = chunk
+        # Id the chunk's audio is stored under, if the audio writer decides to keep it
+        self.audio_id = str(uuid.uuid4())
+        self.is_speech = False
+        # Frame-level VAD result (SpeechSegmentation), when the VAD stage produced one
+        self.vad = None
+        # Per-frame sound class scores, when the classification stage leaves segmentation for later
+        self.scores = None
+        # Compute cascade: whether the activity gate let the chunk through to the models,
+        # and the highest YAMNet speech-class score in it (None when YAMNet didn't score it)
+        self.gate_open = True
+        self.speech_score = None
+        self.events = []
+        # Set when an optional stage was skipped because it was overloaded
+        self.degraded = False
+
+class Stage:
+    """
+    One step of the pipeline: a handler run by a fixed number of worker threads,
+    fed by a bounded queue. Optional stages may be skipped under the 'degrade' policy.
+    Ordered stages see chunks strictly in capture order and always run a single worker,
+    for handlers that keep state from one chunk to the next.
+    """
+    def __init__(self, name, handler, workers=1, queue_size=4, optional=False, ordered=False):
+        self.name = name
+        self.handler = handler
+        self.workers = 1 if ordered else workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.optional = optional
+        self.ordered = ordered
+        self.threads = []
+
+class _Reorderer:
+    """Releases items strictly in sequence order, whatever order they arrive in."""
+    def __init__(self, release):
+        self.release = release
+        self.logger = logging.getLogger('ProcessingPipeline')
+        self._next_seq = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def deliver(self, seq, item):
+        """Hand over an item; `item` is None when the chunk was dropped or skipped this point."""
+        with self._lock:
+            self._pending[seq] = item
+            while self._next_seq in self._pending:
+                ready = self._pending.pop(self._next_seq)
+                self._next_seq += 1
+                if ready is None:
+                    continue
+                try:
+                    self.release(ready)
+                except Exception as e:
+                    self.logger.error(f"Failed to release chunk {ready.seq}: {e}")
+
+class ProcessingPipeline:
+    """
+    Runs captured chunks through a chain of stages with bounded queues and fixed worker pools.
+
+    Overload policies decide what happens when a stage's queue is full:
+      - 'block':       wait for room (back-pressure propagates to the producer)
+      - 'drop_oldest': discard the oldest queued chunk to make room for the new one
+      - 'degrade':     skip optional stages (e.g. recognition) instead of waiting for them
+
+    Completed chunks are passed to `on_complete` in capture order.
+    """
+    def __init__(self, stages, on_complete, overload_policy='block'):
+        if overload_policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy: {overload_policy}")
+        self.stages = stages
+        self.overload_policy = overload_policy
+        self.logger = logging.getLogger('ProcessingPipeline')
+        self._sink = _Reorderer(on_complete)
+        # Reordering gates in front of ordered stages
+        self._gates = {
+            index: _Reorderer(lambda item, index=index: self._put(index, item))
+            for index, stage in enumerate(stages) if stage.ordered
+        }
+        self._seq = itertools.count()
+        self._stats_lock = threading.Lock()
+        self.dropped = 0
+        self.degraded = 0
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index,),
+                    name=f"pipeline-{stage.name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                stage.threads.append(thread)
+        self.logger.info(
+            f"Pipeline started: {', '.join(f'{s.name}x{s.workers}' for s in self.stages)} "
+            f"(overload policy: {self.overload_policy})"
+        )
+
+    def submit(self, chunk):
+        """Feed a captured chunk into the first stage. May block under the 'block' policy."""
+        item = PipelineItem(next(self._seq), chunk)
+        self._enqueue(0, item)
+        return item.seq
+
+    def stop(self):
+        """Drain every stage in order and wait for the workers to exit."""
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.queue.put(_STOP)
+            for thread in stage.threads:
+                thread.join()
+            stage.threads = []
+        self.logger.info("Pipeline stopped")
+
+    def queue_depths(self):
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def workers_alive(self):
+        return {stage.name: sum(thread.is_alive() for thread in stage.threads) for stage in self.stages}
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+            started = time.perf_counter()
+            try:
+                stage.handler(item)
+            except Exception as e:
+                _STAGE_ERRORS.inc(stage.name)
+                self.logger.error(f"Stage '{stage.name}' failed on chunk {item.seq}: {e}")
+            _STAGE_SECONDS.observe(time.perf_counter() - started, stage.name)
+            self._enqueue(index + 1, item)
+
+    def _enqueue(self, index, item):
+        # Walk past optional stages the item has to skip, letting their gates know it won't arrive
+        while index < len(self.stages):
+            stage = self.stages[index]
+            if not (stage.optional and item.degraded):
+                break
+            if index in self._gates:
+                self._gates[index].deliver(item.seq, None)
+            index += 1
+
+        if index == len(self.stages):
+            self._sink.deliver(item.seq, item)
+        elif index in self._gates:
+            self._gates[index].deliver(item.seq, item)
+        else:
+            self._put(index, item)
+
+    def _put(self, index, item):
+        stage = self.stages[index]
+        if self.overload_policy == 'block' or (self.overload_policy == 'degrade' and not stage.optional):
+            stage.queue.put(item)
+        elif self.overload_policy == 'degrade':
+            try:
+                stage.queue.put_nowait(item)
+            except queue.Full:
+                item.degraded = True
+                with self._stats_lock:
+                    self.degraded += 1
+                self.logger.warning(f"Stage '{stage.name}' overloaded, skipping it for chunk {item.seq}")
+                self._enqueue(index + 1, item)
+        else:
+            while True:
+                try:
+                    stage.queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        oldest = stage.queue.get_nowait()
+                    except queue.Empty:
+                        continue
+                    if oldest is _STOP:
+                        # The stage is shutting down: never drop a worker's sentinel. Queue the
+                        # chunk in the freed slot and put the sentinel back behind it
+                        stage.queue.put(item)
+                        stage.queue.put(_STOP)
+                        break
+                    with self._stats_lock:
+                        self.dropped += 1
+                    self.logger.warning(f"Stage '{stage.name}' overloaded, dropped chunk {oldest.seq}")
+                    self._discard(index, oldest.seq)
+
+    def _discard(self, index, seq):
+        # Tell every later gate and the sink that this chunk will never arrive
+        for gate_index, gate in self._gates.items():
+            if gate_index > index:
+                gate.deliver(seq, None)
+        self._sink.deliver(seq, None)
\ No newline at end of file
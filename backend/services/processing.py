@@ -0,0 +1,142 @@
+# backend/services/processing.py
+
+import logging
+from datetime import datetime, timedelta
+from config import AudioConfig, CascadeConfig, ClassifierConfig, PipelineConfig, SpeechConfig
+from services.cascade import ActivityGate, ComputeCascade
+from services.metrics import get_metrics, LAG_BUCKETS
+from services.pipeline import ProcessingPipeline, Stage
+
+_CHUNK_LAG_SECONDS = get_metrics().histogram(
+    'alog_chunk_lag_seconds', 'Time from the end of a chunk\'s capture until it has been fully processed',
+    buckets=LAG_BUCKETS
+)
+
+def build_cascade():
+    """The compute cascade as configured in CascadeConfig."""
+    return ComputeCascade(
+        ActivityGate(
+            sample_rate=AudioConfig.SAMPLE_RATE,
+            energy_margin=CascadeConfig.ENERGY_MARGIN_DB,
+            flux_threshold=CascadeConfig.FLUX_THRESHOLD_DB,
+            flux_margin=CascadeConfig.FLUX_MARGIN_DB,
+            min_level=CascadeConfig.MIN_LEVEL_DB,
+            floor_time_constant=CascadeConfig.FLOOR_TIME_CONSTANT,
+            hangover=CascadeConfig.HANGOVER
+        ),
+        speech_classes=CascadeConfig.SPEECH_CLASSES,
+        speech_threshold=CascadeConfig.SPEECH_THRESHOLD,
+        enabled=CascadeConfig.ENABLED
+    )
+
+class ChunkProcessor:
+    """
+    The stage handlers every captured chunk goes through: activity gate, VAD, YAMNet and
+    speech recognition, then (in capture order) sound segmentation, audio retention and
+    event storage. Used by the service and by the pipeline benchmark, so both run the same code.
+
+    `sound_classifier` may be None (YAMNet failed to load, or isn't loaded yet); VAD and
+    speech recognition carry on without it. `on_complete`, if given, is called with each
+    finished item after its events have been handed to storage.
+    """
+    def __init__(self, cascade, speech_detector, speech_recognizer, audio_writer, event_storage,
+                 sound_classifier=None, language=None, on_complete=None):
+        self.cascade = cascade
+        self.speech_detector = speech_detector
+        self.speech_recognizer = speech_recognizer
+        self.audio_writer = audio_writer
+        self.event_storage = event_storage
+        self.sound_classifier = sound_classifier
+        self.language = language or SpeechConfig.LANGUAGE
+        self.on_complete = on_complete
+        self.logger = logging.getLogger('ChunkProcessor')
+
+    def build_pipeline(self, overload_policy=None):
+        return ProcessingPipeline(
+            stages=[
+                # The gate tracks the noise floor from chunk to chunk, so it sees them in order
+                Stage('gate', self.gate_chunk, queue_size=PipelineConfig.QUEUE_SIZE, ordered=True),
+                Stage('vad', self.detect_speech, PipelineConfig.VAD_WORKERS, PipelineConfig.QUEUE_SIZE),
+                Stage('classification', self.classify_sound, PipelineConfig.CLASSIFIER_WORKERS, PipelineConfig.QUEUE_SIZE),
+                Stage('recognition', self.recognize_speech, PipelineConfig.RECOGNIZER_WORKERS, PipelineConfig.QUEUE_SIZE,
+                      optional=True, ordered=SpeechConfig.STREAMING),
+            ],
+            on_complete=self.complete_chunk,
+            overload_policy=overload_policy or PipelineConfig.OVERLOAD_POLICY
+        )
+
+    def sound_events_active(self):
+        return self.sound_classifier is not None and self.sound_classifier.segmenter.active
+
+    def gate_chunk(self, item):
+        # Keep the models running while a sound is in progress, so its event isn't cut short
+        item.gate_open = self.cascade.admit(item.chunk, keep_open=self.sound_events_active())
+
+    def detect_speech(self, item):
+        if not item.gate_open:
+            self.cascade.skip('vad')
+            return
+        item.vad = self.speech_detector.segment(item.chunk)
+        item.is_speech = item.vad.is_speech
+
+    def classify_sound(self, item):
+        if not item.gate_open:
+            self.cascade.skip('classification')
+            return
+        if self.sound_classifier is None:
+            # YAMNet failed to load; speech_score stays None, so recognition follows VAD alone
+            return
+        scores = self.sound_classifier.frame_scores(item.chunk)
+        if scores is None:
+            return
+        item.speech_score = self.cascade.speech_score(scores)
+        if ClassifierConfig.SEGMENTATION:
+            # Inference may run on several workers; segmentation happens in order in complete_chunk
+            item.scores = scores
+        else:
+            item.events.extend(self.sound_classifier.classify(item.chunk, item.audio_id, store=False, scores=scores))
+
+    def recognize_speech(self, item):
+        # Vosk only decodes chunks where VAD and YAMNet agree there is speech
+        speech = self.cascade.wants_recognition(item.is_speech, item.speech_score)
+        if item.is_speech and not speech:
+            self.cascade.skip('recognition')
+        if not speech:
+            self.logger.debug("No speech detected.")
+
+        segments = item.vad.segments if item.vad and speech else None
+        if SpeechConfig.STREAMING:
+            # Every chunk goes to the stream: voiced spans extend the utterance, trailing silence finalizes it
+            item.events.extend(self.speech_recognizer.stream(
+                item.chunk, item.audio_id, self.language,
+                is_speech=speech,
+                trailing_silence=item.vad.trailing_silence if item.vad and speech else None,
+                store=False, segments=segments
+            ))
+        elif speech:
+            item.events.extend(self.speech_recognizer.recognize(
+                item.chunk, item.audio_id, self.language, store=False, segments=segments
+            ))
+
+    def complete_chunk(self, item):
+        # Called in capture order, so events are persisted in the order they were heard
+        # and sounds can be followed from one chunk to the next
+        if item.scores is not None and self.sound_classifier is not None:
+            item.events.extend(self.sound_classifier.segment(item.scores, item.chunk, item.audio_id, store=False))
+
+        # The retention decision comes before storing since it may detach events from unkept audio
+        active = item.is_speech or self.sound_events_active()
+        self.audio_writer.submit(item.chunk, item.audio_id, item.events, active=active)
+        self.event_storage.store_events(item.events)
+        if item.chunk.captured_at is not None:
+            captured_until = item.chunk.captured_at + timedelta(seconds=item.chunk.duration)
+            _CHUNK_LAG_SECONDS.observe(max((datetime.utcnow() - captured_until).total_seconds(), 0.0))
+
+        self.logger.info(f"Processed audio chunk: {item.audio_id}")
+        if self.on_complete is not None:
+            self.on_complete(item)
+
+    def flush(self):
+        """End the sound events still in progress (e.g. at shutdown) and store them."""
+        if self.sound_classifier is not None:
+            self.event_storage.store_events(self.sound_classifier.segmenter.flush())
@@ -0,0 +1,204 @@
+# backend/services/rollups.py
+
+import logging
+from sqlalchemy import Text, and_, func, literal
+from sqlalchemy.dialects.sqlite import insert
+from models.event import Event
+from models.rollup import MinuteRollup, HourRollup
+
+RESOLUTIONS = {
+    'minute': MinuteRollup,
+    'hour': HourRollup,
+}
+
+DIMENSIONS = ('label', 'category', 'language')
+
+logger = logging.getLogger('Rollups')
+
+def bucket_start(timestamp, resolution):
+    if resolution == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def category_groups(meta_info):
+    """The YAMNet category groups in a sound event's meta_info, e.g. 'Speech, Human Presence Sounds'."""
+    for group in (meta_info or '').split(','):
+        group = group.strip()
+        if group and group != 'Unknown Category':
+            yield group
+
+def category_filter(category):
+    """
+    SQL condition matching sound events with `category` as one of their groups, i.e. the
+    events counted under that key in the category rollups. meta_info holds the groups joined
+    with ', ', so the group is matched as a whole delimited token.
+    """
+    category = category.strip()
+    escaped = category.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    groups = literal(',') + func.replace(Event.meta_info, ', ', ',', type_=Text) + literal(',')
+    return and_(Event.event_type == 'sound', groups.like(f"%,{escaped},%", escape='\\'))
+
+def rollup_keys(event):
+    """
+    The (dimension, key) pairs an event is counted under. Sound events count under their
+    label and under each YAMNet category group in meta_info (see SoundClassifier.categories);
+    speech events count under their language, since transcripts are free text.
+    """
+    if event.event_type == 'sound':
+        yield 'label', event.label
+        for group in category_groups(event.meta_info):
+            yield 'category', group
+    elif event.event_type == 'speech':
+        language = (event.meta_info or '').replace('Language:', '').strip()
+        yield 'language', language or 'unknown'
+
+def aggregate(events):
+    """Fold events into {rollup model: {(bucket, dimension, key): [count, sum, n, max]}}."""
+    deltas = {model: {} for model in RESOLUTIONS.values()}
+    for event in events:
+        keys = list(rollup_keys(event))
+        for resolution, model in RESOLUTIONS.items():
+            bucket = bucket_start(event.timestamp, resolution)
+            for dimension, key in keys:
+                delta = deltas[model].setdefault((bucket, dimension, key), [0, 0.0, 0, None])
+                delta[0] += 1
+                if event.confidence is not None:
+                    delta[1] += event.confidence
+                    delta[2] += 1
+                    delta[3] = event.confidence if delta[3] is None else max(delta[3], event.confidence)
+    return deltas
+
+def apply_rollups(session, events):
+    """
+    Add a batch of events to the rollup tables inside the caller's transaction,
+    with one upsert per rollup table.
+    """
+    for model, model_deltas in aggregate(events).items():
+        if not model_deltas:
+            continue
+        rows = [
+            {
+                'bucket': bucket,
+                'dimension': dimension,
+                'key': key,
+                'count': count,
+                'confidence_sum': confidence_sum,
+                'confidence_count': confidence_count,
+                'max_confidence': max_confidence,
+            }
+            for (bucket, dimension, key), (count, confidence_sum, confidence_count, max_confidence)
+            in model_deltas.items()
+        ]
+        statement = insert(model)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=['dimension', 'key', 'bucket'],
+            set_={
+                'count': model.count + excluded.count,
+                'confidence_sum': model.confidence_sum + excluded.confidence_sum,
+                'confidence_count': model.confidence_count + excluded.confidence_count,
+                'max_confidence': func.max(
+                    func.coalesce(model.max_confidence, excluded.max_confidence),
+                    func.coalesce(excluded.max_confidence, model.max_confidence)
+                ),
+            }
+        )
+        session.execute(statement, rows)
+
+def rebuild_rollups(session_factory, batch_size=5000):
+    """
+    Recompute both rollup tables from the raw events table. Meant to be run with the
+    service stopped, since events stored during the rebuild would be counted twice.
+    Returns the number of events processed.
+    """
+    session = session_factory()
+    try:
+        for model in RESOLUTIONS.values():
+            session.query(model).delete()
+
+        processed = 0
+        last_id = 0
+        while True:
+            events = (
+                session.query(Event)
+                .filter(Event.id > last_id)
+                .order_by(Event.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not events:
+                break
+            apply_rollups(session, events)
+            processed += len(events)
+            last_id = events[-1].id
+            logger.info(f"Rolled up {processed} events")
+
+        session.commit()
+        return processed
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def histogram(session, resolution, dimension, start_time, end_time, key=None):
+    """
+    Per-bucket totals for one dimension between start_time and end_time, optionally
+    restricted to one key. Answered from the rollup table only.
+    """
+    model = RESOLUTIONS[resolution]
+    query = session.query(
+        model.bucket,
+        func.sum(model.count),
+        func.max(model.max_confidence),
+        func.sum(model.confidence_sum),
+        func.sum(model.confidence_count),
+    ).filter(
+        model.dimension == dimension,
+        model.bucket >= bucket_start(start_time, resolution),
+        model.bucket <= end_time,
+    )
+    if key is not None:
+        query = query.filter(model.key == key)
+    rows = query.group_by(model.bucket).order_by(model.bucket).all()
+    return [
+        {
+            'bucket': bucket.isoformat(),
+            'count': count,
+            'max_confidence': max_confidence,
+            'mean_confidence': confidence_sum / confidence_count if confidence_count else None,
+        }
+        for bucket, count, max_confidence, confidence_sum, confidence_count in rows
+    ]
+
+def top_keys(session, resolution, dimension, start_time, end_time, limit=10):
+    """The `limit` most frequent keys of a dimension between start_time and end_time."""
+    model = RESOLUTIONS[resolution]
+    total = func.sum(model.count)
+    rows = (
+        session.query(
+            model.key,
+            total,
+            func.max(model.max_confidence),
+            func.sum(model.confidence_sum),
+            func.sum(model.confidence_count),
+        )
+        .filter(
+            model.dimension == dimension,
+            model.bucket >= bucket_start(start_time, resolution),
+            model.bucket <= end_time,
+        )
+        .group_by(model.key)
+        .order_by(total.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            'key': key,
+            'count': count,
+            'max_confidence': max_confidence,
+            'mean_confidence': confidence_sum / confidence_count if confidence_count else None,
+        }
+        for key, count, max_confidence, confidence_sum, confidence_count in rows
+    ]
\ No newline at end of file
@@ -0,0 +1,254 @@
+# backend/services/segment_store.py
+
+import logging
+import os
+import struct
+import threading
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+
+# Index record: audio_id (UUID bytes), byte offset, stored length, capture time (epoch seconds), codec
+_INDEX_RECORD = struct.Struct('<16sQIdB')
+
+CODECS = {'pcm': 0, 'zlib': 1}
+_CODEC_NAMES = {value: name for name, value in CODECS.items()}
+
+def wav_header(data_size, sample_rate=16000, channels=1, sample_width=2):
+    """44-byte RIFF header for `data_size` bytes of 16-bit PCM."""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b'data', data_size
+    )
+
+class ChunkLocation:
+    """Where one stored chunk lives: segment name, byte offset and length, capture time and codec."""
+    __slots__ = ('segment', 'offset', 'length', 'captured_at', 'codec')
+
+    def __init__(self, segment, offset, length, captured_at, codec):
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.captured_at = captured_at
+        self.codec = codec
+
+class SegmentedAudioStore:
+    """
+    Append-only audio store: chunks are appended to one segment file per capture hour,
+    grouped in one directory per day (`YYYYMMDD/HH.seg`), and a sidecar index
+    (`YYYYMMDD/HH.idx`) records where each audio_id landed. Reading a chunk is one
+    positioned read, and expiring an hour of audio is deleting its two files.
+
+    Chunks are stored as raw 16-bit PCM ('pcm', contiguous chunks can be served straight
+    from the segment file) or zlib-compressed PCM ('zlib', lossless and smaller). Data is
+    written before its index record, so a crash can at worst leave an unindexed tail.
+    Segment sizes are read once at startup and then tracked on every append and removal,
+    so `usage()` never touches the disk.
+    """
+    def __init__(self, root, codec='pcm', sample_rate=16000):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown audio codec '{codec}', expected one of: {', '.join(CODECS)}")
+        self.root = root
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.logger = logging.getLogger('SegmentedAudioStore')
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index = {}
+        # segment -> audio_ids stored in it, and segment -> bytes on disk (data + index)
+        self._segment_ids = {}
+        self._sizes = {}
+        self._usage = 0
+        self._segment = None
+        self._data_file = None
+        self._index_file = None
+        self._load_index()
+
+    @staticmethod
+    def segment_name(captured_at):
+        return captured_at.strftime('%Y%m%d-%H')
+
+    def segment_path(self, segment, suffix='.seg'):
+        day, hour = segment.split('-')
+        return os.path.join(self.root, day, hour + suffix)
+
+    def _load_index(self):
+        self._migrate_flat_segments()
+        for day in sorted(os.listdir(self.root)):
+            day_dir = os.path.join(self.root, day)
+            if not (day.isdigit() and os.path.isdir(day_dir)):
+                continue
+            for filename in sorted(os.listdir(day_dir)):
+                if filename.endswith('.idx'):
+                    self._load_segment_index(f"{day}-{filename[:-4]}")
+        self.logger.info(
+            f"Audio index loaded: {len(self._index)} chunks in {len(self._sizes)} segments, "
+            f"{self._usage / 1e6:.1f} MB"
+        )
+
+    def _migrate_flat_segments(self):
+        # Earlier versions kept `YYYYMMDD-HH.seg/.idx` directly under the root
+        for filename in os.listdir(self.root):
+            name, suffix = os.path.splitext(filename)
+            if suffix in ('.seg', '.idx') and '-' in name:
+                os.makedirs(os.path.dirname(self.segment_path(name)), exist_ok=True)
+                os.rename(os.path.join(self.root, filename), self.segment_path(name, suffix))
+
+    def _load_segment_index(self, segment):
+        with open(self.segment_path(segment, '.idx'), 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % _INDEX_RECORD.size
+        ids = self._segment_ids.setdefault(segment, [])
+        for raw_id, offset, length, captured_at, codec in _INDEX_RECORD.iter_unpack(data[:usable]):
+            audio_id = str(uuid.UUID(bytes=raw_id))
+            self._index[audio_id] = ChunkLocation(
+                segment, offset, length,
+                datetime.fromtimestamp(captured_at, timezone.utc).replace(tzinfo=None),
+                _CODEC_NAMES[codec]
+            )
+            ids.append(audio_id)
+        data_path = self.segment_path(segment)
+        size = len(data) + (os.path.getsize(data_path) if os.path.exists(data_path) else 0)
+        self._sizes[segment] = size
+        self._usage += size
+
+    def _open_segment(self, segment):
+        if self._segment == segment:
+            return
+        self._close_files()
+        os.makedirs(os.path.dirname(self.segment_path(segment)), exist_ok=True)
+        self._data_file = open(self.segment_path(segment), 'ab')
+        self._index_file = open(self.segment_path(segment, '.idx'), 'ab')
+        self._segment = segment
+
+    def _close_files(self):
+        for f in (self._data_file, self._index_file):
+            if f is not None:
+                f.close()
+        self._data_file = self._index_file = None
+        self._segment = None
+
+    def append(self, audio_id, pcm_bytes, captured_at):
+        """Store one chunk of 16-bit PCM captured at `captured_at` (naive UTC)."""
+        return self.append_many([(audio_id, pcm_bytes, captured_at)])[0]
+
+    def append_many(self, chunks):
+        """
+        Store a batch of (audio_id, pcm_bytes, captured_at) chunks, flushing each touched
+        segment once rather than once per chunk. Returns their locations in order.
+        """
+        payloads = [
+            (audio_id, zlib.compress(pcm_bytes, 1) if self.codec == 'zlib' else pcm_bytes, captured_at)
+            for audio_id, pcm_bytes, captured_at in chunks
+        ]
+        locations = []
+        with self._lock:
+            for audio_id, payload, captured_at in payloads:
+                segment = self.segment_name(captured_at)
+                if segment != self._segment:
+                    self._flush_files()
+                    self._open_segment(segment)
+                offset = self._data_file.tell()
+                self._data_file.write(payload)
+                self._index_file.write(_INDEX_RECORD.pack(
+                    uuid.UUID(audio_id).bytes, offset, len(payload),
+                    captured_at.replace(tzinfo=timezone.utc).timestamp(), CODECS[self.codec]
+                ))
+                location = ChunkLocation(segment, offset, len(payload), captured_at, self.codec)
+                self._index[audio_id] = location
+                self._segment_ids.setdefault(segment, []).append(audio_id)
+                size = len(payload) + _INDEX_RECORD.size
+                self._sizes[segment] = self._sizes.get(segment, 0) + size
+                self._usage += size
+                locations.append(location)
+            self._flush_files()
+        return locations
+
+    def _flush_files(self):
+        # Data before index, so an index record never points past the end of its segment
+        for f in (self._data_file, self._index_file):
+            if f is not None:
+                f.flush()
+
+    def locate(self, audio_id):
+        return self._index.get(audio_id)
+
+    def read(self, audio_id):
+        """Decoded 16-bit PCM bytes of one chunk, or None if it isn't stored."""
+        location = self.locate(audio_id)
+        if location is None:
+            return None
+        try:
+            fd = os.open(self.segment_path(location.segment), os.O_RDONLY)
+        except FileNotFoundError:
+            # Expired between the lookup and the read
+            return None
+        try:
+            payload = os.pread(fd, location.length, location.offset)
+        finally:
+            os.close(fd)
+        return zlib.decompress(payload) if location.codec == 'zlib' else payload
+
+    def chunks_between(self, start, end, lookbehind=60):
+        """
+        (audio_id, ChunkLocation) of the chunks captured in [start - lookbehind seconds, end),
+        ordered by capture time. The lookbehind catches chunks that began before `start`
+        but still overlap it. Only the hourly segments spanning the range are looked at.
+        """
+        first = start - timedelta(seconds=lookbehind)
+        hour = first.replace(minute=0, second=0, microsecond=0)
+        found = []
+        with self._lock:
+            while hour < end:
+                for audio_id in self._segment_ids.get(self.segment_name(hour), ()):
+                    location = self._index[audio_id]
+                    if first <= location.captured_at < end:
+                        found.append((audio_id, location))
+                hour += timedelta(hours=1)
+        found.sort(key=lambda item: item[1].captured_at)
+        return found
+
+    def segments(self):
+        """Names of the stored segments, oldest first."""
+        with self._lock:
+            return sorted(self._sizes)
+
+    def usage(self):
+        """Bytes on disk used by all segments and their indexes."""
+        return self._usage
+
+    @staticmethod
+    def segment_start(segment):
+        """Capture time at which a segment's hour begins."""
+        return datetime.strptime(segment, '%Y%m%d-%H')
+
+    def remove_segment(self, segment):
+        """
+        Delete a whole segment and forget its chunks. Returns {audio_id: ChunkLocation}
+        for the chunks that were removed.
+        """
+        with self._lock:
+            if self._segment == segment:
+                self._close_files()
+            removed = {}
+            for audio_id in self._segment_ids.pop(segment, []):
+                location = self._index.pop(audio_id, None)
+                if location is not None:
+                    removed[audio_id] = location
+            self._usage -= self._sizes.pop(segment, 0)
+            for suffix in ('.seg', '.idx'):
+                path = self.segment_path(segment, suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+            day_dir = os.path.dirname(self.segment_path(segment))
+            if os.path.isdir(day_dir) and not os.listdir(day_dir):
+                os.rmdir(day_dir)
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._close_files()
\ No newline at end of file
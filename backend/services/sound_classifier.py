@@ -1,63 +1,99 @@
 # backend/services/sound_classifier.py
 
-import tensorflow as tf
 import numpy as np
 import logging
 from models.event import Event
-from services.event_storage import EventStorage
+from services.event_storage import get_event_storage
+from services.inference_engine import load_class_map, load_inference_engine
+from services.audio_chunk import AudioChunk
+from services.sound_segmenter import SoundEventSegmenter
+from services.metrics import SERVICE_SECONDS
+from config import ClassifierConfig
 from datetime import datetime
-import os
-import csv
+
 
 class SoundClassifier:
-    def __init__(self):
+    def __init__(self, engine=None):
         self.logger = logging.getLogger('SoundClassifier')
+        self.engine = None
         try:
-            # Load the YAMNet model
-            model_path = os.path.join('models', 'yamnet')
-            self.model = tf.saved_model.load(model_path)
-            self.infer = self.model.signatures['serving_default']
-
             # Load class names and categories from yamnet_class_map.csv
-            class_map_path = os.path.join('models', 'yamnet', 'assets', 'yamnet_class_map.csv')
-            self.class_names = []
-            self.categories = {}
-            
-            with open(class_map_path, 'r') as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header
-                for row in reader:
-                    self.class_names.append(row[2])  # display_name
-                    self.categories[row[2]] = row[3]  # category
+            self.class_names, self.categories = load_class_map(ClassifierConfig.CLASS_MAP_PATH)
+
+            # Load the YAMNet model through the configured inference engine
+            self.engine = engine or load_inference_engine(
+                ClassifierConfig.ENGINE,
+                ClassifierConfig.model_path(ClassifierConfig.ENGINE),
+                num_classes=len(self.class_names),
+                **ClassifierConfig.engine_options(ClassifierConfig.ENGINE)
+            )
+
+            self.segmenter = SoundEventSegmenter(
+                self.class_names,
+                self.categories,
+                on_threshold=ClassifierConfig.ON_THRESHOLD,
+                off_threshold=ClassifierConfig.OFF_THRESHOLD,
+                hangover=ClassifierConfig.HANGOVER,
+                min_duration=ClassifierConfig.MIN_EVENT_DURATION,
+                max_duration=ClassifierConfig.MAX_EVENT_DURATION
+            )
 
-            self.event_storage = EventStorage()
-            self.logger.info("YAMNet model loaded successfully")
+            self.event_storage = get_event_storage()
+            self.logger.info(f"YAMNet model loaded successfully ({self.engine.name} engine)")
         except Exception as e:
             self.logger.error(f"Failed to load YAMNet model: {e}")
 
-    def classify(self, audio_data, audio_id):
+    def warm_up(self, length):
+        """
+        Run one inference on `length` samples of silence, so the engine allocates its buffers
+        (and TensorFlow traces the graph) before the first real chunk arrives.
+        """
+        if self.engine is None:
+            raise RuntimeError("YAMNet model is not loaded")
+        with self.engine.lock:
+            self.engine.infer(np.zeros(length, dtype=np.float32))
+
+    def frame_scores(self, audio_data):
+        """Per-frame class scores of a chunk, (frames, classes), or None if inference failed."""
         try:
-            # Ensure audio_data is a 1-D float32 array
-            if audio_data.ndim > 1:
-                audio_data = np.mean(audio_data, axis=1)
-            audio_data = audio_data.astype(np.float32)
+            chunk = AudioChunk.wrap(audio_data)
+            # The engine reuses its score buffer, so copy it out while holding the lock
+            with self.engine.lock, SERVICE_SECONDS.time('sound_classifier.infer'):
+                return self.engine.infer(chunk.normalized).copy()
+        except Exception as e:
+            self.logger.error(f"Sound classification failed: {e}")
+            return None
 
-            # Normalize audio data
-            max_val = np.max(np.abs(audio_data))
-            if max_val > 0:
-                audio_data = audio_data / max_val
+    def segment(self, scores, audio_data, audio_id, store=True):
+        """
+        Feed one chunk's frame scores to the event segmenter; returns the sound events that
+        ended with this chunk. Must be called in capture order.
+        """
+        chunk = AudioChunk.wrap(audio_data)
+        events = self.segmenter.update(scores, chunk.captured_at or datetime.utcnow(), audio_id)
+        if store:
+            self.event_storage.store_events(events)
+        return events
 
-            # Convert to tensor
-            audio_tensor = tf.convert_to_tensor(audio_data, dtype=tf.float32)
+    def classify(self, audio_data, audio_id, store=True, scores=None):
+        """Top sound events of a chunk; pass `scores` from frame_scores to skip running the model again."""
+        events = []
+        try:
+            # Peak-normalized mono float32, computed once per chunk and shared
+            chunk = AudioChunk.wrap(audio_data)
 
-            # Run inference
-            outputs = self.infer(input_waveform=audio_tensor)
-            scores = outputs['output_0'].numpy()
+            if scores is not None:
+                mean_scores = np.mean(scores, axis=0)
+            else:
+                # Run inference; the engine reuses its score buffer, so reduce it while holding the lock
+                with self.engine.lock:
+                    with SERVICE_SECONDS.time('sound_classifier.infer'):
+                        scores = self.engine.infer(chunk.normalized)
 
-            # Get mean scores and top predictions
-            mean_scores = np.mean(scores, axis=0)
+                    # Get mean scores and top predictions
+                    mean_scores = np.mean(scores, axis=0)
             top_indices = np.argsort(mean_scores)[::-1][:5]
-            timestamp = datetime.utcnow()
+            timestamp = chunk.captured_at or datetime.utcnow()
 
             # Log and store each significant sound event
             for idx in top_indices:
@@ -82,7 +118,10 @@ class SoundClassifier:
                         meta_info=category,
                         audio_id=audio_id
                     )
-                    self.event_storage.store_event(event)
+                    events.append(event)
+                    if store:
+                        self.event_storage.store_event(event)
 
         except Exception as e:
-            self.logger.error(f"Sound classification failed: {e}")
\ No newline at end of file
+            self.logger.error(f"Sound classification failed: {e}")
+        return events
\ No newline at end of file
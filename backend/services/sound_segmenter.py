@@ -0,0 +1,125 @@
+# backend/services/sound_segmenter.py
+
+import logging
+from datetime import timedelta
+import numpy as np
+from models.event import Event
+
+# YAMNet scores 0.96 s patches every 0.48 s
+FRAME_HOP = 0.48
+
+class _Occurrence:
+    """One sound that is currently going on."""
+    __slots__ = ('start', 'end', 'score_sum', 'frames', 'quiet', 'audio_id')
+
+    def __init__(self, start, score, audio_id):
+        self.start = start
+        self.end = start + timedelta(seconds=FRAME_HOP)
+        self.score_sum = score
+        self.frames = 1
+        # Seconds spent below the off threshold since the last active frame
+        self.quiet = 0.0
+        self.audio_id = audio_id
+
+    @property
+    def duration(self):
+        return (self.end - self.start).total_seconds()
+
+class SoundEventSegmenter:
+    """
+    Turns YAMNet's per-frame scores into sound events with an onset and a duration.
+
+    Each class is tracked with hysteresis: an occurrence opens on the first frame scoring at
+    least `on_threshold` and stays open while frames score at least `off_threshold`,
+    tolerating `hangover` seconds below it. Open occurrences carry over from one chunk to
+    the next, so a sound lasting minutes becomes one event (split every `max_duration`
+    seconds so it still shows up while it goes on). The event's confidence is the mean
+    frame score while it was active, and its audio_id is that of the chunk it began in.
+
+    Chunks must be fed in capture order. Frames already covered by the previous chunk
+    (overlapping windows) are skipped, and a gap in capture closes everything open.
+    """
+    def __init__(self, class_names, categories, on_threshold=0.3, off_threshold=0.15,
+                 hangover=1.0, min_duration=0.48, max_duration=300.0):
+        self.class_names = class_names
+        self.categories = categories
+        self.on_threshold = on_threshold
+        self.off_threshold = min(off_threshold, on_threshold)
+        self.hangover = hangover
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.logger = logging.getLogger('SoundClassifier')
+        # class index -> _Occurrence
+        self._open = {}
+        # Start time of the next frame we haven't seen yet
+        self._frontier = None
+
+    @property
+    def active(self):
+        """True while any sound is in progress."""
+        return bool(self._open)
+
+    def update(self, scores, captured_at, audio_id):
+        """Feed the (frames, classes) scores of one chunk; returns the events that ended in it."""
+        events = []
+        hop = timedelta(seconds=FRAME_HOP)
+        for index, frame in enumerate(scores):
+            frame_start = captured_at + index * hop
+            if self._frontier is not None:
+                if frame_start < self._frontier - hop / 2:
+                    continue  # already seen in the previous, overlapping chunk
+                if frame_start > self._frontier + hop:
+                    # Chunks went missing (dropped under load); nothing can span the gap
+                    events.extend(self.flush())
+            self._frontier = frame_start + hop
+
+            for class_index in list(self._open):
+                occurrence = self._open[class_index]
+                score = float(frame[class_index])
+                if score >= self.off_threshold:
+                    occurrence.end = frame_start + hop
+                    occurrence.score_sum += score
+                    occurrence.frames += 1
+                    occurrence.quiet = 0.0
+                else:
+                    occurrence.quiet += FRAME_HOP
+                    if occurrence.quiet >= self.hangover:
+                        events.extend(self._close(class_index))
+                        continue
+                if occurrence.duration >= self.max_duration:
+                    events.extend(self._close(class_index))
+
+            for class_index in np.flatnonzero(frame >= self.on_threshold):
+                class_index = int(class_index)
+                if class_index not in self._open:
+                    self._open[class_index] = _Occurrence(frame_start, float(frame[class_index]), audio_id)
+        return events
+
+    def flush(self):
+        """
+        Close every open occurrence, e.g. on shutdown or at the end of a recording, and
+        forget the position in time; returns their events.
+        """
+        events = []
+        for class_index in list(self._open):
+            events.extend(self._close(class_index))
+        self._frontier = None
+        return events
+
+    def _close(self, class_index):
+        occurrence = self._open.pop(class_index)
+        if occurrence.duration < self.min_duration:
+            return []
+        label = self.class_names[class_index]
+        category = self.categories.get(label, "Unknown Category")
+        confidence = occurrence.score_sum / occurrence.frames
+        self.logger.event(label, category=category, confidence=confidence)
+        return [Event(
+            event_type='sound',
+            label=label,
+            confidence=confidence,
+            timestamp=occurrence.start,
+            duration=occurrence.duration,
+            meta_info=category,
+            audio_id=occurrence.audio_id
+        )]
@@ -3,32 +3,103 @@
 import webrtcvad
 import logging
 import numpy as np
+from config import SpeechConfig
+from services.audio_chunk import AudioChunk
+from services.metrics import SERVICE_SECONDS
+
+
+class SpeechSegmentation:
+    """
+    Frame-level VAD result for one chunk.
+
+    `mask` holds one smoothed speech flag per frame and `segments` the merged speech
+    spans as (start, end) sample offsets into the chunk, end exclusive.
+    """
+    def __init__(self, mask, segments, frame_size):
+        self.mask = mask
+        self.segments = segments
+        self.frame_size = frame_size
+
+    @property
+    def is_speech(self):
+        return len(self.segments) > 0
+
+    @property
+    def trailing_silence(self):
+        # Hangover keeps the mask set for a while after speech stops,
+        # so a clear last frame means the speaker has actually paused
+        return len(self.mask) == 0 or not self.mask[-1]
+
+    @property
+    def speech_samples(self):
+        return sum(end - start for start, end in self.segments)
+
+def _runs(mask):
+    """Start and end (exclusive) frame indices of each run of True values."""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def _mask_from_runs(starts, ends, length):
+    delta = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(delta, starts, 1)
+    np.add.at(delta, ends, -1)
+    return np.cumsum(delta[:length]) > 0
 
 class SpeechDetector:
-    def __init__(self, mode=3):
+    def __init__(self, mode=3, sample_rate=16000, frame_duration=None, hangover=None, min_speech_duration=None):
         self.vad = webrtcvad.Vad(mode)
         self.logger = logging.getLogger('SpeechDetector')
+        self.sample_rate = sample_rate
+
+        # webrtcvad accepts 10, 20 or 30 ms frames
+        frame_duration = frame_duration or SpeechConfig.VAD_FRAME_DURATION
+        hangover = SpeechConfig.VAD_HANGOVER if hangover is None else hangover
+        min_speech_duration = SpeechConfig.VAD_MIN_SPEECH_DURATION if min_speech_duration is None else min_speech_duration
+
+        self.frame_size = int(sample_rate * frame_duration / 1000)
+        self.hangover_frames = int(round(hangover / frame_duration))
+        self.min_speech_frames = max(1, int(round(min_speech_duration / frame_duration)))
 
     def detect(self, audio_data):
+        return self.segment(audio_data).is_speech
+
+    def segment(self, audio_data):
+        """
+        Run the VAD on every frame of the chunk and smooth the result: voiced runs shorter
+        than the minimum speech duration are discarded (clicks, knocks), then each remaining
+        run is extended by the hangover so short pauses inside speech don't split it.
+        """
         try:
-            # Ensure audio_data is 16-bit PCM mono
-            if audio_data.ndim > 1:
-                audio_data = audio_data[:,0]
-            audio_data = (audio_data * 32768).astype(np.int16).tobytes()
-            # webrtcvad expects 20ms frames
-            frame_duration = 30  # in ms, match your chunk duration
-            sample_rate = 16000  # match your sample rate
-            num_bytes_per_frame = int(sample_rate * (frame_duration / 1000.0) * 2)  # 2 bytes per sample (16-bit)
-            # Process each frame
-            is_speech = False
-            for i in range(0, len(audio_data), num_bytes_per_frame):
-                frame = audio_data[i:i + num_bytes_per_frame]
-                if len(frame) == num_bytes_per_frame:
-                    if self.vad.is_speech(frame, sample_rate):
-                        is_speech = True
-                        break
-            return is_speech
+            # 16-bit PCM mono, shared with the other stages through the chunk
+            pcm = AudioChunk.wrap(audio_data).pcm16
+
+            num_frames = len(pcm) // self.frame_size
+            if num_frames == 0:
+                return SpeechSegmentation(np.zeros(0, dtype=bool), [], self.frame_size)
+            frames = pcm[:num_frames * self.frame_size].reshape(num_frames, self.frame_size)
+
+            # Slice frames out of one byte view of the reshaped array; no per-frame copies
+            frame_bytes = self.frame_size * 2
+            buffer = memoryview(frames).cast('B')
+            with SERVICE_SECONDS.time('speech_detector.vad'):
+                raw = np.fromiter(
+                    (self.vad.is_speech(buffer[i * frame_bytes:(i + 1) * frame_bytes], self.sample_rate)
+                     for i in range(num_frames)),
+                    dtype=bool,
+                    count=num_frames
+                )
+
+            starts, ends = _runs(raw)
+            keep = (ends - starts) >= self.min_speech_frames
+            starts, ends = starts[keep], np.minimum(ends[keep] + self.hangover_frames, num_frames)
+            mask = _mask_from_runs(starts, ends, num_frames)
+
+            starts, ends = _runs(mask)
+            segments = [
+                (int(start) * self.frame_size, int(end) * self.frame_size)
+                for start, end in zip(starts, ends)
+            ]
+            return SpeechSegmentation(mask, segments, self.frame_size)
         except Exception as e:
             self.logger.error(f"Speech detection failed: {e}")
-            return False
-
+            return SpeechSegmentation(np.zeros(0, dtype=bool), [], self.frame_size)
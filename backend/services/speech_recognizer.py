@@ -1,57 +1,384 @@
 # backend/services/speech_recognizer.py
 
-from vosk import Model, KaldiRecognizer
 import logging
-from services.event_storage import EventStorage
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.event_storage import get_event_storage
 from models.event import Event
-from datetime import datetime
+from config import SpeechConfig
+from services.audio_chunk import AudioChunk
+from services.metrics import get_metrics, SERVICE_SECONDS
+from services.model_loader import get_model_loader
+from datetime import datetime, timedelta
 import numpy as np
 import json
 import os
 
+_LANGUAGE_DECODES = get_metrics().counter(
+    'alog_language_decodes_total', 'Utterances decoded per language in automatic language mode', ('language',)
+)
+
+# Pass as `language` to pick the language per utterance
+AUTO_LANGUAGE = 'auto'
+
+def parse_result(result):
+    """(text, word confidences) of a Vosk result with SetWords(True)."""
+    parsed = json.loads(result)
+    return parsed.get('text', '').strip(), [word['conf'] for word in parsed.get('result', ())]
+
+def mean_confidence(confidences):
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+class RecognitionStream:
+    """
+    A long-lived KaldiRecognizer that is fed consecutive speech chunks of one language.
+
+    Audio is accepted in small blocks so partial hypotheses are available while an utterance
+    is still in progress. Only voiced spans need to be fed; the utterance's duration is measured
+    in wall-clock time from the first to the last sample fed. `finish` closes the current
+    utterance and returns its full text, start time, duration and mean word confidence; the
+    recognizer is then reused for the next utterance. With `keep_audio` the utterance's
+    samples are kept until then, so it can be decoded again with another model.
+    """
+    def __init__(self, model, language, sample_rate=16000):
+        from vosk import KaldiRecognizer
+        self.language = language
+        self.sample_rate = sample_rate
+        self.recognizer = KaldiRecognizer(model, sample_rate)
+        self.recognizer.SetWords(True)
+        self.keep_audio = False
+        self._reset()
+
+    def _reset(self):
+        self.started_at = None
+        self.ended_at = None
+        self.audio_id = None
+        self.samples = 0
+        self.partial = ''
+        self.audio = []
+        self._segments = []
+        self._confidences = []
+
+    @property
+    def active(self):
+        return self.started_at is not None
+
+    @property
+    def duration(self):
+        if not self.active:
+            return 0.0
+        return (self.ended_at - self.started_at).total_seconds()
+
+    def accept(self, pcm, audio_id, started_at, block_size):
+        """
+        Feed int16 samples belonging to the current utterance; `started_at` is the
+        capture time of the first sample. Yields each new partial hypothesis as it
+        becomes available.
+        """
+        if not self.active:
+            self.started_at = started_at
+            self.audio_id = audio_id
+        self.ended_at = started_at + timedelta(seconds=len(pcm) / self.sample_rate)
+        if self.keep_audio:
+            self.audio.append(pcm.copy())
+
+        for start in range(0, len(pcm), block_size):
+            block = pcm[start:start + block_size]
+            self.samples += len(block)
+            if self.recognizer.AcceptWaveform(block.tobytes()):
+                # Kaldi found an endpoint inside the utterance; keep the segment and carry on
+                text, confidences = parse_result(self.recognizer.Result())
+                if text:
+                    self._segments.append(text)
+                    self._confidences.extend(confidences)
+                partial = ''
+            else:
+                partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+
+            if partial and partial != self.partial:
+                self.partial = partial
+                yield ' '.join(self._segments + [partial])
+
+    def finish(self):
+        """Finalize the current utterance; returns (text, started_at, duration, audio_id, confidence)."""
+        text, confidences = parse_result(self.recognizer.FinalResult())
+        if text:
+            self._segments.append(text)
+            self._confidences.extend(confidences)
+        result = (
+            ' '.join(self._segments).strip(), self.started_at, self.duration, self.audio_id,
+            mean_confidence(self._confidences)
+        )
+        self._reset()
+        return result
+
 class SpeechRecognizer:
-    def __init__(self):
+    """
+    Vosk speech recognition for one language, or for whichever of SpeechConfig.LANGUAGES is
+    being spoken when `language` is 'auto'.
+
+    In automatic mode an utterance is decoded with every language's model concurrently and the
+    result with the best mean word confidence wins. The winner then sticks: later utterances are
+    decoded with that model alone, and the others are only consulted again when its confidence
+    drops below SpeechConfig.AUTO_MIN_CONFIDENCE (the utterance is then decoded again with them),
+    or after SpeechConfig.AUTO_STICKY_TIMEOUT seconds without speech, when the session ends.
+    """
+    def __init__(self, on_partial=None):
         self.logger = logging.getLogger('SpeechRecognizer')
+        # Called with (language, text) whenever a streaming utterance's partial result changes
+        self.on_partial = on_partial
+        self.streams = {}
+        # Vosk models are loaded through the shared loader: in the background by `preload`,
+        # or on first use of a language by `load_model`
+        self.loader = get_model_loader()
+        self.event_storage = get_event_storage()
+
+        # Automatic language mode
+        self.sticky_language = None
+        self._last_speech_at = None
+        # Languages fed by the streaming utterance in progress
+        self._auto_languages = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def preload(self, languages):
+        """Start loading the models of `languages` in the background."""
+        for language in languages:
+            self.loader.submit(
+                f"vosk-{language}",
+                lambda language=language: self._load_model(language),
+                warmup=self._warm_up
+            )
+
+    def load_model(self, language):
+        """The model for `language` (or English if we have none for it), loading it if needed."""
+        if language not in SpeechConfig.LANGUAGES:
+            language = 'en'
+        return self.loader.ensure(f"vosk-{language}", lambda: self._load_model(language), warmup=self._warm_up)
+
+    def _load_model(self, language):
+        # Imported here so the web server can start before Vosk is loaded
+        from vosk import Model
+        model = Model(os.path.join(SpeechConfig.VOSK_MODEL_DIR, language))
+        self.logger.info(f"Vosk model loaded: {language}")
+        return model
+
+    def _warm_up(self, model):
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(model, 16000)
+        recognizer.AcceptWaveform(bytes(16000))  # half a second of silence
+        recognizer.FinalResult()
+
+    def _decode(self, language, pcm_bytes):
+        """Decode a complete utterance with one model; returns (text, mean word confidence)."""
+        from vosk import KaldiRecognizer
+        model = self.load_model(language)
+        with SERVICE_SECONDS.time('speech_recognizer.recognize'):
+            rec = KaldiRecognizer(model, 16000)
+            rec.SetWords(True)
+            rec.AcceptWaveform(pcm_bytes)
+            text, confidences = parse_result(rec.FinalResult())
+        return text, mean_confidence(confidences)
+
+    def _map(self, function, languages):
+        """Run `function(language)` for every language, concurrently; returns {language: result}."""
+        languages = list(languages)
+        if len(languages) < 2:
+            return {language: function(language) for language in languages}
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=SpeechConfig.AUTO_WORKERS or len(SpeechConfig.LANGUAGES),
+                    thread_name_prefix='recognizer'
+                )
+        # Vosk releases the GIL while decoding, so the models really run in parallel
+        return dict(zip(languages, self._pool.map(function, languages)))
+
+    def _session_language(self, now):
+        """The sticky language, unless the session it belongs to has gone quiet."""
+        if self.sticky_language is not None and self._last_speech_at is not None:
+            if (now - self._last_speech_at).total_seconds() > SpeechConfig.AUTO_STICKY_TIMEOUT:
+                self.logger.debug(f"Language session ended, forgetting {self.sticky_language.upper()}")
+                self.sticky_language = None
+        return self.sticky_language
+
+    def _choose(self, results, pcm_bytes, now):
+        """
+        Pick the language of an utterance from {language: (text, confidence)}. If only the
+        sticky language was tried and it isn't confident, decode `pcm_bytes` with the others
+        too. Returns (language, text, confidence).
+        """
+        sticky = self.sticky_language
+        if sticky in results and len(results) == 1:
+            text, confidence = results[sticky]
+            if text and confidence < SpeechConfig.AUTO_MIN_CONFIDENCE and pcm_bytes:
+                others = [language for language in SpeechConfig.LANGUAGES if language != sticky]
+                self.logger.debug(f"Low confidence ({confidence:.2f}) in {sticky.upper()}, trying {', '.join(others)}")
+                results.update(self._map(lambda language: self._decode(language, pcm_bytes), others))
+
+        # Languages that heard no words at all lose to any that did
+        language = max(results, key=lambda language: (bool(results[language][0]), results[language][1]))
+        text, confidence = results[language]
+        for decoded in results:
+            _LANGUAGE_DECODES.inc(decoded)
+        if text:
+            if language != sticky:
+                self.logger.info(f"Speech language: {language.upper()} (confidence {confidence:.2f})")
+            self.sticky_language = language
+            self._last_speech_at = now
+        return language, text, confidence
+
+    def recognize(self, audio_data, audio_id, language='en', store=True, segments=None):
+        events = []
         try:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            self.models = {
-                'en': Model('/home/khadas/alog/models/vosk/en'),
-                'ru': Model('/home/khadas/alog/models/vosk/ru')
-            }
-            self.event_storage = EventStorage()
-            self.logger.info("Vosk models loaded successfully")
+            chunk = AudioChunk.wrap(audio_data)
+
+            # Decode only the voiced spans when the VAD segmentation is known
+            if segments is None:
+                pcm_bytes = chunk.pcm_bytes
+            elif segments:
+                pcm_bytes = np.concatenate([chunk.pcm16[start:end] for start, end in segments]).tobytes()
+            else:
+                return events
+
+            timestamp = chunk.captured_at or datetime.utcnow()
+            if language == AUTO_LANGUAGE:
+                sticky = self._session_language(timestamp)
+                languages = [sticky] if sticky else SpeechConfig.LANGUAGES
+                results = self._map(lambda candidate: self._decode(candidate, pcm_bytes), languages)
+                language, text, confidence = self._choose(results, pcm_bytes, timestamp)
+            else:
+                text, confidence = self._decode(language, pcm_bytes)
+
+            if text:  # Only log if there's actual speech content
+                event = self._speech_event(text, language, timestamp, None, audio_id, confidence)
+                events.append(event)
+                if store:
+                    self.event_storage.store_event(event)
+
         except Exception as e:
-            self.logger.error(f"Failed to load Vosk models: {e}")
+            self.logger.error(f"Speech recognition failed: {e}")
+        return events
+
+    def stream(self, audio_data, audio_id, language='en', is_speech=True, trailing_silence=None,
+               timestamp=None, store=True, segments=None):
+        """
+        Streaming counterpart of `recognize`: consecutive speech chunks are fed into one
+        persistent recognizer per language, so words spanning chunk boundaries stay intact.
 
-    def recognize(self, audio_data, audio_id, language='en'):
+        Voiced spans extend the current utterance; `segments` restricts decoding to the
+        VAD's speech spans (sample offsets), otherwise the whole chunk is fed when `is_speech`.
+        When VAD reports trailing silence (by default, any chunk without speech) the utterance
+        is finalized into a single speech event whose timestamp is the utterance start and
+        whose duration runs to the end of its last voiced span. `timestamp` is the capture
+        time of the chunk's first sample and defaults to the chunk's own capture time.
+        With language 'auto' every candidate language's stream is fed and the most confident
+        one names the utterance. Returns the finalized events (usually none or one).
+        """
+        events = []
+        chunk = AudioChunk.wrap(audio_data)
+        if segments is None:
+            segments = [(0, len(chunk))] if is_speech else []
+        if trailing_silence is None:
+            trailing_silence = not segments
         try:
-            # Preprocess audio_data
-            if audio_data.ndim > 1:
-                audio_data = np.mean(audio_data, axis=1)
-            audio_data = (audio_data * 32768).astype(np.int16)
+            if timestamp is None:
+                timestamp = chunk.captured_at or datetime.utcnow()
+            if language == AUTO_LANGUAGE:
+                if self._auto_languages is None and segments:
+                    # A new utterance: the candidates stay fixed until it is finalized
+                    sticky = self._session_language(timestamp)
+                    self._auto_languages = [sticky] if sticky else list(SpeechConfig.LANGUAGES)
+                languages = self._auto_languages or []
+            else:
+                languages = [language]
+            streams = [self._get_stream(candidate) for candidate in languages]
+            for stream in streams:
+                # A lone sticky stream keeps its audio in case it has to be decoded again
+                stream.keep_audio = language == AUTO_LANGUAGE and len(streams) == 1
 
-            # Select the language model
-            model = self.models.get(language, self.models['en'])
-            rec = KaldiRecognizer(model, 16000)
-            rec.AcceptWaveform(audio_data.tobytes())
-            result = rec.Result()
-            text = json.loads(result).get('text', '')
-
-            if text.strip():  # Only log if there's actual speech content
-                # Log with enhanced format
-                self.logger.speech(text.strip(), language=language.upper())
-
-                # Store in database
-                timestamp = datetime.utcnow()
-                event = Event(
-                    event_type='speech',
-                    label=text.strip(),
-                    confidence=None,
-                    timestamp=timestamp,
-                    meta_info=f"Language: {language.upper()}",
-                    audio_id=audio_id
-                )
-                self.event_storage.store_event(event)
+            if segments and streams:
+                def feed(stream):
+                    partials = []
+                    for start, end in segments:
+                        span_start = timestamp + timedelta(seconds=start / stream.sample_rate)
+                        partials.extend(stream.accept(chunk.pcm16[start:end], audio_id, span_start, SpeechConfig.STREAM_BLOCK_SIZE))
+                    return partials
+
+                with SERVICE_SECONDS.time('speech_recognizer.stream'):
+                    fed = self._map(lambda candidate: feed(self._get_stream(candidate)), languages)
+                for candidate, partials in fed.items():
+                    for partial in partials:
+                        self.logger.debug(f"[{candidate.upper()}] ... {partial}")
+                        if self.on_partial:
+                            self.on_partial(candidate, partial)
+
+            active = [stream for stream in streams if stream.active]
+            utterance_too_long = any(stream.duration >= SpeechConfig.MAX_UTTERANCE_DURATION for stream in active)
+            if active and (trailing_silence or utterance_too_long):
+                events.extend(self._finish(language, active, timestamp, store))
+            elif not active and language == AUTO_LANGUAGE:
+                self._auto_languages = None
 
         except Exception as e:
-            self.logger.error(f"Speech recognition failed: {e}")
\ No newline at end of file
+            self.logger.error(f"Streaming speech recognition failed: {e}")
+        return events
+
+    def _finish(self, language, streams, now, store):
+        """Finalize the utterance in `streams` into at most one event."""
+        pcm_bytes = b''.join(pcm.tobytes() for stream in streams for pcm in stream.audio)
+        finished = {stream.language: stream.finish() for stream in streams}
+        if language == AUTO_LANGUAGE:
+            self._auto_languages = None
+            results = {candidate: (result[0], result[4]) for candidate, result in finished.items()}
+            language, _, _ = self._choose(results, pcm_bytes, now)
+            if language not in finished:
+                # Decoded again from the kept audio: same utterance, another language
+                text, confidence = results[language]
+                _, started_at, duration, first_audio_id, _ = next(iter(finished.values()))
+            else:
+                text, started_at, duration, first_audio_id, confidence = finished[language]
+        else:
+            text, started_at, duration, first_audio_id, confidence = finished[streams[0].language]
+
+        if not text:
+            return []
+        event = self._speech_event(text, language, started_at, duration, first_audio_id, confidence)
+        if store:
+            self.event_storage.store_event(event)
+        return [event]
+
+    def finish_streams(self, store=True):
+        """Finalize every utterance still in progress (end of input); returns their events."""
+        events = []
+        now = datetime.utcnow()
+        if self._auto_languages:
+            auto_streams = [self.streams[language] for language in self._auto_languages if self.streams[language].active]
+            if auto_streams:
+                events.extend(self._finish(AUTO_LANGUAGE, auto_streams, now, store))
+            self._auto_languages = None
+        for language, stream in self.streams.items():
+            if stream.active:
+                events.extend(self._finish(language, [stream], now, store))
+        return events
+
+    def _get_stream(self, language):
+        if language not in SpeechConfig.LANGUAGES:
+            language = 'en'
+        if language not in self.streams:
+            self.streams[language] = RecognitionStream(self.load_model(language), language)
+        return self.streams[language]
+
+    def _speech_event(self, text, language, timestamp, duration, audio_id, confidence=None):
+        # Log with enhanced format
+        self.logger.speech(text, language=language.upper())
+
+        return Event(
+            event_type='speech',
+            label=text,
+            confidence=confidence,
+            timestamp=timestamp,
+            duration=duration,
+            meta_info=f"Language: {language.upper()}",
+            audio_id=audio_id
+        )
@@ -1,120 +1,178 @@
 # backend/services/websocket_logger.py
 
+import json
 import logging
-import queue
 import threading
+import time
+from flask import request
 from flask_sock import Sock
 from datetime import datetime
-import colorama
-from colorama import Fore, Style
-from logger import CustomLogLevels  # Import your custom log levels
+from logger import LevelFilter, attach_handler
+from config import LogConfig
+
+class LogRingBuffer:
+    """
+    Fixed-size buffer of formatted log records shared by every WebSocket client.
+
+    Each record gets a sequence number; clients keep their own cursor (the next sequence
+    number they want) instead of their own queue, so a slow client only falls behind
+    instead of slowing down logging or the other clients. Once a client falls further
+    behind than the buffer holds, it skips ahead and is told how many records it missed.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._records = [None] * capacity
+        self._next_seq = 0
+        self._condition = threading.Condition()
+
+    @property
+    def next_seq(self):
+        return self._next_seq
+
+    def append(self, levelno, name, payload):
+        with self._condition:
+            self._records[self._next_seq % self.capacity] = (levelno, name, payload)
+            self._next_seq += 1
+            self._condition.notify_all()
+
+    def wait(self, cursor, timeout):
+        """Block until a record at or after `cursor` exists or `timeout` expires."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._next_seq > cursor, timeout)
+
+    def read(self, cursor, limit):
+        """
+        Records from `cursor` on, at most `limit` of them.
+        Returns (records, next_cursor, missed) where missed counts overwritten records.
+        """
+        with self._condition:
+            oldest = max(0, self._next_seq - self.capacity)
+            missed = max(0, oldest - cursor)
+            cursor = max(cursor, oldest)
+            end = min(self._next_seq, cursor + limit)
+            records = [self._records[seq % self.capacity] for seq in range(cursor, end)]
+        return records, end, missed
+
+class ClientFilter:
+    """Which records one WebSocket client asked for: a set of levels and/or logger name prefixes."""
+    def __init__(self, levels=None, loggers=None):
+        self.levels = levels
+        self.loggers = tuple(loggers) if loggers else None
+
+    @classmethod
+    def from_args(cls, args):
+        """Build from query parameters; without `levels`, the console's enabled levels apply."""
+        levels = args.get('levels')
+        loggers = args.get('loggers')
+        return cls(
+            LevelFilter.from_env_string(levels).enabled_levels if levels else LogConfig.get_enabled_levels(),
+            [name.strip() for name in loggers.split(',') if name.strip()] if loggers else None
+        )
+
+    def matches(self, levelno, name):
+        if self.levels is not None and levelno not in self.levels:
+            return False
+        if self.loggers is not None and not name.startswith(self.loggers):
+            return False
+        return True
 
 class WebSocketHandler(logging.Handler):
     """
     A logging handler that forwards logs to WebSocket clients.
     Think of this as a bridge between your logging system and the web browser.
+
+    Every record is turned into a JSON payload exactly once and appended to a shared
+    LogRingBuffer; the connections read from there at their own pace.
     """
-    def __init__(self):
+    def __init__(self, capacity=None):
         super().__init__()
-        self.clients = set()
-        self.lock = threading.Lock()
-        colorama.init()
+        self.buffer = LogRingBuffer(capacity or LogConfig.WS_BUFFER_SIZE)
         # Set logging level to capture everything
         self.setLevel(logging.DEBUG)
-    
+
     def emit(self, record):
         """
         This method is called whenever a log needs to be processed.
-        It's like a mail carrier that delivers your log messages to their destination.
+        It's like a mail carrier that drops your log message in the shared mailbox.
         """
         try:
-            # Format the log message using the same styling as your ColorFormatter
-            category_str = ""
-            confidence_str = ""
-            lang_str = ""
-
-            # Preserve the extra fields from your custom logger
-            if hasattr(record, 'sound_category'):
-                category_str = f" | {record.sound_category}"
-            if hasattr(record, 'confidence'):
-                confidence_str = f" | {record.confidence:.2%}" if record.confidence is not None else ""
-            if hasattr(record, 'language'):
-                lang_str = f" {record.language}"
-
-            # Get the level color like your ColorFormatter does
-            FORMATS = {
-                logging.DEBUG: Fore.CYAN + Style.DIM,
-                logging.INFO: Fore.WHITE,
-                CustomLogLevels.SPEECH: Fore.GREEN,
-                CustomLogLevels.EVENT: Fore.YELLOW,
-                logging.WARNING: Fore.YELLOW + Style.BRIGHT,
-                logging.ERROR: Fore.RED + Style.BRIGHT,
-                logging.CRITICAL: Fore.RED + Style.BRIGHT + Style.BRIGHT
+            payload = {
+                'seq': self.buffer.next_seq,
+                'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
             }
-
-            # Format the message with consistent styling
-            timestamp = datetime.fromtimestamp(record.created)
-            log_msg = (
-                f"{Fore.BLUE}{timestamp.strftime('%Y-%m-%d | %H:%M:%S')}{Style.RESET_ALL} | "
-                f"{FORMATS.get(record.levelno, '')}{record.levelname:7}{Style.RESET_ALL} |"
-                f"{lang_str}{category_str} {record.getMessage()}{confidence_str}"
-            )
-
-            # Send the formatted message to all connected clients
-            with self.lock:
-                clients = self.clients.copy()
-                for client_queue in clients:
-                    try:
-                        client_queue.put_nowait(log_msg)
-                    except queue.Full:
-                        self.clients.remove(client_queue)
-                        
+            # Preserve the extra fields from the custom logger
+            for field in ('language', 'sound_category', 'confidence'):
+                value = getattr(record, field, None)
+                if value is not None:
+                    payload[field] = value
+            self.buffer.append(record.levelno, record.name, json.dumps(payload))
         except Exception as e:
             # If something goes wrong, print it to stderr (will show in your console)
             import sys
             print(f"Error in WebSocketHandler: {e}", file=sys.stderr)
 
-    def add_client(self, client_queue):
-        """Register a new web browser to receive logs."""
-        with self.lock:
-            self.clients.add(client_queue)
-            # Send a test message to confirm logging is working
-            client_queue.put_nowait(f"{Fore.GREEN}Logging system connected successfully{Style.RESET_ALL}")
-
-    def remove_client(self, client_queue):
-        """Remove a web browser when it disconnects."""
-        with self.lock:
-            self.clients.discard(client_queue)
+def build_frame(payloads, missed=0):
+    """One WebSocket frame; the records are already JSON, so they are joined rather than re-encoded."""
+    return f'{{"missed":{missed},"records":[{",".join(payloads)}]}}'
 
 def setup_websocket_logging(app, logger):
     """
     Sets up the WebSocket connection and integrates it with your logging system.
     This is like building the bridge between your backend and frontend.
+
+    Clients connect to /ws/logs and may pass, as query parameters:
+      - levels:  comma-separated level names to receive, e.g. EVENT,SPEECH (default ENABLED_LOG_LEVELS)
+      - loggers: comma-separated logger name prefixes, e.g. SoundClassifier,SpeechRecognizer
+      - replay:  how many recent records to send first (default LogConfig.WS_REPLAY)
+      - after:   the last sequence number already seen, to resume exactly after a reconnect
     """
     sock = Sock(app)
-    
+
     # Create and configure the WebSocket handler
     ws_handler = WebSocketHandler()
-    
-    # This is crucial - add the handler to your logger
-    logger.addHandler(ws_handler)
-    
+
+    # This is crucial - attach the handler at the root, so every service's records
+    # reach the buffer and clients can pick the loggers they want
+    attach_handler(ws_handler)
+
     @sock.route('/ws/logs')
     def logs(ws):
         """Handles each WebSocket connection from a browser."""
-        client_queue = queue.Queue(maxsize=100)
-        ws_handler.add_client(client_queue)
-        
+        buffer = ws_handler.buffer
+        client_filter = ClientFilter.from_args(request.args)
+        try:
+            replay_from = max(0, buffer.next_seq - int(request.args.get('replay', LogConfig.WS_REPLAY)))
+            after = request.args.get('after')
+            cursor = int(after) + 1 if after is not None else replay_from
+            if cursor > buffer.next_seq:
+                # The client saw records from before a restart; sequence numbers start over
+                cursor = replay_from
+        except ValueError:
+            ws.close(reason=1008, message='after and replay must be numbers')
+            return
+
+        # Time of the last read, so frames go out at most once per send interval
+        last_sent = time.monotonic()
         try:
             while True:
-                try:
-                    # Wait for new log messages
-                    message = client_queue.get(timeout=30)
-                    ws.send(message)
-                except queue.Empty:
+                if not buffer.wait(cursor, LogConfig.WS_KEEPALIVE):
                     # Send an empty message to keep the connection alive
                     ws.send('')
+                    last_sent = time.monotonic()
+                    continue
+
+                # Let records pile up for the rest of the send interval, then send them as one frame
+                pause = LogConfig.WS_SEND_INTERVAL - (time.monotonic() - last_sent)
+                if pause > 0:
+                    time.sleep(pause)
+
+                records, cursor, missed = buffer.read(cursor, LogConfig.WS_MAX_BATCH)
+                payloads = [payload for levelno, name, payload in records if client_filter.matches(levelno, name)]
+                if payloads or missed:
+                    ws.send(build_frame(payloads, missed))
+                last_sent = time.monotonic()
         except Exception as e:
-            logger.error(f"WebSocket error: {e}")
-        finally:
-            ws_handler.remove_client(client_queue)
\ No newline at end of file
+            logger.debug(f"WebSocket closed: {e}")
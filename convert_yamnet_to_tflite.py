@@ -1,49 +1,228 @@
-import tensorflow as tf
-import tensorflow_hub as hub
+# convert_yamnet_to_tflite.py
+#
+# Build a TFLite YAMNet from the local SavedModel, offline. By default the model is fully
+# integer quantized (int8 weights and activations), with activation ranges calibrated on
+# windows drawn from our own recordings: an audio_chunks store and/or WAV files, read the way
+# scripts/replay.py reads them. Part of the recordings (whole files / stored hours) is held
+# out. The float SavedModel and the new model are then both run on it, and a JSON report
+# compares their model size, latency and top-k label agreement, to decide per deployment
+# whether SoundClassifier should load it (CLASSIFIER_ENGINE=tflite, YAMNET_TFLITE_MODEL_PATH).
+#
+# YAMNet computes its log-mel spectrogram in the graph. Ops without an int8 kernel stay in
+# float unless --strict is given. Input and output remain float32, so TFLiteEngine runs the
+# result unchanged.
+#
+# Usage:
+#   python convert_yamnet_to_tflite.py backend/audio_chunks [--output models/yamnet/yamnet_int8.tflite]
+#   python convert_yamnet_to_tflite.py recordings/ --quantization dynamic --output models/yamnet/yamnet_optimized.tflite
+#   python convert_yamnet_to_tflite.py backend/audio_chunks --report-only --output models/yamnet/yamnet_int8.tflite
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+
 import numpy as np
-import csv
-import io
 
-# Load the YAMNet model
-model = hub.load('https://www.kaggle.com/models/google/yamnet/TensorFlow2/yamnet/1')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from config import AudioConfig, ClassifierConfig, MODELS_DIR
+from services.audio_chunk import AudioChunk
+from services.file_capture import discover_sources, unit_runs
+from services.inference_engine import compare_top_k, load_class_map, load_inference_engine
+
+QUANTIZATIONS = ('int8', 'dynamic', 'none')
+
+def unit_name(unit):
+    return unit[1] if unit[0] == 'wav' else f"{unit[1]}:{unit[2]}"
+
+def split_units(units, holdout_fraction):
+    """
+    Split work units into calibration and held-out sets by a hash of their name, so a
+    file or stored hour always lands on the same side however the sources are listed.
+    """
+    calibration, holdout = [], []
+    for unit in units:
+        bucket = zlib.crc32(unit_name(unit).encode()) % 1000 / 1000
+        (holdout if bucket < holdout_fraction else calibration).append(unit)
+    return calibration, holdout
+
+def unit_windows(units, limit, min_level):
+    """
+    Up to `limit` chunk-sized windows from the units, spread evenly over all the audio, and
+    peak-normalized the way SoundClassifier feeds YAMNet. Windows quieter than `min_level`
+    (peak, full scale 1.0) carry nothing to calibrate on and are skipped.
+    """
+    sample_rate = AudioConfig.SAMPLE_RATE
+    # Only keep a few windows per unit, so a store of many hours isn't held in memory at once
+    per_unit = -(-2 * limit // max(len(units), 1))
+    windows = []
+    for unit in units:
+        try:
+            candidates = []
+            for _, samples, _ in unit_runs(unit, sample_rate):
+                for offset in range(0, len(samples) - AudioConfig.CHUNK_SIZE + 1, AudioConfig.CHUNK_SIZE):
+                    window = samples[offset:offset + AudioConfig.CHUNK_SIZE]
+                    if np.max(np.abs(window)) >= min_level:
+                        candidates.append(window)
+            if len(candidates) > per_unit:
+                candidates = [candidates[i] for i in np.linspace(0, len(candidates) - 1, per_unit).astype(int)]
+            windows.extend(candidates)
+        except Exception as e:
+            print(f"Skipping {unit_name(unit)}: {e}", file=sys.stderr)
+    if len(windows) > limit:
+        picks = np.linspace(0, len(windows) - 1, limit).astype(int)
+        windows = [windows[i] for i in picks]
+    return [AudioChunk(window, sample_rate).normalized.copy() for window in windows]
+
+def model_size(path):
+    """Bytes of a .tflite file, or of a SavedModel's graph and variables (the .tflite files live beside them)."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    size = os.path.getsize(os.path.join(path, 'saved_model.pb'))
+    for root, _, files in os.walk(os.path.join(path, 'variables')):
+        size += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return size
+
+def convert(saved_model_path, quantization, calibration, strict):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_path)
+    if quantization == 'none':
+        return converter.convert()
+
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'int8':
+        def representative_dataset():
+            for waveform in calibration:
+                yield [waveform]
 
-# Create a sample input (3 seconds of silence as an example)
-waveform = np.zeros(3 * 16000, dtype=np.float32)
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = (
+            [tf.lite.OpsSet.TFLITE_BUILTINS_INT8] if strict
+            else [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+        )
+        # TFLiteEngine writes float waveforms and reads float scores
+        converter.inference_input_type = tf.float32
+        converter.inference_output_type = tf.float32
+    return converter.convert()
 
-# Run the model to get its outputs
-scores, embeddings, log_mel_spectrogram = model(waveform)
+def measure_latency(engine, waveforms, repeats):
+    """Per-call latency percentiles (ms) and real-time factor, after one warm-up call."""
+    if not waveforms:
+        return {}
+    with engine.lock:
+        engine.infer(waveforms[0])
+    timings = []
+    for _ in range(repeats):
+        for waveform in waveforms:
+            with engine.lock:
+                started = time.perf_counter()
+                engine.infer(waveform)
+                timings.append(time.perf_counter() - started)
+    timings.sort()
+    percentile = lambda q: round(timings[min(int(q * len(timings)), len(timings) - 1)] * 1000, 3)
+    return {
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'rtf': round(sum(timings) / (len(timings) * AudioConfig.CHUNK_DURATION), 5),
+    }
 
-# Verify the shapes
-print(f"Scores shape: {scores.shape}")
-print(f"Embeddings shape: {embeddings.shape}")
-print(f"Log mel spectrogram shape: {log_mel_spectrogram.shape}")
+def score_error(reference, candidate, waveforms):
+    """Mean and max absolute difference of the chunk-mean class scores."""
+    errors = []
+    for waveform in waveforms:
+        means = []
+        for engine in (reference, candidate):
+            with engine.lock:
+                means.append(np.mean(engine.infer(waveform), axis=0))
+        errors.append(np.abs(means[0] - means[1]))
+    if not errors:
+        return {}
+    errors = np.stack(errors)
+    return {'mean_abs': round(float(errors.mean()), 5), 'max_abs': round(float(errors.max()), 5)}
 
-# Function to get class names from the CSV
-def class_names_from_csv(class_map_csv_text):
-    class_map_csv = io.StringIO(class_map_csv_text)
-    class_names = [display_name for (class_index, mid, display_name) in csv.reader(class_map_csv)]
-    class_names = class_names[1:]  # Skip CSV header
-    return class_names
+def main():
+    parser = argparse.ArgumentParser(description="Quantize YAMNet to TFLite, calibrated on stored audio, and report on it")
+    parser.add_argument('sources', nargs='+', help="audio_chunks store, WAV files or directories of them")
+    parser.add_argument('--saved-model', default=ClassifierConfig.SAVED_MODEL_PATH, help="Float YAMNet SavedModel")
+    parser.add_argument('--output', default=os.path.join(MODELS_DIR, 'yamnet', 'yamnet_int8.tflite'))
+    parser.add_argument('--report', help="Report path (default: next to the model, .json)")
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default='int8',
+                        help="int8: full integer with calibration; dynamic: int8 weights only; none: float")
+    parser.add_argument('--strict', action='store_true', help="Fail instead of keeping ops without int8 kernels in float")
+    parser.add_argument('--calibration-windows', type=int, default=300, help="Windows for the representative dataset")
+    parser.add_argument('--holdout-windows', type=int, default=200, help="Windows for the report")
+    parser.add_argument('--holdout-fraction', type=float, default=0.2, help="Fraction of files / stored hours held out")
+    parser.add_argument('--min-level', type=float, default=0.001, help="Skip windows with a lower peak (full scale 1.0)")
+    parser.add_argument('--k', type=int, default=5, help="Number of top labels to compare")
+    parser.add_argument('--threads', type=int, default=ClassifierConfig.TFLITE_THREADS)
+    parser.add_argument('--repeats', type=int, default=3, help="Latency passes over the held-out windows")
+    parser.add_argument('--report-only', action='store_true', help="Evaluate an existing --output model without converting")
+    args = parser.parse_args()
 
-# Get the class names
-class_map_path = model.class_map_path().numpy()
-class_names = class_names_from_csv(tf.io.read_file(class_map_path).numpy().decode('utf-8'))
+    units = discover_sources(args.sources, AudioConfig.SAMPLE_RATE)
+    calibration_units, holdout_units = split_units(units, args.holdout_fraction)
+    if not holdout_units or not calibration_units:
+        # Too few files or hours to split; fall back to using them all for both
+        print(f"Only {len(units)} recording(s); calibrating and evaluating on the same audio", file=sys.stderr)
+        calibration_units = holdout_units = units
+    holdout = unit_windows(holdout_units, args.holdout_windows, args.min_level)
+    if not holdout:
+        print(f"No usable audio in {', '.join(args.sources)}", file=sys.stderr)
+        return 1
 
-# Print the predicted class for the sample input
-print(f"Predicted class: {class_names[scores.numpy().mean(axis=0).argmax()]}")
+    if not args.report_only:
+        calibration = []
+        if args.quantization == 'int8':
+            calibration = unit_windows(calibration_units, args.calibration_windows, args.min_level)
+            print(f"Calibrating on {len(calibration)} windows from {len(calibration_units)} recording(s)", file=sys.stderr)
+        started = time.perf_counter()
+        model = convert(args.saved_model, args.quantization, calibration, args.strict)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'wb') as f:
+            f.write(model)
+        print(f"Wrote {args.output} ({len(model) / 1e6:.1f} MB) in {time.perf_counter() - started:.0f}s", file=sys.stderr)
 
-# Save the model in SavedModel format
-tf.saved_model.save(model, '/home/khadas/alog/models/yamnet/yamnet_savedmodel')
-print("Model saved in SavedModel format.")
+    class_names, _ = load_class_map(ClassifierConfig.CLASS_MAP_PATH)
+    reference = load_inference_engine('savedmodel', args.saved_model, num_classes=len(class_names))
+    candidate = load_inference_engine('tflite', args.output, num_classes=len(class_names), num_threads=args.threads)
 
-# Convert to TFLite
-converter = tf.lite.TFLiteConverter.from_saved_model('/home/khadas/alog/models/yamnet/yamnet_savedmodel')
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-converter.target_spec.supported_types = [tf.float32]  # Changed from float16 to float32
-tflite_model = converter.convert()
+    print(f"Evaluating on {len(holdout)} held-out windows", file=sys.stderr)
+    agreement = compare_top_k(reference, candidate, holdout, class_names, k=args.k)
+    report = {
+        'created': datetime.utcnow().isoformat(timespec='seconds'),
+        'model': args.output,
+        'quantization': None if args.report_only else args.quantization,
+        'calibration_recordings': len(calibration_units),
+        'holdout_recordings': len(holdout_units),
+        'holdout_windows': len(holdout),
+        'size_mb': {
+            'savedmodel': round(model_size(args.saved_model) / 1e6, 2),
+            'tflite': round(model_size(args.output) / 1e6, 2),
+        },
+        'latency': {
+            'savedmodel': measure_latency(reference, holdout, args.repeats),
+            'tflite': measure_latency(candidate, holdout, args.repeats),
+        },
+        'score_error': score_error(reference, candidate, holdout),
+        'agreement': agreement,
+    }
 
-# Save the TFLite model
-with open('/home/khadas/alog/models/yamnet/yamnet_optimized.tflite', 'wb') as f:
-    f.write(tflite_model)
+    report_path = args.report or os.path.splitext(args.output)[0] + '.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(
+        f"top-1 {agreement['top1_agreement']:.1%}, top-{args.k} {agreement['topk_agreement']:.1%}, "
+        f"p50 {report['latency']['tflite'].get('p50_ms')} ms vs {report['latency']['savedmodel'].get('p50_ms')} ms; "
+        f"report in {report_path}",
+        file=sys.stderr
+    )
+    return 0
 
-print("Model converted and saved as yamnet_optimized.tflite")
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# scripts/bench_logging.py
+#
+# Measure how long a logger.event(...) call blocks its caller with synchronous handlers
+# (file + console on the calling thread) and in async mode (enqueue only, a listener
+# thread does the I/O). Logs go to a temporary directory and the console output to
+# /dev/null, so the numbers are the handler cost rather than terminal speed.
+#
+# Usage:
+#   python scripts/bench_logging.py [--calls 20000] [--threads 1]
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from logger import setup_logger, shutdown_logger
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def run(async_mode, calls, threads):
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+        setup_logger(log_dir=log_dir, async_mode=async_mode, stream=devnull)
+        logger = logging.getLogger('SoundClassifier')
+        timings = []
+
+        def produce():
+            local = []
+            for i in range(calls):
+                started = time.perf_counter_ns()
+                logger.event(f"Dog bark {i}", category='Animal,Domestic animals, pets', confidence=0.87)
+                local.append(time.perf_counter_ns() - started)
+            timings.extend(local)
+
+        workers = [threading.Thread(target=produce) for _ in range(threads)]
+        wall_started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        enqueued = time.perf_counter() - wall_started
+        # Include draining the queue, so async mode doesn't get to hide its work
+        shutdown_logger()
+        drained = time.perf_counter() - wall_started
+        logging.getLogger().handlers.clear()
+
+    timings.sort()
+    return {
+        'mode': 'async' if async_mode else 'sync',
+        'calls': len(timings),
+        'p50_us': percentile(timings, 0.50) / 1000,
+        'p95_us': percentile(timings, 0.95) / 1000,
+        'p99_us': percentile(timings, 0.99) / 1000,
+        'max_us': timings[-1] / 1000,
+        'producer_seconds': round(enqueued, 3),
+        'total_seconds': round(drained, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call logging latency, synchronous vs async handlers")
+    parser.add_argument('--calls', type=int, default=20000, help="logger.event calls per thread")
+    parser.add_argument('--threads', type=int, default=1, help="Concurrent logging threads")
+    args = parser.parse_args()
+
+    # Every level, so the console handler does its full formatting work
+    os.environ['ENABLED_LOG_LEVELS'] = 'DEBUG,INFO,EVENT,SPEECH,WARNING,ERROR,CRITICAL'
+    results = [run(async_mode, args.calls, args.threads) for async_mode in (False, True)]
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,404 @@
+# scripts/bench_pipeline.py
+#
+# Measure what each processing stage costs per chunk and whether the whole pipeline keeps up
+# with real time. Deterministic synthetic audio (silence, tones, noise and speech-like bursts)
+# is fed to ActivityGate.update, SpeechDetector.detect, SoundClassifier.classify, SpeechRecognizer.recognize,
+# AudioManager.store_audio_chunk and EventStorage.store_event one at a time, then through the
+# same stage layout start_services builds. The database and stored audio go to a temporary
+# directory.
+#
+# By default YAMNet and Vosk are replaced by stand-ins with the same interfaces (a fixed
+# random projection of band energies, and a recognizer that emits one word per voiced
+# 0.3 s), so the benchmark runs offline and the numbers track our own code rather than
+# the models. Pass --models real to load the configured models instead.
+#
+# The report (JSON) has p50/p95/p99 latency, real-time factor (processing time / audio time)
+# and allocations per chunk for every stage, plus end-to-end latency and the peak RSS.
+# Save it per commit and compare with --baseline:
+#
+# Usage:
+#   python scripts/bench_pipeline.py [--chunks 40] [--models standin|real] [--output bench.json]
+#   python scripts/bench_pipeline.py --baseline bench.json
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import config
+from config import AudioConfig, CascadeConfig, ClassifierConfig, PipelineConfig
+
+SIGNALS = ('silence', 'tone', 'noise', 'speech')
+
+def synthetic_chunk(kind, index, sample_rate, length):
+    """One chunk of deterministic test audio; `index` varies it from chunk to chunk."""
+    rng = np.random.default_rng(SIGNALS.index(kind) * 100003 + index)
+    t = np.arange(length) / sample_rate
+    if kind == 'silence':
+        samples = rng.standard_normal(length) * 1e-4
+    elif kind == 'tone':
+        frequency = (220, 440, 1000, 3000)[index % 4]
+        samples = 0.5 * np.sin(2 * np.pi * frequency * t) + 0.1 * np.sin(2 * np.pi * 2 * frequency * t)
+    elif kind == 'noise':
+        samples = rng.standard_normal(length) * 0.1
+    else:
+        # Voiced syllables: a harmonic series on a gliding pitch, gated at ~4 Hz with pauses
+        pitch = 120 + 60 * np.sin(2 * np.pi * 0.7 * t + index)
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+        envelope = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)), 0, None) ** 2
+        envelope *= (t % 1.5) < 1.1
+        samples = 0.3 * voiced * envelope + rng.standard_normal(length) * 0.005
+    return samples.astype(np.float32)
+
+def synthetic_stream(count, sample_rate, length):
+    """(kind, samples) for `count` chunks of every signal kind, interleaved."""
+    return [(kind, synthetic_chunk(kind, index, sample_rate, length)) for index in range(count) for kind in SIGNALS]
+
+# ---- Stand-in models ----
+
+def standin_engine_class():
+    from services.inference_engine import InferenceEngine
+
+    class StandInEngine(InferenceEngine):
+        """
+        YAMNet-shaped stand-in: one score row per 0.96 s patch every 0.48 s, computed from
+        64 band energies through a fixed random projection. Reuses its score buffer like
+        the real engines. The cascade's speech classes score instead from how strongly the
+        patch's loudness is modulated at syllable rate, so synthetic speech reaches the
+        recognizer as it would with YAMNet while tones and noise don't.
+        """
+        name = 'standin'
+
+        def __init__(self, model_path, num_classes):
+            super().__init__(model_path, num_classes)
+            rng = np.random.default_rng(0)
+            self._projection = rng.standard_normal((64, num_classes)).astype(np.float32) / 8
+            self._bias = np.float32(-4.0)
+            self._speech_classes = [i for i in CascadeConfig.SPEECH_CLASSES if i < num_classes]
+            self._scores = None
+
+        def infer(self, waveform):
+            with self.lock:
+                patch, hop = 15360, 7680
+                frames = max(1, (len(waveform) - patch) // hop + 1)
+                if self._scores is None or self._scores.shape[0] != frames:
+                    self._scores = np.empty((frames, self.num_classes), dtype=np.float32)
+                for frame in range(frames):
+                    spectrum = np.abs(np.fft.rfft(waveform[frame * hop:frame * hop + patch]))
+                    bands = np.log1p(spectrum[:len(spectrum) // 64 * 64].reshape(64, -1).mean(axis=1))
+                    logits = bands @ self._projection + self._bias
+                    self._scores[frame] = 1 / (1 + np.exp(-logits))
+
+                    # Spread of the 20 ms energy envelope: high for syllables, low for steady sounds
+                    segment = waveform[frame * hop:frame * hop + patch]
+                    envelope = np.square(segment[:len(segment) // 320 * 320]).reshape(-1, 320).mean(axis=1)
+                    modulation = envelope.std() / (envelope.mean() + 1e-9)
+                    self._scores[frame, self._speech_classes] = 1 / (1 + np.exp(-8 * (modulation - 0.6)))
+                return self._scores
+
+    return StandInEngine
+
+def standin_vosk_module():
+    """A module with vosk's Model and KaldiRecognizer interface."""
+    words = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel')
+
+    class Model:
+        def __init__(self, path):
+            self.path = path
+
+    class KaldiRecognizer:
+        def __init__(self, model, sample_rate):
+            self.sample_rate = sample_rate
+            self._voiced = 0
+            self._words = []
+
+        def SetWords(self, enabled):
+            pass
+
+        def AcceptWaveform(self, data):
+            pcm = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+            block = self.sample_rate // 100
+            energy = np.abs(pcm[:len(pcm) // block * block].reshape(-1, block)).mean(axis=1)
+            self._voiced += int(np.count_nonzero(energy > 300)) * block
+            while self._voiced >= 0.3 * self.sample_rate:
+                self._voiced -= int(0.3 * self.sample_rate)
+                self._words.append(words[len(self._words) % len(words)])
+            return False
+
+        def PartialResult(self):
+            return json.dumps({'partial': ' '.join(self._words)})
+
+        def Result(self):
+            return self.FinalResult()
+
+        def FinalResult(self):
+            text = ' '.join(self._words)
+            self._voiced = 0
+            self._words = []
+            return json.dumps({'text': text})
+
+    module = types.ModuleType('vosk')
+    module.Model = Model
+    module.KaldiRecognizer = KaldiRecognizer
+    return module
+
+# ---- Measurement ----
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def latency_summary(timings_ns, chunk_seconds):
+    timings = sorted(timings_ns)
+    mean = sum(timings) / len(timings)
+    return {
+        'calls': len(timings),
+        'p50_ms': round(percentile(timings, 0.50) / 1e6, 3),
+        'p95_ms': round(percentile(timings, 0.95) / 1e6, 3),
+        'p99_ms': round(percentile(timings, 0.99) / 1e6, 3),
+        'max_ms': round(timings[-1] / 1e6, 3),
+        'rtf': round(mean / 1e9 / chunk_seconds, 5),
+    }
+
+def bench_stage(name, call, stream, make_chunk, alloc_chunks, chunk_seconds):
+    """Time `call(chunk)` on every chunk, then trace allocations on the first `alloc_chunks`."""
+    timings, by_signal = [], {kind: [] for kind in SIGNALS}
+    for index, (kind, samples) in enumerate(stream):
+        chunk = make_chunk(samples, index)
+        started = time.perf_counter_ns()
+        call(chunk)
+        elapsed = time.perf_counter_ns() - started
+        timings.append(elapsed)
+        by_signal[kind].append(elapsed)
+
+    # A separate pass: tracing slows every allocation down, so it must not skew the timings
+    peaks, nets = [], []
+    tracemalloc.start()
+    for index, (kind, samples) in enumerate(stream[:alloc_chunks]):
+        chunk = make_chunk(samples, len(stream) + index)
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        call(chunk)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        nets.append(current - before)
+    tracemalloc.stop()
+
+    result = latency_summary(timings, chunk_seconds)
+    result['p50_ms_by_signal'] = {
+        kind: round(percentile(sorted(values), 0.5) / 1e6, 3) for kind, values in by_signal.items() if values
+    }
+    result['alloc_peak_kb'] = round(percentile(sorted(peaks), 0.5) / 1024, 1) if peaks else None
+    result['alloc_retained_kb'] = round(sum(nets) / len(nets) / 1024, 1) if nets else None
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    print(f"  {name}: p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, rtf {result['rtf']}", file=sys.stderr)
+    return result
+
+def bench_pipeline(stream, make_chunk, detector, classifier, recognizer, audio_manager, event_storage):
+    """
+    Push every chunk through the stage layout of start_services (as fast as the 'block'
+    policy lets it in) and time each chunk from submit to completion.
+    """
+    from services.audio_writer import AudioWriter
+    from services.processing import ChunkProcessor, build_cascade
+
+    writer = AudioWriter(audio_manager, workers=PipelineConfig.STORAGE_WORKERS)
+    cascade = build_cascade()
+    submitted, completed = {}, {}
+
+    # The service's own stage handlers
+    processor = ChunkProcessor(
+        cascade, detector, recognizer, writer, event_storage, sound_classifier=classifier, language='en',
+        on_complete=lambda item: completed.__setitem__(item.seq, time.perf_counter_ns())
+    )
+    pipeline = processor.build_pipeline()
+
+    writer.start()
+    pipeline.start()
+    started = time.perf_counter()
+    for index, (_, samples) in enumerate(stream):
+        chunk = make_chunk(samples, index)
+        submit_time = time.perf_counter_ns()
+        seq = pipeline.submit(chunk)
+        submitted[seq] = submit_time
+    pipeline.stop()
+    processed = time.perf_counter() - started
+    processor.flush()
+    writer.stop()
+    event_storage.flush()
+    total = time.perf_counter() - started
+
+    # Each window adds one hop of new audio
+    audio_seconds = len(stream) * AudioConfig.HOP_DURATION
+    latencies = [completed[seq] - submitted[seq] for seq in completed]
+    result = latency_summary(latencies, AudioConfig.HOP_DURATION)
+    result.update({
+        'chunks': len(stream),
+        'completed': len(completed),
+        'dropped': pipeline.dropped,
+        'degraded': pipeline.degraded,
+        'audio_seconds': audio_seconds,
+        'wall_seconds': round(processed, 3),
+        'wall_seconds_with_storage': round(total, 3),
+        # Below 1.0 the pipeline keeps up with a live microphone
+        'rtf': round(processed / audio_seconds, 5),
+        'audio_chunks_kept': writer.kept,
+        'audio_chunks_skipped': writer.skipped,
+        'cascade_gated': cascade.gated,
+        'cascade_skipped': dict(cascade.skipped),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    })
+    print(f"  pipeline: rtf {result['rtf']}, end-to-end p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms", file=sys.stderr)
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare(report, baseline):
+    """Print the relative change of the headline numbers against an earlier report."""
+    sections = dict(report['stages'], pipeline=report['pipeline'])
+    old_sections = dict(baseline.get('stages', {}), pipeline=baseline.get('pipeline', {}))
+    print(f"Compared with {baseline.get('revision') or 'baseline'}:")
+    for name, section in sections.items():
+        old = old_sections.get(name, {})
+        changes = []
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'rtf', 'alloc_peak_kb'):
+            if section.get(metric) is not None and old.get(metric):
+                changes.append(f"{metric} {(section[metric] - old[metric]) / old[metric]:+.0%}")
+        print(f"  {name}: {', '.join(changes) or 'no baseline'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage and end-to-end pipeline benchmark on synthetic audio")
+    parser.add_argument('--chunks', type=int, default=40, help="Chunks of each signal kind")
+    parser.add_argument('--alloc-chunks', type=int, default=20, help="Chunks per stage traced for allocations")
+    parser.add_argument('--models', choices=('standin', 'real'), default='standin', help="Model stand-ins or the configured models")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='alog-bench-')
+    # Must be set before any service module opens the database
+    config.DATABASE_URI = f"sqlite:///{os.path.join(work_dir, 'events.db')}"
+    if args.models == 'standin':
+        sys.modules['vosk'] = standin_vosk_module()
+
+    from logger import setup_logger, shutdown_logger
+    from models.event import Event
+    from services.audio_chunk import AudioChunk
+    from services.audio_manager import AudioManager
+    from services.event_storage import EventStorage, get_event_storage
+    from services.sound_classifier import SoundClassifier
+    from services.speech_detector import SpeechDetector
+    from services.speech_recognizer import SpeechRecognizer
+
+    devnull = open(os.devnull, 'w')
+    setup_logger(log_dir=os.path.join(work_dir, 'logs'), stream=devnull)
+
+    sample_rate = AudioConfig.SAMPLE_RATE
+    stream = synthetic_stream(args.chunks, sample_rate, AudioConfig.CHUNK_SIZE)
+    chunk_seconds = AudioConfig.CHUNK_DURATION
+    base_time = datetime.utcnow() - timedelta(hours=1)
+
+    def make_chunk(samples, index):
+        # A fresh chunk per call, so every stage pays for its own PCM conversion
+        return AudioChunk(samples, sample_rate, base_time + timedelta(seconds=index * AudioConfig.HOP_DURATION))
+
+    loading_started = time.perf_counter()
+    engine = None
+    if args.models == 'standin':
+        from services.inference_engine import load_class_map
+        class_names, _ = load_class_map(ClassifierConfig.CLASS_MAP_PATH)
+        engine = standin_engine_class()(None, len(class_names))
+    detector = SpeechDetector()
+    classifier = SoundClassifier(engine=engine)
+    recognizer = SpeechRecognizer()
+    recognizer.load_model('en')
+    audio_manager = AudioManager(storage_path=os.path.join(work_dir, 'audio_chunks'))
+    event_storage = get_event_storage()
+    load_seconds = time.perf_counter() - loading_started
+
+    # Write-through, so the timing covers the database insert rather than a queue append
+    direct_storage = EventStorage(write_behind=False)
+
+    def store_event(chunk):
+        direct_storage.store_event(Event(
+            event_type='sound', label='Benchmark', confidence=0.5,
+            timestamp=chunk.captured_at, meta_info='Benchmark', audio_id=str(uuid.uuid4())
+        ))
+
+    from services.processing import build_cascade
+    gate = build_cascade().gate
+    stages = {
+        'ActivityGate.update': gate.update,
+        'SpeechDetector.detect': detector.detect,
+        'SoundClassifier.classify': lambda chunk: classifier.classify(chunk, None, store=False),
+        'SpeechRecognizer.recognize': lambda chunk: recognizer.recognize(chunk, None, 'en', store=False),
+        'AudioManager.store_audio_chunk': audio_manager.store_audio_chunk,
+        'EventStorage.store_event': store_event,
+    }
+    print(f"Benchmarking {len(stream)} chunks of {chunk_seconds:g}s ({args.models} models)", file=sys.stderr)
+    report = {
+        'revision': git_revision(),
+        'created': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'models': args.models,
+        'engine': classifier.engine.name,
+        'chunk_seconds': chunk_seconds,
+        'hop_seconds': AudioConfig.HOP_DURATION,
+        'chunks': len(stream),
+        'model_load_seconds': round(load_seconds, 3),
+        'stages': {
+            name: bench_stage(name, call, stream, make_chunk, args.alloc_chunks, chunk_seconds)
+            for name, call in stages.items()
+        },
+    }
+    # Stage runs advanced the segmenter and streams; start the pipeline from a clean state
+    classifier.segmenter.flush()
+    recognizer.finish_streams(store=False)
+    event_storage.flush()
+    report['pipeline'] = bench_pipeline(stream, make_chunk, detector, classifier, recognizer, audio_manager, event_storage)
+    report['peak_rss_mb'] = round(peak_rss_mb(), 1)
+
+    event_storage.close()
+    shutdown_logger()
+    devnull.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
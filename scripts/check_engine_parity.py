@@ -0,0 +1,65 @@
+# scripts/check_engine_parity.py
+#
+# Compare the top-k YAMNet labels produced by the SavedModel and TFLite inference engines.
+#
+# Usage:
+#   python scripts/check_engine_parity.py [--k 5] [--threads 2] [--min-agreement 0.9] [file.wav ...]
+#
+# Without WAV files a fixed set of synthetic waveforms (tones, noise, clicks) is used.
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from config import ClassifierConfig, AudioConfig
+from services.file_capture import read_wav
+from services.inference_engine import load_class_map, load_inference_engine, compare_top_k
+
+def synthetic_waveforms():
+    rng = np.random.default_rng(0)
+    t = np.arange(AudioConfig.CHUNK_SIZE, dtype=np.float32) / AudioConfig.SAMPLE_RATE
+    waveforms = [np.sin(2 * np.pi * f * t) for f in (220, 440, 1000, 3000)]
+    waveforms.append(rng.standard_normal(len(t)))
+    clicks = np.zeros(len(t))
+    clicks[::AudioConfig.SAMPLE_RATE // 4] = 1.0
+    waveforms.append(clicks)
+    return [w.astype(np.float32) for w in waveforms]
+
+def normalize(waveform):
+    peak = np.max(np.abs(waveform))
+    return waveform / peak if peak > 0 else waveform
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SavedModel and TFLite YAMNet engines")
+    parser.add_argument('wav_files', nargs='*', help="16-bit PCM WAV files to compare on (resampled to 16 kHz)")
+    parser.add_argument('--k', type=int, default=5, help="Number of top labels to compare")
+    parser.add_argument('--threads', type=int, default=ClassifierConfig.TFLITE_THREADS)
+    parser.add_argument('--min-agreement', type=float, default=0.9,
+                        help="Minimum top-k agreement; exit with status 1 below it")
+    args = parser.parse_args()
+
+    class_names, _ = load_class_map(ClassifierConfig.CLASS_MAP_PATH)
+    reference = load_inference_engine(
+        'savedmodel', ClassifierConfig.SAVED_MODEL_PATH, num_classes=len(class_names)
+    )
+    candidate = load_inference_engine(
+        'tflite', ClassifierConfig.TFLITE_MODEL_PATH, num_classes=len(class_names), num_threads=args.threads
+    )
+
+    if args.wav_files:
+        waveforms = [read_wav(path, AudioConfig.SAMPLE_RATE) for path in args.wav_files]
+    else:
+        waveforms = synthetic_waveforms()
+    waveforms = [normalize(w) for w in waveforms]
+
+    report = compare_top_k(reference, candidate, waveforms, class_names, k=args.k)
+    print(json.dumps(report, indent=2))
+    return 0 if report['topk_agreement'] >= args.min_agreement else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,31 @@
+# scripts/rebuild_rollups.py
+#
+# Recompute the per-minute and per-hour event rollups from the raw events table.
+# Run it once after upgrading an existing database, with the alog service stopped.
+#
+# Usage:
+#   python scripts/rebuild_rollups.py [--batch-size 5000]
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from services.database import get_session_factory
+from services.rollups import rebuild_rollups
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild event rollup tables from the events table")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Events read per query")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)-7s | %(message)s')
+    started = time.monotonic()
+    processed = rebuild_rollups(get_session_factory(), batch_size=args.batch_size)
+    print(f"Rebuilt rollups from {processed} events in {time.monotonic() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
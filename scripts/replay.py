@@ -0,0 +1,155 @@
+# scripts/replay.py
+#
+# Reprocess recordings offline: WAV files (or directories of them) and/or an audio_chunks
+# store are split into work units (one per file / per stored hour), fanned out over a
+# process pool running VAD, the sound classifier and the speech recognizer, and the
+# resulting events are written to the given database file.
+#
+# Each worker loads its own YAMNet and Vosk models, so budget memory per worker.
+#
+# Usage:
+#   python scripts/replay.py recordings/ --database /tmp/replay.db [--workers 4] [--no-speech]
+#   python scripts/replay.py backend/audio_chunks --database /tmp/reprocessed.db
+
+import argparse
+import bisect
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import config
+from config import AudioConfig, ClassifierConfig, SpeechConfig
+
+# Set by init_worker in each pool process
+_detector = None
+_classifier = None
+_recognizer = None
+_language = 'en'
+
+EVENT_COLUMNS = ('event_type', 'label', 'confidence', 'timestamp', 'duration', 'meta_info', 'audio_id')
+
+def init_worker(database_uri, language, speech):
+    global _detector, _classifier, _recognizer, _language
+    # Must happen before any service module opens the database
+    config.DATABASE_URI = database_uri
+
+    from logger import CustomLogLevels, SoundEventLogger
+    logging.addLevelName(CustomLogLevels.SPEECH, 'SPEECH')
+    logging.addLevelName(CustomLogLevels.EVENT, 'EVENT')
+    logging.setLoggerClass(SoundEventLogger)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s | %(levelname)-7s | %(name)s | %(message)s')
+
+    from services.speech_detector import SpeechDetector
+    from services.sound_classifier import SoundClassifier
+    _detector = SpeechDetector()
+    _classifier = SoundClassifier()
+    if _classifier.engine is None:
+        # SoundClassifier has logged why; speech is still recognized without it
+        _classifier = None
+    if speech:
+        from services.speech_recognizer import SpeechRecognizer
+        _recognizer = SpeechRecognizer()
+        for model_language in (SpeechConfig.LANGUAGES if language == 'auto' else [language]):
+            _recognizer.load_model(model_language)
+    _language = language
+
+def process_unit(unit):
+    """Run one work unit through the models; returns (unit, event rows, seconds of audio)."""
+    from services.audio_chunk import AudioChunk
+    from services.file_capture import unit_runs
+
+    events = []
+    audio_seconds = 0.0
+    sample_rate = AudioConfig.SAMPLE_RATE
+    for run_start, samples, audio_ids in unit_runs(unit, sample_rate):
+        audio_seconds += len(samples) / sample_rate
+        offsets = [offset for offset, _ in audio_ids]
+        for offset in range(0, len(samples), AudioConfig.HOP_SIZE):
+            window = samples[offset:offset + AudioConfig.CHUNK_SIZE]
+            if len(window) < sample_rate:
+                break  # too short for YAMNet's first frame
+            chunk = AudioChunk(window, sample_rate, run_start + timedelta(seconds=offset / sample_rate))
+            # Point events at the stored chunk the window starts in, when replaying the store
+            audio_id = audio_ids[bisect.bisect_right(offsets, offset) - 1][1] if audio_ids else None
+
+            vad = _detector.segment(chunk)
+            if _classifier is not None:
+                if ClassifierConfig.SEGMENTATION:
+                    scores = _classifier.frame_scores(chunk)
+                    if scores is not None:
+                        events.extend(_classifier.segment(scores, chunk, audio_id, store=False))
+                else:
+                    events.extend(_classifier.classify(chunk, audio_id, store=False))
+
+            if _recognizer is None:
+                continue
+            if SpeechConfig.STREAMING:
+                events.extend(_recognizer.stream(
+                    chunk, audio_id, _language,
+                    is_speech=vad.is_speech, trailing_silence=vad.trailing_silence,
+                    store=False, segments=vad.segments
+                ))
+            elif vad.is_speech:
+                events.extend(_recognizer.recognize(chunk, audio_id, _language, store=False, segments=vad.segments))
+
+        # Runs are independent recordings: nothing carries over to the next one
+        if _classifier is not None:
+            events.extend(_classifier.segmenter.flush())
+        if _recognizer is not None:
+            events.extend(_recognizer.finish_streams(store=False))
+
+    rows = [{column: getattr(event, column) for column in EVENT_COLUMNS} for event in events]
+    return unit, rows, audio_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess recordings and write the events to a database")
+    parser.add_argument('inputs', nargs='+', help="WAV files, directories of WAV files or an audio_chunks store")
+    parser.add_argument('--database', required=True, help="SQLite file to write the events to")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--language', default='en', help="Vosk model to use for speech, or 'auto' to detect it")
+    parser.add_argument('--no-speech', action='store_true', help="Skip speech recognition")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(levelname)-7s | %(message)s')
+    database_uri = f"sqlite:///{os.path.abspath(args.database)}"
+    config.DATABASE_URI = database_uri
+
+    from models.event import Event
+    from services.event_storage import EventStorage
+    from services.file_capture import discover_sources
+
+    units = discover_sources(args.inputs, AudioConfig.SAMPLE_RATE)
+    if not units:
+        parser.error("no WAV files or stored audio found")
+    print(f"Reprocessing {len(units)} work units on {args.workers} workers into {args.database}")
+
+    storage = EventStorage(write_behind=True)
+    started = time.monotonic()
+    total_events = 0
+    total_audio = 0.0
+    # Spawned, not forked: the workers must not inherit the storage's engine and writer thread
+    with multiprocessing.get_context('spawn').Pool(
+        args.workers,
+        initializer=init_worker,
+        initargs=(database_uri, args.language, not args.no_speech)
+    ) as pool:
+        for done, (unit, rows, audio_seconds) in enumerate(pool.imap_unordered(process_unit, units), 1):
+            storage.store_events([Event(**row) for row in rows])
+            total_events += len(rows)
+            total_audio += audio_seconds
+            print(f"[{done}/{len(units)}] {unit[-1]}: {audio_seconds:.0f}s of audio, {len(rows)} events")
+
+    storage.close()
+    elapsed = time.monotonic() - started
+    print(
+        f"Done: {total_events} events from {total_audio / 3600:.2f}h of audio in {elapsed:.0f}s "
+        f"({total_audio / max(elapsed, 1e-9):.0f}x real time)"
+    )
+
+if __name__ == '__main__':
+    main()